@@ -0,0 +1 @@
+"""Benchmarks for the flexigurator hot paths, run with `python -m benchmarks` or `invoke benchmark`."""
@@ -0,0 +1,41 @@
+import argparse
+import sys
+from pathlib import Path
+
+from benchmarks import (  # noqa
+    bench_directory,
+    bench_import,
+    bench_patch,
+    bench_placeholder,
+    bench_versions,
+)
+from benchmarks.runner import compare, report, run, save
+
+_BASELINE = Path(__file__).parent / "baseline.json"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("-k", dest="pattern", default="", help="only run matching benchmarks")
+    parser.add_argument("--save", action="store_true", help="store the results as new baseline")
+    parser.add_argument("--compare", action="store_true", help="compare against the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    results = run(args.pattern)
+    regressions = []
+
+    if args.compare:
+        regressions = compare(results, _BASELINE, args.threshold)
+    else:
+        report(results)
+
+    if args.save:
+        save(results, _BASELINE)
+
+    for name in regressions:
+        print(f"Regression: {name}", file=sys.stderr)
+    return 1 if regressions and not args.save else 0
+
+
+sys.exit(main())
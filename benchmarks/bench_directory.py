@@ -0,0 +1,69 @@
+from pathlib import Path
+
+from confz import ConfZFileSource
+
+from benchmarks.generators import BenchConfig, make_wide_directory, write_yaml
+from benchmarks.runner import benchmark
+from flexigurator import BundleSource, DirectorySource, pack_bundle
+from flexigurator.file_cache import CompiledFileCache, parsed_files
+
+
+@benchmark("directory.get_cold_2000_files")
+def get_cold(workdir: Path):
+    names = make_wide_directory(workdir, files=2000)
+    return lambda: DirectorySource(workdir).get(names[-1])
+
+
+@benchmark("directory.get_warm_2000_files")
+def get_warm(workdir: Path):
+    names = make_wide_directory(workdir, files=2000)
+    directory_source = DirectorySource(workdir)
+    return lambda: directory_source.get(names[-1])
+
+
+@benchmark("directory.load_large_yaml_2000_keys")
+def load_large_yaml(workdir: Path):
+    source = ConfZFileSource(write_yaml(workdir / "large.yaml", keys=2000))
+    return lambda: BenchConfig(config_sources=source)
+
+
+def _load_all_cold(workdir: Path, compiled: CompiledFileCache | None, distinct: int | None = None):
+    names = make_wide_directory(
+        workdir / "versions", files=500, keys_per_file=50, distinct=distinct
+    )
+    directory_source = DirectorySource(workdir / "versions")
+
+    def run():
+        # Like a new process, which has not parsed any file yet
+        parsed_files.clear()
+        parsed_files.compiled = compiled
+        try:
+            for name in names:
+                BenchConfig(config_sources=directory_source.get(name))
+        finally:
+            parsed_files.compiled = None
+
+    return run
+
+
+@benchmark("directory.load_cold_500_files")
+def load_cold(workdir: Path):
+    return _load_all_cold(workdir, compiled=None)
+
+
+@benchmark("directory.load_cold_500_files_compiled")
+def load_cold_compiled(workdir: Path):
+    return _load_all_cold(workdir, compiled=CompiledFileCache(workdir / "cache"))
+
+
+@benchmark("directory.load_cold_500_files_10_distinct")
+def load_cold_duplicates(workdir: Path):
+    # Per-region copies of the same versions
+    return _load_all_cold(workdir, compiled=None, distinct=10)
+
+
+@benchmark("bundle.get_cold_2000_versions")
+def bundle_get_cold(workdir: Path):
+    names = make_wide_directory(workdir / "versions", files=2000)
+    pack_bundle(DirectorySource(workdir / "versions"), workdir / "versions.bundle")
+    return lambda: BundleSource(workdir / "versions.bundle").get(names[-1])
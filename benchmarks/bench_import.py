@@ -0,0 +1,32 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmarks.runner import benchmark
+
+# Imports run in a fresh interpreter, so the timings include the interpreter startup
+
+
+def _import(statement: str):
+    command = [sys.executable, "-c", statement]
+    return lambda: subprocess.run(command, check=True)
+
+
+@benchmark("import.python")
+def import_python(_: Path):
+    return _import("pass")
+
+
+@benchmark("import.flexigurator")
+def import_flexigurator(_: Path):
+    return _import("import flexigurator")
+
+
+@benchmark("import.flexigurator_patch_config")
+def import_patch_config(_: Path):
+    return _import("from flexigurator import patch_config")
+
+
+@benchmark("import.flexigurator_form")
+def import_form(_: Path):
+    return _import("import flexigurator.form.form")
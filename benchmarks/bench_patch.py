@@ -0,0 +1,85 @@
+from contextlib import ExitStack
+from pathlib import Path
+
+from confz import ConfZDataSource
+
+from benchmarks.generators import BenchConfig
+from benchmarks.runner import benchmark
+from flexigurator import config_cache, patch_config
+from flexigurator.instrumentation import InstrumentationStats, instrumentation
+
+
+class PatchedConfig(BenchConfig):
+    CONFIG_SOURCES = ConfZDataSource(dict(a=1, b=2, values={f"key_{i}": i for i in range(50)}))
+
+
+@benchmark("patch_config.enter_exit")
+def enter_exit(_: Path):
+    def run():
+        with patch_config(PatchedConfig, dict(a=3)):
+            pass
+
+    return run
+
+
+@benchmark("patch_config.enter_construct_exit")
+def enter_construct_exit(_: Path):
+    def run():
+        with patch_config(PatchedConfig, dict(a=3)):
+            PatchedConfig()
+
+    return run
+
+
+@benchmark("patch_config.nested_10")
+def nested(_: Path):
+    def run():
+        with ExitStack() as stack:
+            for i in range(10):
+                stack.enter_context(patch_config(PatchedConfig, dict(a=i)))
+            PatchedConfig()
+
+    return run
+
+
+@benchmark("patch_config.enter_construct_exit_instrumented_100")
+def enter_construct_exit_instrumented(_: Path):
+    # The exporter is removed after every call, so the other benchmarks run without instrumentation
+    def run():
+        exporter = InstrumentationStats()
+        instrumentation.add_exporter(exporter)
+        try:
+            for _ in range(100):
+                with patch_config(PatchedConfig, dict(a=3)):
+                    PatchedConfig()
+        finally:
+            instrumentation.remove_exporter(exporter)
+
+    return run
+
+
+@benchmark("patch_config.nested_100")
+def nested_100(_: Path):
+    def run():
+        with ExitStack() as stack:
+            for i in range(100):
+                stack.enter_context(patch_config(PatchedConfig, dict(a=i)))
+            PatchedConfig()
+
+    return run
+
+
+@benchmark("patch_config.nested_50_construct_each_uncached")
+def nested_construct_each(_: Path):
+    # Constructs the config at every depth, as nested test fixtures do, without the config cache
+    def run():
+        maxsize, config_cache.maxsize = config_cache.maxsize, 0
+        try:
+            with ExitStack() as stack:
+                for i in range(50):
+                    stack.enter_context(patch_config(PatchedConfig, {f"key_{i}": -i}))
+                    PatchedConfig()
+        finally:
+            config_cache.maxsize = maxsize
+
+    return run
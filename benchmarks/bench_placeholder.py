@@ -0,0 +1,92 @@
+from pathlib import Path
+
+from confz import ConfZ, ConfZDataSource
+from pydantic import BaseModel, create_model
+
+from benchmarks.runner import benchmark, memory_benchmark
+from flexigurator import LazyValidation, NotConfiguredError, placeholder
+
+
+class SubModel(BaseModel):
+    some_string: str
+    some_int: int
+
+
+# A model with many placeholder sections, as used for large configs
+ManyPlaceholders = create_model(  # type: ignore
+    "ManyPlaceholders", **{f"section_{i}": (SubModel, placeholder(SubModel)) for i in range(30)}
+)
+
+
+@benchmark("placeholder.non_field_attribute")
+def non_field_attribute(_: Path):
+    instance = placeholder(SubModel)
+    return lambda: instance.__fields_set__
+
+
+@benchmark("placeholder.field_attribute")
+def field_attribute(_: Path):
+    instance = placeholder(SubModel)
+
+    def run():
+        try:
+            return instance.some_string
+        except NotConfiguredError:
+            return None
+
+    return run
+
+
+@benchmark("placeholder.create")
+def create(_: Path):
+    return lambda: placeholder(SubModel)
+
+
+@benchmark("placeholder.model_with_30_placeholders")
+def model_with_placeholders(_: Path):
+    return ManyPlaceholders
+
+
+@benchmark("placeholder.dict_30_placeholders")
+def dict_placeholders(_: Path):
+    return ManyPlaceholders().dict
+
+
+class ManyPlaceholdersConfig(ManyPlaceholders, ConfZ):  # type: ignore
+    pass
+
+
+@memory_benchmark("placeholder.config_instance_memory")
+def config_instance_memory(_: Path):
+    source = ConfZDataSource({})
+    return lambda: ManyPlaceholdersConfig(config_sources=source)
+
+
+class Section(BaseModel):
+    values: dict[str, int]
+    names: list[str]
+
+
+_SECTIONS = {f"section_{i}": (Section, placeholder(Section)) for i in range(30)}
+_SECTIONS_DATA = {
+    f"section_{i}": dict(values={f"key_{j}": j for j in range(50)}, names=[str(j) for j in range(50)])
+    for i in range(30)
+}
+
+EagerSections = create_model("EagerSections", __base__=ConfZ, **_SECTIONS)  # type: ignore
+LazySections = create_model(  # type: ignore
+    "LazySections", __base__=(LazyValidation, ConfZ), **_SECTIONS
+)
+
+
+@benchmark("placeholder.construct_30_sections_eager")
+def construct_eager(_: Path):
+    source = ConfZDataSource(_SECTIONS_DATA)
+    return lambda: EagerSections(config_sources=source).section_0.values
+
+
+@benchmark("placeholder.construct_30_sections_lazy")
+def construct_lazy(_: Path):
+    # Only one of the sections is used, so only that section is validated
+    source = ConfZDataSource(_SECTIONS_DATA)
+    return lambda: LazySections(config_sources=source).section_0.values
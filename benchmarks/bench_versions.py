@@ -0,0 +1,92 @@
+from pathlib import Path
+
+from confz import ConfZDataSource, ConfZFileSource
+
+from benchmarks.generators import BenchConfig, make_version_tree, write_yaml
+from benchmarks.runner import benchmark
+from flexigurator import ConfigVersions, DirectorySource
+from flexigurator.config_versions import _flatten
+
+
+def _tree_versions(workdir: Path) -> tuple[ConfigVersions, str]:
+    names = make_version_tree(workdir, depth=4, width=3, files_per_dir=5)
+
+    class Configs(ConfigVersions):
+        CONFIG_CLASS = BenchConfig
+        BASE = dict(a=0, b=0)
+        folder = DirectorySource(workdir)
+
+    # The deepest version is the worst case for the resolution
+    return Configs(), "folder." + max(names, key=lambda name: name.count("."))
+
+
+@benchmark("versions.get_deep")
+def get_deep(workdir: Path):
+    configs, name = _tree_versions(workdir)
+    return lambda: configs.get(name)
+
+
+@benchmark("versions.version_deep")
+def version_deep(workdir: Path):
+    configs, name = _tree_versions(workdir)
+
+    def run():
+        with configs.version(name):
+            pass
+
+    return run
+
+
+@benchmark("versions.version_deep_construct")
+def version_deep_construct(workdir: Path):
+    configs, name = _tree_versions(workdir)
+
+    def run():
+        with configs.version(name):
+            BenchConfig()
+
+    return run
+
+
+@benchmark("versions.flatten_100")
+def flatten(_: Path):
+    base = [ConfZDataSource(dict(a=i)) for i in range(100)]
+    sources = [ConfZDataSource(dict(b=i)) for i in range(100)]
+    return lambda: _flatten(base, sources)
+
+
+def _stacked_versions(workdir: Path) -> ConfigVersions:
+    # A version of 20 file sources on top of a BASE, each file overriding a part of the values
+    folder = workdir / "stack"
+    folder.mkdir(parents=True, exist_ok=True)
+    sources = [
+        ConfZFileSource(write_yaml(folder / f"layer_{i}.yaml", keys=50, offset=i))
+        for i in range(20)
+    ]
+
+    class Configs(ConfigVersions):
+        CONFIG_CLASS = BenchConfig
+        BASE = dict(a=0, b=0)
+        stack = sources
+
+    return Configs()
+
+
+def _construct(configs: ConfigVersions, snapshot: bool):
+    def run():
+        with configs.version("stack", snapshot=snapshot):
+            # Construct the config without the config cache, as the first use of a version would
+            BenchConfig.confz_instance = None
+            BenchConfig()
+
+    return run
+
+
+@benchmark("versions.stack_20_construct_layered")
+def stack_construct_layered(workdir: Path):
+    return _construct(_stacked_versions(workdir), snapshot=False)
+
+
+@benchmark("versions.stack_20_construct_snapshot")
+def stack_construct_snapshot(workdir: Path):
+    return _construct(_stacked_versions(workdir), snapshot=True)
@@ -0,0 +1,53 @@
+"""Synthetic data generators for the benchmarks."""
+from pathlib import Path
+
+from confz import ConfZ
+
+
+class BenchConfig(ConfZ):  # type: ignore
+    a: int
+    b: int
+    values: dict[str, int] = {}
+
+
+def write_yaml(path: Path, keys: int, offset: int = 0) -> Path:
+    """Write a config file for `BenchConfig` with the given number of `values` entries."""
+    lines = [f"a: {offset}", f"b: {offset + 1}", "values:" if keys else "values: {}"]
+    lines += [f"  key_{i}: {i}" for i in range(keys)]
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+def make_wide_directory(
+    root: Path, files: int, keys_per_file: int = 4, distinct: int | None = None
+) -> list[str]:
+    """Create a single folder containing many version files and return the version names.
+
+    With `distinct` set, the files are copies of that many different files.
+    """
+    root.mkdir(parents=True, exist_ok=True)
+    for i in range(files):
+        write_yaml(root / f"version_{i}.yaml", keys_per_file, offset=i % (distinct or files))
+    return [f"version_{i}" for i in range(files)]
+
+
+def make_version_tree(
+    root: Path, depth: int, width: int, files_per_dir: int, keys_per_file: int = 4
+) -> list[str]:
+    """Create a tree of nested folders with version files and return the dotted leaf names.
+
+    Every folder contains `width` sub folders (up to `depth` levels) and `files_per_dir` files.
+    """
+    root.mkdir(parents=True, exist_ok=True)
+    names = []
+    for i in range(files_per_dir):
+        write_yaml(root / f"version_{i}.yaml", keys_per_file, offset=i)
+        names.append(f"version_{i}")
+
+    if depth > 0:
+        for j in range(width):
+            sub_names = make_version_tree(
+                root / f"level_{depth}_{j}", depth - 1, width, files_per_dir, keys_per_file
+            )
+            names += [f"level_{depth}_{j}.{name}" for name in sub_names]
+    return names
@@ -0,0 +1,158 @@
+import json
+import tempfile
+import timeit
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable
+
+Benchmark = Callable[[Path], Callable[[], object]]
+
+_BENCHMARKS: dict[str, Benchmark] = {}
+_MEMORY_BENCHMARKS: dict[str, Benchmark] = {}
+
+# Number of objects created by a memory benchmark, the footprint is averaged over them
+_MEMORY_OBJECTS = 1000
+
+
+@dataclass
+class Result:
+    name: str
+    value: float
+    unit: str
+    calls: int
+
+
+def benchmark(name: str) -> Callable[[Benchmark], Benchmark]:
+    """Register a benchmark.
+
+    The decorated function receives a scratch directory to set up its data in and returns the
+    callable that is timed.
+
+    Args:
+        name (str): Dotted name of the benchmark, e.g. `patch_config.enter_exit`
+
+    Returns:
+        Callable[[Benchmark], Benchmark]: The decorator
+    """
+
+    def register(function: Benchmark) -> Benchmark:
+        _BENCHMARKS[name] = function
+        return function
+
+    return register
+
+
+def memory_benchmark(name: str) -> Callable[[Benchmark], Benchmark]:
+    """Register a memory benchmark.
+
+    The callable returned by the decorated function creates one object, the benchmark reports the
+    memory retained per created object.
+
+    Args:
+        name (str): Dotted name of the benchmark, e.g. `placeholder.config_instance_memory`
+
+    Returns:
+        Callable[[Benchmark], Benchmark]: The decorator
+    """
+
+    def register(function: Benchmark) -> Benchmark:
+        _MEMORY_BENCHMARKS[name] = function
+        return function
+
+    return register
+
+
+def run(pattern: str = "", repeat: int = 5) -> list[Result]:
+    """Run all registered benchmarks whose name contains the pattern.
+
+    Every benchmark is auto-ranged to run for at least 0.2 seconds and repeated; the fastest repeat
+    is reported as it is the least disturbed by other processes.
+
+    Args:
+        pattern (str): Only run benchmarks containing this substring
+        repeat (int): Number of timed repeats per benchmark
+
+    Returns:
+        list[Result]: The time per call of every benchmark
+    """
+    results = []
+    for name, function in sorted(_BENCHMARKS.items()):
+        if pattern not in name:
+            continue
+
+        with tempfile.TemporaryDirectory() as workdir:
+            timer = timeit.Timer(function(Path(workdir)))
+            calls, _ = timer.autorange()
+            seconds = min(timer.repeat(repeat=repeat, number=calls)) / calls
+
+        results.append(Result(name, seconds, "s", calls))
+
+    for name, function in sorted(_MEMORY_BENCHMARKS.items()):
+        if pattern in name:
+            with tempfile.TemporaryDirectory() as workdir:
+                results.append(_run_memory(name, function(Path(workdir))))
+    return results
+
+
+def _run_memory(name: str, create: Callable[[], object]) -> Result:
+    create()  # Warm up caches so only the memory retained per object is measured
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        objects = [create() for _ in range(_MEMORY_OBJECTS)]
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    del objects
+    return Result(name, (after - before) / _MEMORY_OBJECTS, "B", _MEMORY_OBJECTS)
+
+
+def save(results: list[Result], path: Path) -> None:
+    # Merge into the existing baseline so running a subset only updates those benchmarks
+    saved = (
+        {result["name"]: result for result in json.loads(path.read_text())} if path.exists() else {}
+    )
+    saved.update({result.name: asdict(result) for result in results})
+    path.write_text(json.dumps(sorted(saved.values(), key=lambda r: r["name"]), indent=2) + "\n")
+
+
+def compare(results: list[Result], path: Path, threshold: float) -> list[str]:
+    """Print the results next to a baseline and return the benchmarks that regressed.
+
+    Args:
+        results (list[Result]): The new results
+        path (Path): The baseline file created by `save`
+        threshold (float): Relative slowdown that counts as a regression (e.g. `0.25`)
+
+    Returns:
+        list[str]: Names of the benchmarks that are slower than the baseline by the threshold
+    """
+    baseline = {result["name"]: result["value"] for result in json.loads(path.read_text())}
+    regressions = []
+
+    for result in results:
+        old = baseline.get(result.name)
+        change = f"{result.value / old - 1:+7.1%}" if old else "    new"
+        print(f"{result.name:<50} {_format(result):>12} {change}")
+
+        if old and result.value > old * (1 + threshold):
+            regressions.append(result.name)
+
+    return regressions
+
+
+def report(results: list[Result]) -> None:
+    for result in results:
+        print(f"{result.name:<50} {_format(result):>12}")
+
+
+def _format(result: Result) -> str:
+    if result.unit == "B":
+        return f"{result.value / 1024:.2f} KiB"
+
+    for unit, factor in (("s", 1.0), ("ms", 1e3), ("us", 1e6)):
+        if result.value * factor >= 1:
+            return f"{result.value * factor:.2f} {unit}"
+    return f"{result.value * 1e9:.1f} ns"
@@ -1,3 +1,76 @@
-from flexigurator.config_patch import patch_config
-from flexigurator.config_versions import ConfigVersions, DirectorySource
-from flexigurator.placeholder import NotConfiguredError, placeholder
+import sys
+from importlib import import_module
+from types import ModuleType
+from typing import TYPE_CHECKING, Any
+
+# The public API is imported on first use (PEP 562), so importing flexigurator does not import
+# ConfZ and pydantic until they are needed
+_LAZY_ATTRIBUTES = {
+    "BundleSource": "flexigurator.bundle",
+    "pack_bundle": "flexigurator.bundle",
+    "apatch_config": "flexigurator.config_patch",
+    "patch_config": "flexigurator.config_patch",
+    "prefetch_config": "flexigurator.config_patch",
+    "ConfigVersions": "flexigurator.config_versions",
+    "DirectorySource": "flexigurator.config_versions",
+    "ConfigCache": "flexigurator.instance_cache",
+    "config_cache": "flexigurator.instance_cache",
+    "LazyValidation": "flexigurator.lazy_validation",
+    "NotConfiguredError": "flexigurator.placeholder",
+    "placeholder": "flexigurator.placeholder",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+if TYPE_CHECKING:  # pragma: no cover
+    from flexigurator.bundle import BundleSource, pack_bundle
+    from flexigurator.config_patch import apatch_config, patch_config, prefetch_config
+    from flexigurator.config_versions import ConfigVersions, DirectorySource
+    from flexigurator.instance_cache import ConfigCache, config_cache
+    from flexigurator.lazy_validation import LazyValidation
+    from flexigurator.placeholder import NotConfiguredError, placeholder
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(import_module(module_name), name)
+    # Store the attribute, so it is only looked up once
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
+
+
+class _ShadowedAttribute:
+    """Resolves an attribute named like the module it is defined in (i.e. `placeholder`).
+
+    Importing a module binds it to the package under its name, which would replace the attribute,
+    so that binding is ignored. Other values (e.g. set by `mock.patch`) replace the attribute.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __get__(self, package: Any, owner: Any = None) -> Any:
+        if self._name in vars(package):
+            return vars(package)[self._name]
+        return getattr(import_module(_LAZY_ATTRIBUTES[self._name]), self._name)
+
+    def __set__(self, package: Any, value: Any) -> None:
+        if not isinstance(value, ModuleType):
+            vars(package)[self._name] = value
+
+    def __delete__(self, package: Any) -> None:
+        vars(package).pop(self._name, None)
+
+
+class _Package(ModuleType):
+    placeholder = _ShadowedAttribute("placeholder")
+
+
+sys.modules[__name__].__class__ = _Package
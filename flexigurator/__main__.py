@@ -0,0 +1,5 @@
+import sys
+
+from flexigurator.cli import main
+
+sys.exit(main())
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import mmap
+import os
+import pickle
+import struct
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from confz import ConfZSource
+
+from flexigurator.config_snapshot import SnapshotSource, snapshot_sources
+from flexigurator.config_versions import (
+    ConfigSource,
+    ConfigVersions,
+    DirectorySource,
+    _VersionCollection,
+)
+from flexigurator.instrumentation import instrumentation
+
+_MAGIC = b"FLEXIGURATOR-BUNDLE\x01"
+# The offset and length of the index, at the end of the bundle
+_TRAILER = struct.Struct("<QQ")
+
+
+def pack_bundle(collection: ConfigVersions | DirectorySource, path: Path) -> int:
+    """Pack the versions of a collection (e.g. a `ConfigVersions` or `DirectorySource`) in a bundle.
+
+    The sources of every version are merged and stored in a single file, which can be loaded with
+    a `BundleSource`. The versions of a `ConfigVersions` are packed with their `BASE` version, so
+    every packed version is complete. Versions are written one at a time, so trees of any size can
+    be packed. The bundle replaces the file at `path` atomically.
+
+    Args:
+        collection (ConfigVersions | DirectorySource): The versions to pack, including those in
+            nested collections
+        path (Path): The path of the bundle
+
+    Returns:
+        int: The number of packed versions
+    """
+    index: dict[str, tuple[int, int]] = {}
+    # Created with the permissions of a regular file (unlike `tempfile.mkstemp`), so the bundle can
+    # be read by other users
+    temporary_path = Path(path).with_name(f".{Path(path).name}.{uuid.uuid4().hex}.tmp")
+    file_descriptor = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+
+    try:
+        with os.fdopen(file_descriptor, "wb") as file:
+            file.write(_MAGIC)
+
+            for version_name in collection.versions():
+                data = snapshot_sources(_version_sources(collection, version_name)).data
+                entry = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+                index[version_name] = (file.tell(), len(entry))
+                file.write(entry)
+
+            index_entry = pickle.dumps(index, protocol=pickle.HIGHEST_PROTOCOL)
+            file.write(index_entry)
+            file.write(_TRAILER.pack(file.tell() - len(index_entry), len(index_entry)))
+
+        os.replace(temporary_path, path)
+    finally:
+        temporary_path.unlink(missing_ok=True)
+
+    return len(index)
+
+
+def _version_sources(
+    collection: ConfigVersions | DirectorySource, version_name: str
+) -> list[ConfZSource]:
+    if isinstance(collection, ConfigVersions):
+        # The plan includes the `BASE` version, which is not listed as a version on its own
+        return list(collection.plan(version_name))
+
+    sources = collection.get(version_name)
+    return sources if isinstance(sources, list) else [sources]
+
+
+class _Bundle:
+    """An opened bundle file, of which the versions are decoded on request."""
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as file:
+            self.stat = os.fstat(file.fileno())
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._map[: len(_MAGIC)] != _MAGIC:
+            self._map.close()
+            raise ValueError(f"Not a flexigurator bundle: {path}")
+
+        index_offset, index_length = _TRAILER.unpack(self._map[len(self._map) - _TRAILER.size :])
+        self.index: dict[str, tuple[int, int]] = pickle.loads(
+            self._map[index_offset : index_offset + index_length]
+        )
+        self.collections = {
+            version_name.rsplit(".", maxsplit=depth)[0]
+            for version_name in self.index
+            for depth in range(1, version_name.count(".") + 1)
+        }
+
+    def load(self, version_name: str) -> dict[str, Any]:
+        offset, length = self.index[version_name]
+        return pickle.loads(self._map[offset : offset + length])
+
+
+class BundleSource(_VersionCollection):
+    """Hold the versions packed in a bundle by `pack_bundle`.
+
+    The bundle is memory-mapped on first use, so processes loading the same bundle share its
+    pages, and only the requested versions are decoded. The bundle is opened again when the file is
+    replaced (e.g. by packing it again).
+
+    Bundles are stored with `pickle`, so only load bundles from trusted sources.
+
+    Args:
+        path (Path): Path to the bundle file
+
+    """
+
+    _path: Path
+    _bundle: _Bundle | None
+    _sources: dict[str, SnapshotSource]
+
+    def __init__(self, path: Path):
+        super().__init__()
+        self._path = Path(path)
+        self._bundle = None
+        self._sources = {}
+        self._lock = threading.Lock()
+
+    def versions(self) -> Iterator[str]:
+        yield from self._open().index
+
+    def get(self, version_name: str) -> ConfigSource:
+        bundle = self._open()
+
+        source = self._sources.get(version_name)
+        if source is None:
+            if version_name in bundle.collections:
+                raise ValueError(f'"{version_name}" is a collection!')
+            if version_name not in bundle.index:
+                raise AttributeError(f"Version source does not exist: {version_name}")
+
+            # Decoded versions are kept, so the same source (and cached config) is used again
+            with instrumentation.span("bundle.decode", version=version_name):
+                source = self._sources.setdefault(
+                    version_name, SnapshotSource(bundle.load(version_name))
+                )
+        return source
+
+    def _load_sources(self) -> None:
+        self._open()
+
+    def _open(self) -> _Bundle:
+        with self._lock:
+            stat = os.stat(self._path)
+
+            if self._bundle is None or _identity(stat) != _identity(self._bundle.stat):
+                with instrumentation.span("bundle.open", path=str(self._path)):
+                    self._bundle = _Bundle(self._path)
+                self._sources = {}
+                _VersionCollection.index_generation += 1
+            return self._bundle
+
+    def _items(self) -> Iterable[tuple[str, Any]]:
+        return ((version_name, self.get(version_name)) for version_name in self.versions())
+
+    def _watched_paths(self) -> Iterator[Path]:
+        self._load_sources()
+        yield self._path
+
+
+def _identity(stat: os.stat_result) -> tuple[int, int, int]:
+    # A replaced bundle is a new file, so also compare the inode of the file
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
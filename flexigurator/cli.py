@@ -0,0 +1,244 @@
+"""Command line interface to work with the versions of a `ConfigVersions` class."""
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import importlib
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator, Sequence, TextIO
+
+import yaml
+from confz import ConfZ
+
+from flexigurator.bundle import pack_bundle
+from flexigurator.config_validation import VersionResult
+from flexigurator.config_versions import ConfigVersions, DirectorySource
+
+
+def load_config_versions(target: str) -> ConfigVersions:
+    """Import a `ConfigVersions` subclass and return its instance.
+
+    Args:
+        target (str): The class as `package.module:ClassName`
+
+    Returns:
+        ConfigVersions: The instance of the class
+
+    Raises:
+        ValueError: When the target is not a `ConfigVersions` subclass
+    """
+    module_name, _, class_name = target.partition(":")
+    # Like other tools importing application code, resolve modules from the working directory
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+
+    versions_class = getattr(importlib.import_module(module_name), class_name, None)
+
+    if not isinstance(versions_class, type) or not issubclass(versions_class, ConfigVersions):
+        raise ValueError(f"Not a ConfigVersions subclass: {target}")
+    return versions_class()
+
+
+@dataclass(frozen=True)
+class _Exporter:
+    """Write a resolved config to a file, called by the worker processes."""
+
+    directory: Path
+    file_format: str
+
+    def __call__(self, version_name: str, config: ConfZ) -> None:
+        # Mirror the (nested) collections of the versions as folders
+        path = self.directory.joinpath(*version_name.split(".")).with_suffix(f".{self.file_format}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        if self.file_format == "json":
+            path.write_text(config.json(indent=2) + "\n", encoding="utf-8")
+        else:
+            data = json.loads(config.json())
+            path.write_text(yaml.safe_dump(data, sort_keys=False), encoding="utf-8")
+
+
+def _version_names(config_versions: ConfigVersions, pattern: str | None) -> Iterator[str]:
+    for version_name in config_versions.versions():
+        if pattern is None or fnmatch.fnmatchcase(version_name, pattern):
+            yield version_name
+
+
+def _print_results(results: Iterator[VersionResult], output: TextIO) -> int:
+    # Print the results while they are produced, only keeping count of them
+    start = time.perf_counter()
+    total = failed = 0
+
+    for result in results:
+        total += 1
+        failed += not result.ok
+        status = "ok" if result.ok else "FAILED"
+        error = f": {result.error}" if result.error else ""
+        print(f"{status:<7}{result.duration:8.3f}s  {result.version}{error}", file=output)
+
+    print(f"{total} versions, {failed} failed in {time.perf_counter() - start:.2f}s", file=output)
+    return 0 if failed == 0 else 1
+
+
+def _list(arguments: argparse.Namespace, output: TextIO) -> int:
+    config_versions = load_config_versions(arguments.target)
+
+    for version_name in _version_names(config_versions, arguments.match):
+        print(version_name, file=output)
+    return 0
+
+
+def _validate(arguments: argparse.Namespace, output: TextIO) -> int:
+    config_versions = load_config_versions(arguments.target)
+
+    results = config_versions.validate(
+        _version_names(config_versions, arguments.match), max_workers=arguments.workers
+    )
+    return _print_results(results, output)
+
+
+def _export(arguments: argparse.Namespace, output: TextIO) -> int:
+    config_versions = load_config_versions(arguments.target)
+
+    results = config_versions.validate(
+        _version_names(config_versions, arguments.match),
+        max_workers=arguments.workers,
+        action=_Exporter(Path(arguments.directory), arguments.format),
+    )
+    return _print_results(results, output)
+
+
+def _load_collection(target: str) -> ConfigVersions | DirectorySource:
+    if Path(target).is_dir():
+        return DirectorySource(Path(target))
+    return load_config_versions(target)
+
+
+def _bundle(arguments: argparse.Namespace, output: TextIO) -> int:
+    count = pack_bundle(_load_collection(arguments.target), Path(arguments.bundle))
+    print(f"Packed {count} versions in {arguments.bundle}", file=output)
+    return 0
+
+
+def _duplicates(arguments: argparse.Namespace, output: TextIO) -> int:
+    for names in _load_collection(arguments.target).duplicates():
+        print(" ".join(names), file=output)
+    return 0
+
+
+def _flat_items(data: dict[str, Any], prefix: str = "") -> Iterator[tuple[str, Any]]:
+    for key, value in data.items():
+        if isinstance(value, dict) and value:
+            yield from _flat_items(value, f"{prefix}{key}.")
+        else:
+            yield f"{prefix}{key}", value
+
+
+def _resolve(config_versions: ConfigVersions, version_name: str) -> dict[str, Any]:
+    with config_versions.version(version_name):
+        config = getattr(config_versions, "CONFIG_CLASS")()
+    return dict(_flat_items(json.loads(config.json())))
+
+
+def _diff(arguments: argparse.Namespace, output: TextIO) -> int:
+    config_versions = load_config_versions(arguments.target)
+    old = _resolve(config_versions, arguments.old)
+    new = _resolve(config_versions, arguments.new)
+
+    differences = 0
+    for key in sorted(old.keys() | new.keys()):
+        if key not in new:
+            print(f"- {key}: {json.dumps(old[key])}", file=output)
+        elif key not in old:
+            print(f"+ {key}: {json.dumps(new[key])}", file=output)
+        elif old[key] != new[key]:
+            print(f"~ {key}: {json.dumps(old[key])} -> {json.dumps(new[key])}", file=output)
+        else:
+            continue
+        differences += 1
+
+    return 0 if differences == 0 else 1
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="flexigurator", description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    target = argparse.ArgumentParser(add_help=False)
+    target.add_argument("target", help="the ConfigVersions class as package.module:ClassName")
+
+    selection = argparse.ArgumentParser(add_help=False)
+    selection.add_argument("-k", "--match", help="only use versions matching a glob pattern")
+
+    workers = argparse.ArgumentParser(add_help=False)
+    workers.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=None,
+        help="number of worker processes, defaults to the number of CPUs, 0 to not use workers",
+    )
+
+    commands.add_parser(
+        "list", parents=[target, selection], help="list the names of all versions"
+    ).set_defaults(run=_list)
+
+    commands.add_parser(
+        "validate",
+        parents=[target, selection, workers],
+        help="load and validate all versions in parallel",
+    ).set_defaults(run=_validate)
+
+    diff = commands.add_parser(
+        "diff", parents=[target], help="show the differences between the configs of two versions"
+    )
+    diff.add_argument("old", help="the name of the first version")
+    diff.add_argument("new", help="the name of the second version")
+    diff.set_defaults(run=_diff)
+
+    export = commands.add_parser(
+        "export",
+        parents=[target, selection, workers],
+        help="write the configs of all versions to files in parallel",
+    )
+    export.add_argument("directory", help="the folder to write the files to")
+    export.add_argument("-f", "--format", choices=("json", "yaml"), default="json")
+    export.set_defaults(run=_export)
+
+    collection = argparse.ArgumentParser(add_help=False)
+    collection.add_argument(
+        "target", help="the ConfigVersions class as package.module:ClassName, or a folder"
+    )
+
+    bundle = commands.add_parser(
+        "bundle", parents=[collection], help="pack all versions in a single bundle file"
+    )
+    bundle.add_argument("bundle", help="the path of the bundle file")
+    bundle.set_defaults(run=_bundle)
+
+    commands.add_parser(
+        "duplicates",
+        parents=[collection],
+        help="list the groups of versions loaded from files with identical contents",
+    ).set_defaults(run=_duplicates)
+
+    return parser
+
+
+def main(argv: Sequence[str] | None = None, output: TextIO | None = None) -> int:
+    """Run the command line interface.
+
+    Args:
+        argv (Sequence[str] | None): The command line arguments, defaults to `sys.argv`
+        output (TextIO | None): The stream to write the output to, defaults to `sys.stdout`
+
+    Returns:
+        int: The exit code
+    """
+    arguments = _parser().parse_args(argv)
+    return arguments.run(arguments, output or sys.stdout)
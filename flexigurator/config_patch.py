@@ -1,12 +1,135 @@
-from contextlib import contextmanager
-from typing import Any, Iterator, Type
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import AbstractContextManager, asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import cache
+from types import MappingProxyType
+from typing import Any, AsyncIterator, Callable, Hashable, Iterator, Mapping, Type
 
 from confz import ConfZ, ConfZDataSource, ConfZSource
+from confz.confz import ConfZSources
+
+from flexigurator.instance_cache import config_cache
+from flexigurator.instrumentation import instrumentation
+from flexigurator.patch_stack import PatchLayer
+
+
+@dataclass
+class _ContextState:
+    CONFIG_SOURCES: ConfZSources | None
+    confz_instance: ConfZ | None = None
+
+
+_context_states: ContextVar[Mapping[type, _ContextState]] = ContextVar(
+    "flexigurator_context_states", default=MappingProxyType({})
+)
+_class_values: dict[type, dict[str, Any]] = {}
+_context_metaclasses: dict[type, type] = {}
+_install_lock = threading.Lock()
+
+# Configs being loaded by a thread, so concurrent loads of the same sources wait for that thread
+_loading: dict[Hashable, Future[ConfZ]] = {}
+_loading_lock = threading.Lock()
+
+# Held while the global sources of a config class change, see `_replace_instance`
+_sources_lock = threading.Lock()
+
+
+class _ContextClassAttribute:
+    """Data descriptor on a metaclass resolving a class attribute in the current context.
+
+    Within a context local patch the value is read from and written to the patch of the current
+    context, otherwise the value is shared by all contexts like a regular class attribute.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __get__(self, cls: Any, metaclass: Any = None) -> Any:
+        if cls is None:
+            return self
+
+        state = _context_states.get().get(cls)
+        if state is not None:
+            return getattr(state, self._name)
+
+        # Look the attribute up like a class attribute, `ConfZ` itself defines a default value
+        values = next(
+            values
+            for klass in cls.__mro__
+            for values in (_class_values.get(klass, {}), vars(klass))
+            if self._name in values
+        )
+        return values[self._name]
+
+    def __set__(self, cls: Any, value: Any) -> None:
+        state = _context_states.get().get(cls)
+        if state is not None:
+            setattr(state, self._name, value)
+        else:
+            _class_values.setdefault(cls, {})[self._name] = value
+
+
+def _make_context_local(config_class: Type[ConfZ]) -> None:
+    # ConfZ reads the sources and the singleton instance from class attributes, so replace the
+    # metaclass by a subclass which resolves those attributes through the current context
+    with _install_lock:
+        metaclass = type(config_class)
+        if metaclass in _context_metaclasses.values():
+            return
+
+        if metaclass not in _context_metaclasses:
+            _context_metaclasses[metaclass] = type(
+                f"ContextLocal{metaclass.__name__}",
+                (metaclass,),
+                {
+                    name: _ContextClassAttribute(name)
+                    for name in ("CONFIG_SOURCES", "confz_instance")
+                },
+            )
+        config_class.__class__ = _context_metaclasses[metaclass]  # type: ignore
+
+
+@contextmanager
+def _change_context_sources(config_class: Type[ConfZ], sources: ConfZSources) -> Iterator[None]:
+    _make_context_local(config_class)
+
+    states = dict(_context_states.get())
+    states[config_class] = _ContextState(sources)
+    token = _context_states.set(MappingProxyType(states))
+    try:
+        yield
+    finally:
+        _context_states.reset(token)
+
+
+def _patched_sources(
+    config_class: Type[ConfZ],
+    data: dict[str, Any] | ConfZSource | list[ConfZSource] | tuple[ConfZSource, ...],
+) -> list[ConfZSource]:
+    if isinstance(data, dict):
+        data = ConfZDataSource(data)
+
+    if not isinstance(data, (list, tuple)):
+        data = [data]
+
+    original_sources = config_class.CONFIG_SOURCES
+
+    if original_sources is None:
+        return list(data)
+
+    # The original sources are referred to rather than copied, so nested patches form a stack
+    parent = tuple(original_sources) if isinstance(original_sources, list) else (original_sources,)
+    return [PatchLayer(parent, tuple(data))]
 
 
 @contextmanager
 def patch_config(
-    config_class: Type[ConfZ], data: dict[str, Any] | ConfZSource | list[ConfZSource]
+    config_class: Type[ConfZ],
+    data: dict[str, Any] | ConfZSource | list[ConfZSource] | tuple[ConfZSource, ...],
+    context_local: bool = False,
 ) -> Iterator[None]:
     """Patch a config class with additional sources.
 
@@ -15,32 +138,198 @@ def patch_config(
     a single test instance. Importantly, the provided configuration does not need to be complete,
     as long as the original configuration sources are.
 
+    Validated config instances are memoized in `config_cache`, so re-entering a patch with the same
+    sources (and unchanged files) does not load and validate the configuration again.
+
+    By default the patch is global, so it is seen by all threads and asyncio tasks. A context local
+    patch is only seen by the current thread or task (and the tasks it starts), which allows
+    running differently patched configs concurrently. Listeners registered with
+    `ConfZ.depends_on` are not notified of context local patches.
+
     Args:
         config_class (Type[ConfZ]): The ConfZ config class
-        data (dict[str, Any] | ConfZSource | list[ConfZSource]): A source of configuration in the
-            form of a dictionary or one or more ConfZ sources
+        data (dict[str, Any] | ConfZSource | list[ConfZSource] | tuple[ConfZSource, ...]): A source
+            of configuration in the form of a dictionary or one or more ConfZ sources
+        context_local (bool): Only patch the config class in the current context
 
     Yields:
         None: This context manager does not yield
 
     """
-    if isinstance(data, dict):
-        data = ConfZDataSource(data)
+    with instrumentation.span("patch_config.sources", config_class=config_class.__name__):
+        patched_sources = _patched_sources(config_class, data)
+        cache_key = config_cache.key(config_class, patched_sources)
 
-    if not isinstance(data, list):
-        data = [data]
+    with _change_sources(config_class, patched_sources, context_local):
+        cached = config_class.confz_instance = config_cache.get(cache_key)
+        try:
+            yield
+        finally:
+            if config_class.confz_instance is not cached:
+                _store_instance(
+                    config_class, patched_sources, cache_key, config_class.confz_instance
+                )
 
-    original_sources = config_class.CONFIG_SOURCES
-    patched_sources: list[ConfZSource]
 
-    if original_sources is None:
-        patched_sources = []
-    elif not isinstance(original_sources, list):
-        patched_sources = [original_sources]
+def _change_sources(
+    config_class: Type[ConfZ], sources: list[ConfZSource], context_local: bool
+) -> AbstractContextManager:
+    if context_local:
+        return _change_context_sources(config_class, sources)
+    return _change_global_sources(config_class, sources)
+
+
+@contextmanager
+def _change_global_sources(config_class: Type[ConfZ], sources: list[ConfZSource]) -> Iterator[None]:
+    # ConfZ swaps the sources and the instance together, which must not interleave with a reload
+    manager = config_class.change_config_sources(sources)
+    with _sources_lock:
+        manager.__enter__()
+    try:
+        yield
+    finally:
+        with _sources_lock:
+            manager.__exit__(None, None, None)
+
+
+def _replace_instance(config_class: Type[ConfZ], sources: Any, instance: ConfZ) -> None:
+    """Replace the (global) instance of a config class, if it is still loaded from the sources.
+
+    The instance may be loaded while a patch is entered or left, it then belongs to other sources
+    than the config class is loaded from and is dropped.
+
+    Args:
+        config_class (Type[ConfZ]): The ConfZ config class
+        sources (Any): The `CONFIG_SOURCES` the instance was loaded from
+        instance (ConfZ): The new instance
+    """
+    with _sources_lock:
+        if config_class.CONFIG_SOURCES is sources:
+            config_class.confz_instance = instance
+
+
+def _store_instance(
+    config_class: Type[ConfZ],
+    sources: list[ConfZSource],
+    cache_key: Hashable | None,
+    instance: ConfZ | None,
+) -> None:
+    # Files may have changed since the key was created, the instance is then loaded from other
+    # contents than the key refers to
+    if cache_key is not None and config_cache.key(config_class, sources) == cache_key:
+        config_cache.put(cache_key, instance)
+
+
+def _load_instance(config_class: Type[ConfZ], sources: list[ConfZSource]) -> ConfZ:
+    """Load and validate a config from its sources, or return it from the `config_cache`.
+
+    A config which is already being loaded by another thread is not loaded again, but awaited.
+
+    Args:
+        config_class (Type[ConfZ]): The ConfZ config class
+        sources (list[ConfZSource]): The sources to load the config from
+
+    Returns:
+        ConfZ: The validated config
+
+    Raises:
+        BaseException: The error raised while loading or validating the config
+    """
+    cache_key = config_cache.key(config_class, sources)
+    if cache_key is None:
+        return config_class(config_sources=sources)
+
+    with _loading_lock:
+        instance = config_cache.get(cache_key)
+        if instance is not None:
+            return instance
+
+        future = _loading.get(cache_key)
+        if future is not None:
+            owner = False
+        else:
+            owner = True
+            future = _loading[cache_key] = Future()
+
+    if not owner:
+        return future.result()
+
+    try:
+        instance = config_class(config_sources=sources)
+    except BaseException as error:
+        future.set_exception(error)
+        raise
     else:
-        patched_sources = list(original_sources)
+        _store_instance(config_class, sources, cache_key, instance)
+        future.set_result(instance)
+    finally:
+        with _loading_lock:
+            del _loading[cache_key]
+    return instance
+
 
-    patched_sources += data
+@asynccontextmanager
+async def apatch_config(
+    config_class: Type[ConfZ],
+    data: dict[str, Any] | ConfZSource | list[ConfZSource] | tuple[ConfZSource, ...],
+    context_local: bool = True,
+) -> AsyncIterator[None]:
+    """Patch a config class with additional sources, see `patch_config`.
 
-    with config_class.change_config_sources(patched_sources):
+    Unlike `patch_config`, the patched config is loaded and validated when the patch is entered, in
+    a worker thread, so reading files does not block the event loop. Validation errors are
+    therefore raised when entering the patch. The patch is context local by default, so it only
+    affects the current asyncio task (and the tasks it starts).
+
+    Args:
+        config_class (Type[ConfZ]): The ConfZ config class
+        data (dict[str, Any] | ConfZSource | list[ConfZSource] | tuple[ConfZSource, ...]): A source
+            of configuration in the form of a dictionary or one or more ConfZ sources
+        context_local (bool): Only patch the config class in the current context
+
+    Yields:
+        None: This context manager does not yield
+
+    """
+    # asyncio takes long to import, and is only needed by asyncio applications which imported it
+    import asyncio
+
+    patched_sources = _patched_sources(config_class, data)
+    instance = await asyncio.to_thread(_load_instance, config_class, patched_sources)
+
+    with _change_sources(config_class, patched_sources, context_local):
+        config_class.confz_instance = instance
         yield
+
+
+@cache
+def _prefetch_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(thread_name_prefix="flexigurator-prefetch")
+
+
+def _prefetch(load: Callable[[], ConfZ]) -> Future[ConfZ]:
+    # The context is copied, so the patched sources of context local patches are seen
+    context = contextvars.copy_context()
+    return _prefetch_executor().submit(lambda: context.run(load))
+
+
+def prefetch_config(
+    config_class: Type[ConfZ],
+    data: dict[str, Any] | ConfZSource | list[ConfZSource] | tuple[ConfZSource, ...],
+) -> Future[ConfZ]:
+    """Load and validate a patched config in a background thread, before the patch is entered.
+
+    The config is stored in the `config_cache`, so a later `patch_config` or `apatch_config` with
+    the same data uses it, and `apatch_config` awaits it while it is still loading. Configs loaded
+    from sources which cannot be cached (e.g. environment variables) are not reused.
+
+    Args:
+        config_class (Type[ConfZ]): The ConfZ config class
+        data (dict[str, Any] | ConfZSource | list[ConfZSource] | tuple[ConfZSource, ...]): A source
+            of configuration in the form of a dictionary or one or more ConfZ sources
+
+    Returns:
+        Future[ConfZ]: The validated config, or the error raised while loading it
+    """
+    patched_sources = _patched_sources(config_class, data)
+    return _prefetch(lambda: _load_instance(config_class, patched_sources))
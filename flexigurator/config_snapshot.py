@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import copy
+from dataclasses import dataclass, field
+from typing import Hashable, Iterable
+
+from confz import ConfZDataSource, ConfZSource
+from confz.loaders import Loader, get_loader, register_loader
+
+
+@dataclass
+class SnapshotSource(ConfZDataSource):
+    """A `ConfZDataSource` holding the merged data of a stack of config sources.
+
+    The data is shared by all configs loaded from the snapshot, so it must not be modified. The
+    snapshot is identified by its `key` rather than its (possibly large) data in the `config_cache`.
+    """
+
+    key: Hashable = field(default_factory=object, compare=False, repr=False)
+
+
+class SnapshotLoader(Loader):
+    """Config loader for `SnapshotSource`s."""
+
+    @classmethod
+    def populate_config(cls, config: dict, confz_source: SnapshotSource):
+        # Populating the config modifies nested dictionaries, so keep the snapshot intact
+        cls.update_dict_recursively(config, copy.deepcopy(confz_source.data))
+
+
+register_loader(SnapshotSource, SnapshotLoader)
+
+
+def snapshot_sources(sources: Iterable[ConfZSource]) -> SnapshotSource:
+    """Merge a stack of config sources into a single source.
+
+    The sources are loaded once, so later changes to them (e.g. to files or environment variables)
+    are not reflected by the snapshot.
+
+    Args:
+        sources (Iterable[ConfZSource]): The sources in order of precedence
+
+    Returns:
+        SnapshotSource: A source holding the merged data of the sources
+    """
+    data: dict = {}
+
+    for source in sources:
+        get_loader(type(source)).populate_config(data, source)
+
+    # Detach the merged data from the data of the sources
+    return SnapshotSource(copy.deepcopy(data))
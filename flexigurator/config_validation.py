@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import itertools
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, Sequence, Type
+
+from confz import ConfZ, ConfZSource
+
+from flexigurator.lazy_validation import LazyValidation
+
+VersionPlan = tuple[str, Sequence[ConfZSource]]
+VersionAction = Callable[[str, ConfZ], None]
+
+
+@dataclass(frozen=True)
+class VersionResult:
+    """The outcome of loading and validating a single config version."""
+
+    version: str
+    duration: float
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass(frozen=True)
+class ValidationReport:
+    """The outcomes of validating many config versions."""
+
+    results: tuple[VersionResult, ...]
+    duration: float
+
+    @property
+    def failures(self) -> tuple[VersionResult, ...]:
+        return tuple(result for result in self.results if not result.ok)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures
+
+
+def _validate_version(
+    config_class: Type[ConfZ], plan: VersionPlan, action: VersionAction | None
+) -> VersionResult:
+    version_name, sources = plan
+    start = time.perf_counter()
+
+    try:
+        config = config_class(config_sources=list(sources))
+        if isinstance(config, LazyValidation):
+            config.validate_lazy_fields()
+        if action is not None:
+            action(version_name, config)
+    except Exception as error:  # pylint: disable=W0718
+        # Report the error as text, as not every exception can be sent back from a worker process
+        return VersionResult(
+            version_name, time.perf_counter() - start, f"{type(error).__name__}: {error}"
+        )
+
+    return VersionResult(version_name, time.perf_counter() - start)
+
+
+def _validate_batch(
+    config_class: Type[ConfZ], plans: list[VersionPlan], action: VersionAction | None
+) -> list[VersionResult]:
+    return [_validate_version(config_class, plan, action) for plan in plans]
+
+
+def validate_versions(
+    config_class: Type[ConfZ],
+    plans: Iterable[VersionPlan],
+    max_workers: int | None = None,
+    batch_size: int = 16,
+    action: VersionAction | None = None,
+) -> Iterator[VersionResult]:
+    """Load and validate config versions in a pool of worker processes.
+
+    Versions are sent to the workers in batches and only a few batches are in flight at a time, so
+    the plans are consumed and the results are produced lazily.
+
+    Args:
+        config_class (Type[ConfZ]): The config class to validate the versions with, it must be
+            importable by the worker processes
+        plans (Iterable[VersionPlan]): The names of the versions and the sources to load them from
+        max_workers (int | None): The number of worker processes, defaults to the number of CPUs,
+            `0` validates the versions in the current process
+        batch_size (int): The number of versions validated per task of a worker
+        action (VersionAction | None): Called by the workers with the name and the config of every
+            valid version (e.g. to export it), it must be importable as well. An exception raised by
+            the action is reported as error of the version.
+
+    Yields:
+        VersionResult: The result of every version, in the order of the plans
+    """
+    plans_iterator = iter(plans)
+    batches = iter(lambda: list(itertools.islice(plans_iterator, batch_size)), [])
+
+    if max_workers == 0:
+        for batch in batches:
+            yield from _validate_batch(config_class, batch, action)
+        return
+
+    max_workers = max_workers or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(max_workers) as executor:
+        pending: deque[Future[list[VersionResult]]] = deque()
+
+        for batch in batches:
+            pending.append(executor.submit(_validate_batch, config_class, batch, action))
+            # Keep every worker busy, without submitting all versions up front
+            if len(pending) > 2 * max_workers:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
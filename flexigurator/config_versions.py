@@ -1,14 +1,34 @@
 from __future__ import annotations
 
+import os
+import time
 from abc import ABC, abstractmethod
-from contextlib import contextmanager
-from functools import reduce
+from concurrent.futures import Future
+from contextlib import asynccontextmanager, contextmanager
 from pathlib import Path
-from typing import Any, Mapping, Type, TypeVar
+from typing import Any, Callable, ClassVar, Iterable, Iterator, Mapping, Type, TypeVar
 
 from confz import ConfZ, ConfZDataSource, ConfZFileSource, ConfZSource
 
-from flexigurator.config_patch import patch_config
+from flexigurator.config_patch import (
+    _load_instance,
+    _patched_sources,
+    _prefetch,
+    _replace_instance,
+    apatch_config,
+    patch_config,
+)
+from flexigurator.config_snapshot import SnapshotSource, snapshot_sources
+from flexigurator.config_validation import (
+    ValidationReport,
+    VersionAction,
+    VersionResult,
+    validate_versions,
+)
+from flexigurator.file_cache import CachedFileSource, parsed_files
+from flexigurator.file_watcher import FileWatcher
+from flexigurator.instrumentation import instrumentation
+from flexigurator.patch_stack import PatchLayer
 
 ConfigSource = ConfZSource | list[ConfZSource]
 
@@ -16,16 +36,16 @@ ConfigSource = ConfZSource | list[ConfZSource]
 T = TypeVar("T")
 
 
-def _flatten(a: T | list[T], b: T | list[T]) -> list[T]:
-    joined = [a] + [b]
+def _flatten(*sources: T | list[T]) -> tuple[T, ...]:
+    flattened: list[T] = []
 
-    def expand(agg: list[T], item: T | list[T]) -> list[T]:
-        if isinstance(item, list):
-            return agg + item
-        return agg + [item]
+    for source in sources:
+        if isinstance(source, list):
+            flattened.extend(source)
+        else:
+            flattened.append(source)
 
-    result = reduce(expand, joined, [])  # type: ignore
-    return result  # type: ignore
+    return tuple(flattened)
 
 
 def is_config_source(source: Any):
@@ -36,20 +56,111 @@ def is_config_source(source: Any):
     )
 
 
+def _file_paths(source: Any) -> Iterator[Path]:
+    # The paths of the files a config source (or list of sources) is loaded from
+    sources = source if isinstance(source, list) else [source]
+
+    for item in sources:
+        if isinstance(item, PatchLayer):
+            yield from _file_paths([*item.parent, *item.sources])
+        elif isinstance(item, ConfZFileSource) and isinstance(item.file, (str, os.PathLike)):
+            file_path = Path(item.file)
+            yield Path(item.folder) / file_path if item.folder is not None else file_path
+
+
 class _VersionCollection(ABC):
     """Hold a collection of configuration versions."""
 
+    # Incremented whenever the versions of any collection change, so compiled plans become stale
+    index_generation: ClassVar[int] = 0
+
     @abstractmethod
     def _load_sources(self) -> None:
         """Lazily load the config version sources."""
 
+    @abstractmethod
+    def _items(self) -> Iterable[tuple[str, Any]]:
+        """Return the names and sources of the versions in this collection."""
+
+    def _source(self, name: str) -> Any:
+        """Return the source of a version or nested collection in this collection.
+
+        Args:
+            name (str): The name of the version or nested collection (without dots)
+
+        Returns:
+            Any: The source, or `None` when there is no such attribute
+        """
+        return getattr(self, name, None)
+
+    def versions(self) -> Iterator[str]:
+        """Iterate over the names of all versions, including those in nested collections.
+
+        Yields:
+            str: The (dotted) name of a version, which can be passed to `get`
+        """
+        self._load_sources()
+
+        for name, source in self._items():
+            if isinstance(source, _VersionCollection):
+                yield from (f"{name}.{version_name}" for version_name in source.versions())
+            elif source and is_config_source(source):
+                yield name
+
+    def watch(self, interval: float = 1.0) -> FileWatcher:
+        """Start watching the files and folders of all versions for changes.
+
+        When files change their cached contents are dropped, the active config is reloaded (for a
+        `ConfigVersions`), and the subscribers are called with the changed paths.
+
+        Args:
+            interval (float): Number of seconds between checks for changes
+
+        Returns:
+            FileWatcher: The started watcher, call `stop` on it to stop watching
+        """
+        return FileWatcher(self._watched_paths, self._on_change, interval).start()
+
+    def subscribe(self, callback: Callable[[list[Path]], None]) -> None:
+        """Register a callback which is called with the changed paths when watching for changes.
+
+        Args:
+            callback (Callable[[list[Path]], None]): The callback
+        """
+        vars(self).setdefault("_subscribers", []).append(callback)
+
+    def _on_change(self, changed: list[Path]) -> None:
+        for path in changed:
+            parsed_files.invalidate(path)
+
+        self._reload(changed)
+
+        for callback in list(vars(self).get("_subscribers", [])):
+            callback(changed)
+
+    def _reload(self, changed: list[Path]) -> None:
+        """Reload state depending on the changed paths.
+
+        Args:
+            changed (list[Path]): The changed paths
+        """
+
+    def _watched_paths(self) -> Iterator[Path]:
+        self._load_sources()
+
+        for _, source in self._items():
+            if isinstance(source, _VersionCollection):
+                yield from source._watched_paths()  # pylint: disable=W0212
+            else:
+                yield from _file_paths(source)
+
     def get(self, version_name: str) -> ConfigSource:
         self._load_sources()
 
         version_name_split = version_name.split(".", maxsplit=1)
         source_name = version_name_split[0]
 
-        source = getattr(self, source_name, None)
+        source = self._source(source_name)
 
         if not source:
             raise AttributeError(f"Version source does not exist: {source_name}")
@@ -68,39 +179,149 @@ class _VersionCollection(ABC):
 
         return source  # type: ignore
 
+    def duplicates(self) -> list[list[str]]:
+        """Find the versions which are loaded from files with identical contents.
+
+        Identical files share their parsed contents and config instances, this shows which versions
+        could be replaced by a single one. Only versions consisting of a single file are compared.
+
+        Returns:
+            list[list[str]]: The sorted groups of (dotted) version names with identical files
+        """
+        groups: dict[bytes, list[str]] = {}
+        for version_name in self.versions():
+            source = self.get(version_name)
+            if not isinstance(source, ConfZFileSource):
+                continue
+
+            for file_path in _file_paths(source):
+                try:
+                    digest = parsed_files.digest(file_path)
+                except OSError:
+                    continue
+                groups.setdefault(digest, []).append(version_name)
+
+        return sorted(sorted(names) for names in groups.values() if len(names) > 1)
+
 
 class DirectorySource(_VersionCollection):
     """Hold a collection of version sources located in a folder.
 
+    The folder is indexed on first use and the index is kept in memory. The folder is only rescanned
+    when its modification time changes (i.e. files or folders are added, removed or renamed) or when
+    `refresh` is called. Re-indexing a folder drops the compiled version plans of `ConfigVersions`.
+    Symlinked folders are skipped, so links cannot form cycles, symlinked files are versions.
+
     Args:
         path (Path): Path to the folder containing the `.yaml` configuration files
 
     """
 
     _path: Path
+    _versions: dict[str, CachedFileSource | DirectorySource]
+    _indexed_mtime: int | None
 
     def __init__(self, path: Path):
         super().__init__()
         self._path = path
+        self._versions = {}
+        self._indexed_mtime = None
+
+    def refresh(self) -> None:
+        """Invalidate the index of this folder and all nested folders.
+
+        The folders are rescanned the next time a version is requested. This is useful on file
+        systems where modification times are too coarse to notice changes.
+        """
+        self._indexed_mtime = None
+        _VersionCollection.index_generation += 1
+        for version_source in self._versions.values():
+            if isinstance(version_source, DirectorySource):
+                version_source.refresh()
+
+    def _items(self) -> Iterable[tuple[str, Any]]:
+        return self._versions.items()
+
+    def _source(self, name: str) -> Any:
+        return self._versions.get(name)
+
+    def _watched_paths(self) -> Iterator[Path]:
+        yield self._path
+        yield from super()._watched_paths()
 
     def _load_sources(self) -> None:
-        self._set_versions(self._load_versions(self._path))
+        mtime = _directory_mtime(self._path)
+
+        if mtime != self._indexed_mtime:
+            if mtime is None:
+                # The folder was removed, so none of its versions exist anymore
+                self._set_versions({})
+            else:
+                with instrumentation.span("directory.scan", path=str(self._path)):
+                    self._set_versions(self._load_versions(self._path, self._versions))
+            self._indexed_mtime = mtime
+            _VersionCollection.index_generation += 1
 
     @staticmethod
-    def _load_versions(path: Path) -> Mapping[str, ConfZFileSource | DirectorySource]:
-        versions = dict[str, ConfZFileSource | DirectorySource]()
-        for sub_path in path.glob("*"):
-            if sub_path.suffix == ".yaml":
-                name = sub_path.stem
-                versions[name] = ConfZFileSource(sub_path)
-            if sub_path.is_dir():
+    def _load_versions(
+        path: Path, known: Mapping[str, CachedFileSource | DirectorySource]
+    ) -> Mapping[str, CachedFileSource | DirectorySource]:
+        versions = dict[str, CachedFileSource | DirectorySource]()
+
+        with os.scandir(path) as entries:
+            entries_list = list(entries)
+
+        for entry in entries_list:
+            sub_path = path / entry.name
+            if entry.is_dir(follow_symlinks=False):
                 name = sub_path.name
-                versions[name] = DirectorySource(sub_path)
+                versions[name] = _reuse(known.get(name), DirectorySource, sub_path)
+            elif sub_path.suffix == ".yaml":
+                name = sub_path.stem
+                versions[name] = _reuse(known.get(name), CachedFileSource, sub_path)
         return versions
 
-    def _set_versions(self, configs: Mapping[str, ConfigSource | DirectorySource]) -> None:
+    def _set_versions(self, configs: Mapping[str, CachedFileSource | DirectorySource]) -> None:
+        # Versions are also attributes, unless they would hide a method or private attribute
+        for name in self._versions.keys() - configs.keys():
+            if vars(self).get(name) is self._versions[name]:
+                delattr(self, name)
+
         for name, version_source in configs.items():
-            setattr(self, name, version_source)
+            if not name.startswith("_") and not hasattr(type(self), name):
+                setattr(self, name, version_source)
+
+        self._versions = dict(configs)
+
+
+def _directory_mtime(path: Path) -> int | None:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+SourceT = TypeVar("SourceT", CachedFileSource, DirectorySource)
+
+
+def _reuse(known: Any, source_type: Type[SourceT], path: Path) -> SourceT:
+    # Keep the existing source for an unchanged entry so nested folders keep their own index
+    if isinstance(known, source_type):
+        return known
+    return source_type(path)
+
+
+def _reload_config(config_class: Type[ConfZ], changed: list[Path]) -> None:
+    # Atomically swap the active config instance if it was loaded from a changed file
+    if config_class.confz_instance is None:
+        return
+
+    sources = config_class.CONFIG_SOURCES
+    changed_paths = {path.absolute() for path in changed}
+    config_paths = {path.absolute() for path in _file_paths(sources)}
+
+    if changed_paths & config_paths:
+        _replace_instance(config_class, sources, config_class(config_sources=sources))
 
 
 class ConfigVersions(_VersionCollection):
@@ -109,6 +330,7 @@ class ConfigVersions(_VersionCollection):
     One should implement this class in a config versions class (e.g. `Configs`). Fields pointing to
     `ConfZSource`s, `DirectorySource`s, or dictionaries can then be added to load configuration
     versions. These versions can then be loaded using `Configs.version` as a context manager.
+    Versions cannot be named like the methods of `ConfigVersions` (e.g. `plan` or `validate`).
 
     Example:
         class Config(ConfZ):  # type: ignore
@@ -132,22 +354,195 @@ class ConfigVersions(_VersionCollection):
             cls._instance = super().__new__(cls)
         return cls._instance
 
+    def __init_subclass__(cls, **kwargs: Any):
+        super().__init_subclass__(**kwargs)
+
+        # A version named like a method of the collection would replace that method
+        for name, source in vars(cls).items():
+            if (
+                hasattr(ConfigVersions, name)
+                and not name.startswith("_")
+                and (is_config_source(source) or isinstance(source, _VersionCollection))
+            ):
+                raise AttributeError(f"Version name is reserved by ConfigVersions: {name}")
+
     def _load_sources(self) -> None:
         pass
 
-    @contextmanager
-    def version(self, version_name: str, config_class: Type[ConfZ] | None = None):
-        """Select a version from the collection and patch the supplied config class.
+    def versions(self) -> Iterator[str]:
+        """Iterate over the names of all versions, including those in nested collections.
+
+        The `BASE` version is not listed, as it is loaded before the other versions rather than
+        being a (complete) version on its own.
+
+        Yields:
+            str: The (dotted) name of a version, which can be passed to `get`
+        """
+        yield from (version_name for version_name in super().versions() if version_name != "BASE")
+
+    def _items(self) -> Iterable[tuple[str, Any]]:
+        # Versions are the public class attributes defined on the subclasses
+        for name in dir(type(self)):
+            if (
+                not name.startswith("_")
+                and name != "CONFIG_CLASS"
+                and not hasattr(ConfigVersions, name)
+            ):
+                yield name, getattr(self, name)
+
+    def _reload(self, changed: list[Path]) -> None:
+        vars(self)["_snapshots"] = {}
+        config_class = getattr(self, "CONFIG_CLASS", None)
+
+        if isinstance(config_class, type) and issubclass(config_class, ConfZ):
+            _reload_config(config_class, changed)
+
+    def plan(self, version_name: str) -> tuple[ConfZSource, ...]:
+        """Return the flattened sources of a version, including the `BASE` version.
+
+        The plan is compiled on first use and reused afterwards, so switching to a version does not
+        resolve its name again. Plans are recompiled after a folder of a `DirectorySource` is
+        re-indexed (or a `BundleSource` is opened again), which happens when requesting a version
+        with `get`, listing the `versions`, on `refresh` and when watching for changes. Reusing a
+        plan checks the modification times of the folders its version was resolved from, so a
+        removed version is noticed like it is by `get`.
 
         Args:
             version_name (str): The name of the configuration version (i.e. the field name)
-            config_class (Type[ConfZ]): The configuration class to patch
 
-        Yields:
-            ...
+        Returns:
+            tuple[ConfZSource, ...]: The sources of the version, in order of precedence
+        """
+        plans: dict[
+            str, tuple[int, tuple[_VersionCollection, ...], tuple[ConfZSource, ...]]
+        ] = vars(self).setdefault("_plans", {})
+        generation, collections, sources = plans.get(version_name, (None, (), ()))
+
+        for collection in collections:
+            # Re-indexes a changed folder, which starts a new generation
+            collection._load_sources()  # pylint: disable=W0212
+
+        if generation != _VersionCollection.index_generation:
+            with instrumentation.span("versions.plan", version=version_name):
+                base = [self.get("BASE")] if hasattr(self, "BASE") else []
+                sources = _flatten(*base, self.get(version_name))  # type: ignore
+                collections = self._collections(version_name)
+            # Resolving the version may index folders, so the plan belongs to the new generation
+            generation = _VersionCollection.index_generation
+            plans[version_name] = (generation, collections, sources)
+
+        return sources
+
+    def _collections(self, version_name: str) -> tuple[_VersionCollection, ...]:
+        # The nested collections a (resolved) version name refers to, a bundle resolves the rest
+        collections = []
+        collection: Any = self
+        for name in version_name.split(".")[:-1]:
+            collection = collection._source(name)  # pylint: disable=W0212
+            if not isinstance(collection, _VersionCollection):
+                break
+            collections.append(collection)
+        return tuple(collections)
+
+    def snapshot(self, version_name: str) -> SnapshotSource:
+        """Return the sources of the plan of a version merged into a single source.
+
+        The snapshot is taken on first use and reused until the plan is recompiled, `compile` is
+        called, or a file change is noticed while watching for changes.
+
+        Args:
+            version_name (str): The name of the configuration version (i.e. the field name)
+
+        Returns:
+            SnapshotSource: The merged sources of the version
+        """
+        snapshots: dict[str, tuple[tuple[ConfZSource, ...], SnapshotSource]] = vars(
+            self
+        ).setdefault("_snapshots", {})
+        plan = self.plan(version_name)
+        snapshot_plan, version_snapshot = snapshots.get(version_name, (None, None))
+
+        if snapshot_plan is not plan or version_snapshot is None:
+            with instrumentation.span("versions.snapshot", version=version_name):
+                version_snapshot = snapshot_sources(plan)
+            snapshots[version_name] = (plan, version_snapshot)
+
+        return version_snapshot
+
+    def compile(self) -> None:
+        """Compile the plans of all versions, e.g. at startup, so switching versions is fast.
+
+        Call this again after adding or changing versions at runtime.
+        """
+        vars(self)["_plans"] = {}
+        vars(self)["_snapshots"] = {}
+        for version_name in self.versions():
+            self.plan(version_name)
+
+    def validate(
+        self,
+        version_names: Iterable[str] | None = None,
+        config_class: Type[ConfZ] | None = None,
+        max_workers: int | None = None,
+        action: VersionAction | None = None,
+    ) -> Iterator[VersionResult]:
+        """Load and validate versions in parallel, producing the results while validating.
+
+        The versions are validated in a pool of worker processes, so the config class must be
+        importable (i.e. not defined inside a function). Versions are resolved and validated lazily,
+        so any number of versions can be validated without holding them all in memory.
+
+        Args:
+            version_names (Iterable[str] | None): The versions to validate, defaults to all versions
+                including those in nested collections
+            config_class (Type[ConfZ]): The configuration class to validate the versions with
+            max_workers (int | None): The number of worker processes, defaults to the number of
+                CPUs, `0` validates the versions in the current process
+            action (VersionAction | None): Called by the workers with the name and the config of
+                every valid version, see `validate_versions`
+
+        Returns:
+            Iterator[VersionResult]: The result and duration of loading every version, in order
+        """
+        config_class = self._config_class(config_class)
+
+        plans = (
+            (version_name, _patched_sources(config_class, self.plan(version_name)))
+            for version_name in (self.versions() if version_names is None else version_names)
+        )
+        return validate_versions(config_class, plans, max_workers, action=action)
+
+    def validate_all(
+        self, config_class: Type[ConfZ] | None = None, max_workers: int | None = None
+    ) -> ValidationReport:
+        """Load and validate all versions, including those in nested collections, in parallel.
+
+        See `validate` for the requirements on the config class.
+
+        Args:
+            config_class (Type[ConfZ]): The configuration class to validate the versions with
+            max_workers (int | None): The number of worker processes, defaults to the number of
+                CPUs, `0` validates the versions in the current process
+
+        Returns:
+            ValidationReport: The result and duration of loading every version
+        """
+        start = time.perf_counter()
+        results = tuple(self.validate(config_class=config_class, max_workers=max_workers))
+
+        return ValidationReport(results, time.perf_counter() - start)
+
+    def _config_class(self, config_class: Type[ConfZ] | None) -> Type[ConfZ]:
+        """Return the given config class or the `CONFIG_CLASS` of the collection.
+
+        Args:
+            config_class (Type[ConfZ] | None): The config class given as parameter
+
+        Returns:
+            Type[ConfZ]: The config class
 
         Raises:
-            AttributeError: When no config class is given or the version does not exist
+            AttributeError: When no config class is given nor set as `CONFIG_CLASS`
         """
         config_class = config_class or getattr(self, "CONFIG_CLASS", None)
 
@@ -155,12 +550,92 @@ class ConfigVersions(_VersionCollection):
             raise AttributeError(
                 'Need to supply "config_class" as parameter or "CONFIG_CLASS" in ConfigVersions!'
             )
+        return config_class
+
+    @contextmanager
+    def version(
+        self,
+        version_name: str,
+        config_class: Type[ConfZ] | None = None,
+        context_local: bool = False,
+        snapshot: bool = False,
+    ):
+        """Select a version from the collection and patch the supplied config class.
+
+        An `AttributeError` is raised when no config class is given or the version does not exist.
+
+        Args:
+            version_name (str): The name of the configuration version (i.e. the field name)
+            config_class (Type[ConfZ]): The configuration class to patch
+            context_local (bool): Only patch the config class in the current thread or asyncio task,
+                see `patch_config`
+            snapshot (bool): Patch the config class with the merged sources of the version (see
+                `snapshot`), so loading the config does not depend on the number of sources
+
+        Yields:
+            ...
+        """
+        config_class = self._config_class(config_class)
+
+        with patch_config(config_class, self._sources(version_name, snapshot), context_local):
+            yield
+
+    @asynccontextmanager
+    async def aversion(
+        self,
+        version_name: str,
+        config_class: Type[ConfZ] | None = None,
+        context_local: bool = True,
+        snapshot: bool = False,
+    ):
+        """Select a version from the collection and patch the supplied config class, see `version`.
+
+        The version is resolved, loaded and validated in worker threads (see `apatch_config`), so
+        the event loop is not blocked. The patch is context local by default, so concurrent tasks
+        can use different versions.
 
-        version_sources = self.get(version_name)
+        Args:
+            version_name (str): The name of the configuration version (i.e. the field name)
+            config_class (Type[ConfZ]): The configuration class to patch
+            context_local (bool): Only patch the config class in the current asyncio task
+            snapshot (bool): Patch the config class with the merged sources of the version
 
-        if hasattr(self, "BASE"):
-            version_base = self.get("BASE")
-            version_sources = _flatten(version_base, version_sources)
+        Yields:
+            ...
+        """
+        import asyncio
+
+        config_class = self._config_class(config_class)
+        version_sources = await asyncio.to_thread(self._sources, version_name, snapshot)
 
-        with patch_config(config_class, version_sources):
+        async with apatch_config(config_class, version_sources, context_local):
             yield
+
+    def prefetch(
+        self, version_name: str, config_class: Type[ConfZ] | None = None, snapshot: bool = False
+    ) -> Future[ConfZ]:
+        """Resolve, load and validate a version in a background thread, before it is entered.
+
+        See `prefetch_config`: entering the version with `version` or `aversion` afterwards uses
+        the prefetched config.
+
+        Args:
+            version_name (str): The name of the configuration version (i.e. the field name)
+            config_class (Type[ConfZ]): The configuration class of the version
+            snapshot (bool): Load the merged sources of the version, as `version` does with
+                `snapshot=True`
+
+        Returns:
+            Future[ConfZ]: The validated config, or the error raised while loading it
+        """
+        version_class = self._config_class(config_class)
+
+        return _prefetch(
+            lambda: _load_instance(
+                version_class,
+                _patched_sources(version_class, self._sources(version_name, snapshot)),
+            )
+        )
+
+    def _sources(self, version_name: str, snapshot: bool) -> ConfZSource | tuple[ConfZSource, ...]:
+        return self.snapshot(version_name) if snapshot else self.plan(version_name)
@@ -0,0 +1,362 @@
+from __future__ import annotations
+
+import copy
+import io
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from hashlib import blake2b
+from pathlib import Path
+from typing import Any, Callable, TextIO
+
+import yaml
+from confz import ConfZFileSource, FileFormat
+from confz.exceptions import ConfZFileException
+from confz.loaders import register_loader
+from confz.loaders.file_loader import FileLoader
+
+from flexigurator.instrumentation import instrumentation
+from flexigurator.yaml_loader import SafeLoader
+
+# Incremented when the layout of the compiled entries changes
+_COMPILED_FORMAT = 2
+
+
+class CompiledFileCache:
+    """Store the parsed contents of config files on disk, so other processes need not parse them.
+
+    An entry is only used when the hash of the contents it was parsed from matches the hash of the
+    contents of the file, so entries stay valid after checking out or copying the files, but a
+    changed file is never mistaken for an unchanged one. When the entries exceed `max_bytes` the
+    least recently written entries are removed.
+
+    Entries are stored with `pickle`, so the directory must not be writable by others.
+
+    Args:
+        directory (Path): The directory to store the entries in, it is created when needed
+        max_bytes (int): The maximum total size of the entries
+
+    """
+
+    directory: Path
+    max_bytes: int
+
+    def __init__(self, directory: Path, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._size: int | None = None
+        self._lock = threading.Lock()
+
+    def load(
+        self, path: str, content: bytes, digest: bytes, parser: str, parse: Callable[[bytes], Any]
+    ) -> Any:
+        """Return the parsed contents of a file, from its entry if it was parsed from the contents.
+
+        Args:
+            path (str): The absolute path of the file
+            content (bytes): The contents of the file
+            digest (bytes): The BLAKE2b digest of the contents
+            parser (str): Identifies how the file is parsed, entries of other parsers are not used
+            parse (Callable[[bytes], Any]): Parses the contents of the file
+
+        Returns:
+            Any: The parsed contents of the file
+        """
+        entry_path = self.directory / f"{blake2b(f'{parser}:{path}'.encode()).hexdigest()}.pickle"
+        entry = self._read(entry_path, (_COMPILED_FORMAT, path, parser))
+
+        if entry is not None and entry[0] == digest:
+            instrumentation.count("compiled_cache.hits", path=path)
+            return entry[1]
+
+        instrumentation.count("compiled_cache.misses", path=path)
+        data = parse(content)
+        self._write(entry_path, (_COMPILED_FORMAT, path, parser), (digest, data))
+        return data
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            for entry_path in self.directory.glob("*.pickle"):
+                entry_path.unlink(missing_ok=True)
+            self._size = 0
+
+    @staticmethod
+    def _read(entry_path: Path, header: tuple) -> tuple | None:
+        try:
+            with open(entry_path, "rb") as file:
+                entry_header, entry = pickle.load(file)
+        except Exception:  # pylint: disable=W0718
+            # A missing, corrupt or incompatible entry is (re)placed by a new one
+            return None
+        return entry if entry_header == header else None
+
+    def _write(self, entry_path: Path, header: tuple, entry: tuple) -> None:
+        content = pickle.dumps((header, entry), protocol=pickle.HIGHEST_PROTOCOL)
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first, so concurrent processes never read a partial entry
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "wb") as file:
+                file.write(content)
+            os.replace(temporary_path, entry_path)
+        finally:
+            Path(temporary_path).unlink(missing_ok=True)
+
+        with self._lock:
+            # Overestimated when an entry is replaced, which only causes an earlier recount
+            self._size = (self._scan_size() if self._size is None else self._size) + len(content)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _scan_size(self) -> int:
+        return sum(entry.stat().st_size for entry in os.scandir(self.directory))
+
+    def _evict(self) -> None:
+        entries = sorted(
+            (entry.stat().st_mtime_ns, entry.stat().st_size, entry.path)
+            for entry in os.scandir(self.directory)
+            if entry.name.endswith(".pickle")
+        )
+        self._size = sum(size for _, size, _ in entries)
+
+        for _, size, entry_path in entries:
+            if self._size <= self.max_bytes:
+                break
+            Path(entry_path).unlink(missing_ok=True)
+            self._size -= size
+
+
+def _compiled_cache_from_environment() -> CompiledFileCache | None:
+    directory = os.environ.get("FLEXIGURATOR_CACHE_DIR")
+    return CompiledFileCache(Path(directory)) if directory else None
+
+
+class ParsedFileCache:
+    """Hold the parsed contents of config files until the files change.
+
+    A file is parsed again when its modification time or size changes, so loading many configs
+    which share files only parses every file once. Files loaded with a `parser` are also keyed by
+    the hash of their contents, so files with identical contents (e.g. copies of a version for
+    several regions) are parsed once and share the parsed result.
+
+    Files loaded with a `parser` are also stored in the `compiled` cache on disk when it is set,
+    which is the case when the `FLEXIGURATOR_CACHE_DIR` environment variable is set.
+
+    Args:
+        maxsize (int): The maximum number of cached files
+        compiled (CompiledFileCache | None): The cache on disk shared with other processes
+
+    """
+
+    maxsize: int
+    compiled: CompiledFileCache | None
+
+    def __init__(self, maxsize: int = 4096, compiled: CompiledFileCache | None = None):
+        self.maxsize = maxsize
+        self.compiled = compiled
+        self._files: OrderedDict[str, tuple[tuple[int, int], tuple | None, Any]] = OrderedDict()
+        # The parsed contents by content key, with the number of cached files sharing them
+        self._contents: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def load(
+        self,
+        path: Path,
+        parse: Callable[[TextIO], Any],
+        encoding: str = "utf-8",
+        parser: str | None = None,
+    ) -> Any:
+        """Return the parsed contents of a file, parsing it only if it changed.
+
+        The returned data is shared, so it must not be modified.
+
+        Args:
+            path (Path): The path of the file
+            parse (Callable[[TextIO], Any]): Parses the opened file
+            encoding (str): The encoding of the file
+            parser (str | None): Identifies the parse function, which is needed to store the
+                parsed contents in the `compiled` cache
+
+        Returns:
+            Any: The parsed contents of the file
+        """
+        key = os.path.abspath(path)
+        stat = os.stat(key)
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            cached = self._files.get(key)
+            if cached is not None and cached[0] == version:
+                self._files.move_to_end(key)
+                instrumentation.count("parsed_files.hits", path=key)
+                return cached[2]
+
+        instrumentation.count("parsed_files.misses", path=key)
+        with instrumentation.span("file.load", path=key):
+            if parser is None:
+                content_key = None
+                with open(key, "r", encoding=encoding) as file:
+                    data = parse(file)
+            else:
+                content_key, data = self._load_content(key, parse, encoding, parser)
+
+        with self._lock:
+            data = self._store(key, (version, content_key, data))
+        return data
+
+    def content_key(self, path: Path) -> tuple | None:
+        """Return the key of the contents of a cached file, if it is unchanged since it was loaded.
+
+        Files with equal content keys have identical contents, which are parsed the same way.
+
+        Args:
+            path (Path): The path of the file
+
+        Returns:
+            tuple | None: The content key, or `None` if the file is not cached (with a `parser`)
+        """
+        key = os.path.abspath(path)
+        try:
+            stat = os.stat(key)
+        except OSError:
+            return None
+
+        with self._lock:
+            cached = self._files.get(key)
+        if cached is None or cached[0] != (stat.st_mtime_ns, stat.st_size):
+            return None
+        return cached[1]
+
+    def digest(self, path: Path) -> bytes:
+        """Return the hash of the contents of a file, reading it only if it is not cached.
+
+        Args:
+            path (Path): The path of the file
+
+        Returns:
+            bytes: The BLAKE2b digest of the contents of the file
+        """
+        content_key = self.content_key(path)
+        if content_key is not None:
+            return content_key[-1]
+
+        with open(path, "rb") as file:
+            return blake2b(file.read()).digest()
+
+    def _load_content(
+        self, key: str, parse: Callable[[TextIO], Any], encoding: str, parser: str
+    ) -> tuple[tuple, Any]:
+        with open(key, "rb") as file:
+            content = file.read()
+        digest = blake2b(content).digest()
+        content_key = (parser, encoding, digest)
+
+        with self._lock:
+            shared = self._contents.get(content_key)
+        if shared is not None:
+            instrumentation.count("parsed_files.shared", path=key)
+            return content_key, shared[0]
+
+        if self.compiled is None:
+            return content_key, parse(io.TextIOWrapper(io.BytesIO(content), encoding=encoding))
+
+        data = self.compiled.load(
+            key,
+            content,
+            digest,
+            f"{parser}:{encoding}",
+            lambda content: parse(io.TextIOWrapper(io.BytesIO(content), encoding=encoding)),
+        )
+        return content_key, data
+
+    def _store(self, key: str, entry: tuple[tuple[int, int], tuple | None, Any]) -> Any:
+        version, content_key, data = entry
+        if content_key is not None:
+            # Another thread may have parsed identical contents meanwhile, which are shared instead
+            shared = self._contents.setdefault(content_key, [data, 0])
+            shared[1] += 1
+            entry = (version, content_key, shared[0])
+
+        self._release(self._files.pop(key, None))
+        self._files[key] = entry
+        while len(self._files) > self.maxsize:
+            self._release(self._files.popitem(last=False)[1])
+        return entry[2]
+
+    def _release(self, entry: tuple[tuple[int, int], tuple | None, Any] | None) -> None:
+        # Drop the shared contents when no cached file refers to them anymore
+        if entry is None or entry[1] is None:
+            return
+
+        shared = self._contents[entry[1]]
+        shared[1] -= 1
+        if shared[1] == 0:
+            del self._contents[entry[1]]
+
+    def invalidate(self, path: Path) -> None:
+        """Remove a file from the cache, so it is parsed again on its next load.
+
+        Args:
+            path (Path): The path of the file
+        """
+        with self._lock:
+            self._release(self._files.pop(os.path.abspath(path), None))
+
+    def clear(self) -> None:
+        """Remove all files from the cache."""
+        with self._lock:
+            self._files.clear()
+            self._contents.clear()
+
+
+parsed_files = ParsedFileCache(compiled=_compiled_cache_from_environment())
+
+
+@dataclass
+class CachedFileSource(ConfZFileSource):
+    """A `ConfZFileSource` of which the parsed contents are kept in `parsed_files`.
+
+    YAML files are parsed with the libyaml loader when it is available.
+    """
+
+
+class CachedFileLoader(FileLoader):
+    """Config loader for `CachedFileSource`s."""
+
+    @classmethod
+    def populate_config(cls, config: dict, confz_source: ConfZFileSource):
+        if confz_source.file is None or isinstance(confz_source.file, bytes):
+            super().populate_config(config, confz_source)
+            return
+
+        file_path = cls._get_filename(confz_source)
+        file_format = cls._get_format(file_path, confz_source.format)
+
+        try:
+            file_content = parsed_files.load(
+                file_path,
+                lambda stream: cls._parse_stream(stream, file_format),
+                confz_source.encoding,
+                f"{file_format.value}:{SafeLoader.__name__}",
+            )
+        except OSError as error:
+            if confz_source.optional:
+                return
+            raise ConfZFileException(f"Could not open config file '{file_path}'.") from error
+
+        # The cached contents are shared, while populating the config modifies nested dictionaries
+        cls.update_dict_recursively(config, copy.deepcopy(file_content))
+
+    @classmethod
+    def _parse_stream(cls, stream: TextIO, file_format: FileFormat) -> dict:
+        if file_format == FileFormat.YAML:
+            return yaml.load(stream, Loader=SafeLoader)
+        return super()._parse_stream(stream, file_format)
+
+
+register_loader(CachedFileSource, CachedFileLoader)
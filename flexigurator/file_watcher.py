@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Iterable
+
+_logger = logging.getLogger(__name__)
+
+_FileState = tuple[int, int] | None
+
+
+def _file_state(path: Path) -> _FileState:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class FileWatcher:
+    """Watch files and folders for changes by polling their modification time and size.
+
+    Changes are detected by calling `check`, or periodically from a background thread started with
+    `start`. The watched paths are requested again on every check, so paths can come and go.
+
+    Args:
+        paths (Callable[[], Iterable[Path]]): Returns the paths to watch
+        callback (Callable[[list[Path]], None]): Called with the paths that changed
+        interval (float): Number of seconds between checks of the background thread
+
+    """
+
+    def __init__(
+        self,
+        paths: Callable[[], Iterable[Path]],
+        callback: Callable[[list[Path]], None],
+        interval: float = 1.0,
+    ):
+        self._paths = paths
+        self._callback = callback
+        self._interval = interval
+        self._states: dict[Path, _FileState] | None = None
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def check(self) -> list[Path]:
+        """Check the watched paths for changes and call the callback if any path changed.
+
+        The first check only records the state of the paths.
+
+        Returns:
+            list[Path]: The paths which were changed, added or removed since the previous check
+        """
+        states = {path: _file_state(path) for path in self._paths()}
+        previous, self._states = self._states, states
+
+        if previous is None:
+            return []
+
+        changed = [
+            path
+            for path in states.keys() | previous.keys()
+            if states.get(path) != previous.get(path)
+        ]
+        if changed:
+            self._callback(changed)
+        return changed
+
+    def start(self) -> FileWatcher:
+        """Start checking for changes in a background thread.
+
+        Returns:
+            FileWatcher: The watcher itself
+        """
+        self.check()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="flexigurator-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the background thread."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> FileWatcher:
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self._interval):
+            try:
+                self.check()
+            except Exception:  # pylint: disable=W0718
+                # Keep watching, a (partially written) file may be fixed by the next change
+                _logger.exception("Failed to process changed config files")
@@ -1 +1,6 @@
-from flexigurator.form.form import ConfigForm
+from flexigurator.form.form import (
+    ConfigForm,
+    ConfigTemplate,
+    ConfigTemplateRegistry,
+    FsyncPolicy,
+)
@@ -1,23 +1,48 @@
+import gzip
 import json
 import os
-import warnings
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from dataclasses import dataclass
+from enum import Enum
+from functools import cache
+from hashlib import blake2b
 from importlib import resources
 from pathlib import Path
-from typing import Any, Type
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Hashable,
+    Iterable,
+    Iterator,
+    Type,
+    TypeVar,
+)
 
-import mmh3
 import yaml
-from fastapi import FastAPI, Request, Response
-from fastapi.templating import Jinja2Templates
-from pydantic import BaseModel
 
-# Default location for Jinja templates is in the jinja_templates package
-# This slightly convoluted method is used to get the path from the context manager
-with warnings.catch_warnings():
-    warnings.simplefilter("ignore")
-    with resources.path("flexigurator.form", "jinja_templates") as _jinja_templates_file:
-        _JINJA_TEMPLATE_DEFAULT_PATH = _jinja_templates_file
+from flexigurator.yaml_loader import SafeLoader, YamlLoader, load_yaml
+
+# FastAPI, Jinja, mmh3 and anyio are imported where they are used, so importing the form (e.g. for
+# its templates) stays fast
+if TYPE_CHECKING:  # pragma: no cover
+    import anyio
+    from fastapi import FastAPI, Response
+    from fastapi.datastructures import Headers
+    from fastapi.templating import Jinja2Templates
+    from pydantic import BaseModel
+
+
+@cache
+def _jinja_templates_default_path() -> Path:
+    # Default location for Jinja templates is in the jinja_templates package
+    return Path(str(resources.files("flexigurator.form") / "jinja_templates"))
+
+
+T = TypeVar("T")
 
 
 @dataclass
@@ -31,107 +56,583 @@ class ConfigTemplate:
         # Create the name from the path by taking its path relative to the templates dir and
         # removing the suffix (e.g. '.yaml')
         # '/home/test/gridshield-python/configs/templates/sender/module.yaml' -> 'sender/module'
+        import mmh3
+
         name = os.path.splitext(path.relative_to(templates_path))[0]
         uid = str(mmh3.hash(name, signed=False))
         return ConfigTemplate(uid=uid, name=name, path=path)
 
 
-def _load_config_templates(path: Path) -> list[ConfigTemplate]:
-    paths = sorted(path.glob("**/*.yaml"), key=str)
-    templates = [ConfigTemplate.from_path(file_path, path) for file_path in paths]
-    templates = sorted(templates, key=lambda template: template.name)
+@dataclass
+class _ScannedDirectory:
+    mtime: int
+    files: set[Path]
+    directories: set[Path]
+
+
+class _TemplateScanner:
+    """Track the `.yaml` files in a directory tree and report which were added or removed.
+
+    Only directories whose modification time changed since the previous scan are listed again, so
+    keeping up with an unchanged tree costs one `stat` per directory. The tree is checked at most
+    once per refresh interval.
+
+    Args:
+        path (Path): The root of the directory tree
+        refresh_interval (float): Minimum number of seconds between checks of the tree
+
+    """
+
+    path: Path
+
+    def __init__(self, path: Path, refresh_interval: float):
+        self.path = path
+        self._refresh_interval = refresh_interval
+        self._refreshed_at: float | None = None
+        self._directories: dict[Path, _ScannedDirectory] = {}
+
+    def changes(self, force: bool = False) -> tuple[set[Path], set[Path]]:
+        """Scan the directory tree for changes since the previous scan.
+
+        Args:
+            force (bool): Scan even if the refresh interval has not passed yet
+
+        Returns:
+            tuple[set[Path], set[Path]]: The added and the removed `.yaml` files
+        """
+        added: set[Path] = set()
+        removed: set[Path] = set()
+
+        now = time.monotonic()
+        if (
+            force
+            or self._refreshed_at is None
+            or now - self._refreshed_at >= self._refresh_interval
+        ):
+            self._scan(self.path, added, removed)
+            self._refreshed_at = now
+
+        return added, removed
+
+    def _scan(self, directory: Path, added: set[Path], removed: set[Path]) -> None:
+        known = self._directories.get(directory)
+
+        try:
+            mtime = directory.stat().st_mtime_ns
+        except OSError:
+            self._forget(directory, removed)
+            return
+
+        if known is None or known.mtime != mtime:
+            scanned = self._list(directory, mtime)
+            old = known or _ScannedDirectory(mtime, set(), set())
+            added |= scanned.files - old.files
+            removed |= old.files - scanned.files
+            for old_directory in old.directories - scanned.directories:
+                self._forget(old_directory, removed)
+            self._directories[directory] = known = scanned
+
+        for sub_directory in known.directories:
+            self._scan(sub_directory, added, removed)
+
+    @staticmethod
+    def _list(directory: Path, mtime: int) -> _ScannedDirectory:
+        scanned = _ScannedDirectory(mtime, set(), set())
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                # Symlinked directories are not followed (like `Path.glob`), so links cannot loop
+                if entry.is_dir(follow_symlinks=False):
+                    scanned.directories.add(directory / entry.name)
+                elif entry.name.endswith(".yaml"):
+                    scanned.files.add(directory / entry.name)
+        return scanned
+
+    def _forget(self, directory: Path, removed: set[Path]) -> None:
+        known = self._directories.pop(directory, None)
+        if known is not None:
+            removed |= known.files
+            for sub_directory in known.directories:
+                self._forget(sub_directory, removed)
+
+
+def _load_yaml(path: Path, loader: YamlLoader = SafeLoader) -> dict[str, Any]:
+    return load_yaml(path, loader)
+
+
+class ConfigTemplateRegistry:
+    """Hold config templates by their UID and cache their start values.
+
+    The start values of a template are read and serialized to json once, and only reloaded when the
+    modification time or size of the template file changes.
+
+    When a templates path is given, the templates are discovered from it on first use and the
+    registry keeps up with templates being added, removed or renamed by checking the directory tree
+    for changes at most once per refresh interval.
+
+    Args:
+        config_templates (Iterable[ConfigTemplate]): The config templates
+        loader (YamlLoader): The PyYAML loader class used to read the templates
+        templates_path (Path | None): The directory to discover templates in
+        refresh_interval (float): Minimum number of seconds between checks of the templates path
+
+    """
+
+    version: int
+
+    def __init__(
+        self,
+        config_templates: Iterable[ConfigTemplate] = (),
+        loader: YamlLoader = SafeLoader,
+        templates_path: Path | None = None,
+        refresh_interval: float = 1.0,
+    ):
+        self._templates = {template.uid: template for template in config_templates}
+        self._loader = loader
+        self._start_vals: dict[str, tuple[tuple[int, int], str]] = {}
+        self._scanner = (
+            _TemplateScanner(templates_path, refresh_interval) if templates_path else None
+        )
+        self._lock = threading.Lock()
+        # Incremented whenever templates are added or removed
+        self.version = 0
+
+    def __getitem__(self, uid: str) -> ConfigTemplate:
+        self.refresh()
+        return self._templates[uid]
+
+    def __iter__(self) -> Iterator[ConfigTemplate]:
+        self.refresh()
+        return iter(sorted(self._templates.values(), key=lambda template: template.name))
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self._templates)
+
+    def refresh(self, force: bool = False) -> None:
+        """Apply templates added to or removed from the templates path.
+
+        Args:
+            force (bool): Check for changes even if the refresh interval has not passed yet
+        """
+        if self._scanner is None:
+            return
+
+        with self._lock:
+            added, removed = self._scanner.changes(force)
+
+            if added or removed:
+                self._apply(added, removed, self._scanner.path)
+
+    def _apply(self, added: set[Path], removed: set[Path], templates_path: Path) -> None:
+        # Swap in a new mapping, so lookups from other threads never see a partial update
+        templates = dict(self._templates)
+        for path in removed:
+            uid = ConfigTemplate.from_path(path, templates_path).uid
+            templates.pop(uid, None)
+            self._start_vals.pop(uid, None)
+        for path in added:
+            template = ConfigTemplate.from_path(path, templates_path)
+            templates[template.uid] = template
+
+        self._templates = templates
+        self.version += 1
+
+    def start_vals(self, uid: str) -> str:
+        """Retrieves the start values for the template with the requested UID.
+
+        A `KeyError` is raised when no template with the UID exists.
+
+        Args:
+            uid (str): The UID of the requested template
+
+        Returns:
+            str: a json string containing the start vals of the requested template
+        """
+        path = self[uid].path
+        stat = path.stat()
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        cached = self._start_vals.get(uid)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        start_vals = json.dumps(_load_yaml(path, self._loader))
+        self._start_vals[uid] = (version, start_vals)
+        return start_vals
 
-    return templates
 
+@dataclass(frozen=True)
+class _RenderedPage:
+    """A rendered HTML page with its precompressed variant and validators."""
 
-def _load_yaml(path: Path) -> dict[str, Any]:
-    with open(path, "r", encoding="utf-8") as yaml_file:
-        yaml_file_contents = yaml_file.read()
+    body: bytes
+    gzip_body: bytes
+    digest: str
 
-    yaml_object = yaml.safe_load(yaml_file_contents)
+    @staticmethod
+    def from_html(html: str) -> "_RenderedPage":
+        body = html.encode("utf-8")
+        return _RenderedPage(body, gzip.compress(body), blake2b(body, digest_size=16).hexdigest())
+
+    def etag(self, gzipped: bool) -> str:
+        # Strong validators differ between content codings, so caches keep the variants apart
+        return f'"{self.digest}-gzip"' if gzipped else f'"{self.digest}"'
 
-    return yaml_object if yaml_object else {}
+    def headers(self, gzipped: bool) -> dict[str, str]:
+        # No Last-Modified, as the render time does not tell whether the inputs of a page changed
+        return {"ETag": self.etag(gzipped), "Vary": "Accept-Encoding"}
 
 
-def _config_form_start_vals(uid: str, config_templates: list[ConfigTemplate]) -> str:
-    """Retrieves the start values for the template with the requested UID.
+class _PageCache:
+    """Hold rendered pages by key, re-rendering a page only when its version changes.
 
     Args:
-        uid (str): The UID of the requested template
-        config_templates (list[ConfigTemplate]): the list of templates
+        maxsize (int): The maximum number of cached pages
+
+    """
+
+    def __init__(self, maxsize: int):
+        self._maxsize = maxsize
+        self._pages: OrderedDict[Hashable, tuple[Hashable, _RenderedPage]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: Hashable, render: Callable[[], str]) -> _RenderedPage:
+        with self._lock:
+            cached = self._pages.get(key)
+            if cached is not None and cached[0] == version:
+                self._pages.move_to_end(key)
+                return cached[1]
+
+        page = _RenderedPage.from_html(render())
+
+        with self._lock:
+            self._pages[key] = (version, page)
+            self._pages.move_to_end(key)
+            while len(self._pages) > self._maxsize:
+                self._pages.popitem(last=False)
+        return page
+
+
+class _FormPages:
+    """Render the pages of the form, caching them as long as their inputs do not change."""
+
+    def __init__(
+        self,
+        templates: "Jinja2Templates",
+        config_templates: ConfigTemplateRegistry,
+        schema: str,
+        page_cache_size: int,
+    ):
+        self._templates = templates
+        self._config_templates = config_templates
+        self._schema = schema
+        self._pages = _PageCache(page_cache_size)
+
+    def index(self) -> _RenderedPage:
+        self._config_templates.refresh()
+        return self._pages.get("index", self._config_templates.version, self._render_index)
+
+    def config_form(self, uid: str) -> _RenderedPage:
+        start_val = self._config_templates.start_vals(uid)
+
+        def render() -> str:
+            return self._templates.get_template("config_form.html").render(
+                schema_json=self._schema, start_val=start_val
+            )
+
+        # The start values are cached by the registry, so comparing them is an identity check
+        return self._pages.get(("config_form", uid), start_val, render)
+
+    def _render_index(self) -> str:
+        template_dict = {template.uid: template.name for template in self._config_templates}
+        return self._templates.get_template("index.html").render(template_names=template_dict)
+
+
+def _not_modified(etag: str, headers: "Headers") -> bool:
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+
+    etags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in etags or etag in etags
+
+
+def _accepts_gzip(headers: "Headers") -> bool:
+    # Maps every listed encoding to its quality value, a quality of 0 refuses the encoding
+    qualities: dict[str, float] = {}
+    for encoding in headers.get("accept-encoding", "").split(","):
+        name, *parameters = (part.strip() for part in encoding.split(";"))
+        quality = 1.0
+        for parameter in parameters:
+            key, _, value = parameter.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.lower()] = quality
+
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+
+def _page_response(page: _RenderedPage, headers: "Headers") -> "Response":
+    """Create a response for a rendered page, honouring conditional and compression headers.
+
+    Args:
+        page (_RenderedPage): The rendered page
+        headers (Headers): The headers of the request
 
     Returns:
-        str: a json string containing the start vals of the requested template
+        Response: A `304 Not Modified` response or the (compressed) page
+    """
+    from fastapi import Response
+
+    gzipped = _accepts_gzip(headers)
+    response_headers = page.headers(gzipped)
+
+    if _not_modified(page.etag(gzipped), headers):
+        return Response(status_code=304, headers=response_headers)
+
+    if gzipped:
+        response_headers["Content-Encoding"] = "gzip"
+        return Response(page.gzip_body, media_type="text/html", headers=response_headers)
+
+    return Response(page.body, media_type="text/html", headers=response_headers)
+
+
+class FsyncPolicy(Enum):
+    """Controls how saved configs are flushed to disk."""
+
+    NONE = "none"  # Leave flushing to the operating system
+    FILE = "file"  # Flush the file before it replaces the previous version
+    FULL = "full"  # Also flush the directory, so the replacement itself survives a crash
+
+
+_file_locks: dict[Path, threading.Lock] = {}
+_file_locks_lock = threading.Lock()
+
+
+def _file_lock(file_path: Path) -> threading.Lock:
+    with _file_locks_lock:
+        return _file_locks.setdefault(file_path.absolute(), threading.Lock())
+
+
+def _open_temporary(file_path: Path) -> tuple[int, Path]:
+    # The temporary file is created next to the target, so it can be renamed atomically
+    temp_path = file_path.with_name(f".{file_path.name}.{uuid.uuid4().hex}.tmp")
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL
+
+    try:
+        return os.open(temp_path, flags, 0o666), temp_path
+    except FileNotFoundError:
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        return os.open(temp_path, flags, 0o666), temp_path
+
+
+def _fsync_directory(path: Path) -> None:
+    directory = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+
+def _write_to_file(file_path: Path, contents: str, fsync: FsyncPolicy = FsyncPolicy.FILE) -> None:
+    """Atomically replace a file with the given contents.
+
+    The contents are written to a temporary file which then replaces the file, so readers never see
+    a partially written file. Writes to the same file are serialized.
+
+    Args:
+        file_path (Path): The file to write
+        contents (str): The new contents of the file
+        fsync (FsyncPolicy): How the file is flushed to disk
     """
-    path = [template for template in config_templates if template.uid == uid][0].path
-    return json.dumps(_load_yaml(path))
+    with _file_lock(file_path):
+        descriptor, temp_path = _open_temporary(file_path)
+        try:
+            with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+                file.write(contents)
+                if fsync is not FsyncPolicy.NONE:
+                    file.flush()
+                    os.fsync(file.fileno())
+            os.replace(temp_path, file_path)
+        finally:
+            # Only left behind when writing or replacing failed
+            temp_path.unlink(missing_ok=True)
 
+    if fsync is FsyncPolicy.FULL:
+        _fsync_directory(file_path.parent)
 
-def _write_to_file(file_path: Path, contents: str) -> None:
-    with open(file_path, "w", encoding="utf-8") as file:
-        file.write(contents)
 
+def _config_yaml(json_: dict[str, Any]) -> str:
+    return "" if json_ == {} else yaml.dump(json_)
 
-def _save_config_form_output(json_: dict[str, Any], file_name: str, save_path: Path):
+
+def _save_config_form_output(
+    json_: dict[str, Any], file_name: str, save_path: Path, fsync: FsyncPolicy = FsyncPolicy.FILE
+):
     """Writes the given json to a `.yaml` file.
 
     Args:
         json_ (dict[str, Any]): The json to be converted to yaml
         file_name (str): The file name without `.yaml` extention
         save_path (Path): The directory in which the file needs to be saved
+        fsync (FsyncPolicy): How the file is flushed to disk
     """
-    if json_ == {}:
-        yaml_str = ""
-    else:
-        yaml_str = yaml.dump(json_)
-
     yaml_file_path = save_path.joinpath(Path(file_name + ".yaml"))
-    yaml_file_path.parent.mkdir(parents=True, exist_ok=True)
-    _write_to_file(yaml_file_path, yaml_str)
+    _write_to_file(yaml_file_path, _config_yaml(json_), fsync)
+
+
+def _save_config_form_outputs(
+    configs: dict[str, dict[str, Any]], save_path: Path, fsync: FsyncPolicy = FsyncPolicy.FILE
+):
+    """Writes many configs to `.yaml` files.
+
+    All file names are checked before anything is written. With `FsyncPolicy.FULL` every directory
+    is flushed once after all files are written rather than once per file.
+
+    Args:
+        configs (dict[str, dict[str, Any]]): The json configs by file name without extension
+        save_path (Path): The directory in which the files need to be saved
+        fsync (FsyncPolicy): How the files are flushed to disk
+
+    Raises:
+        ValueError: When the configs are not json objects by file name, or a file name points
+            outside of the save path
+    """
+    _check_configs(configs)
+    root = save_path.resolve()
+    yaml_file_paths = {name: save_path.joinpath(Path(name + ".yaml")) for name in configs}
+
+    for name, yaml_file_path in yaml_file_paths.items():
+        if not yaml_file_path.resolve().is_relative_to(root):
+            raise ValueError(f"File name points outside of the save path: {name}")
+
+    file_fsync = FsyncPolicy.FILE if fsync is FsyncPolicy.FULL else fsync
+    for name, yaml_file_path in yaml_file_paths.items():
+        _write_to_file(yaml_file_path, _config_yaml(configs[name]), file_fsync)
+
+    if fsync is FsyncPolicy.FULL:
+        for directory in {path.parent for path in yaml_file_paths.values()}:
+            _fsync_directory(directory)
+
+
+def _check_configs(configs: Any) -> None:
+    # The configs come from a request body, which may be any json value
+    if not isinstance(configs, dict):
+        raise ValueError("Expected a json object mapping file names to configs")
+
+    for name, json_ in configs.items():
+        if not isinstance(name, str) or not isinstance(json_, dict):
+            raise ValueError(f"Expected a json object as config: {name}")
+
+
+class _BlockingIO:
+    """Run blocking (I/O) functions in worker threads so they do not block the event loop.
+
+    Args:
+        max_concurrency (int): The maximum number of functions running at the same time
+
+    """
+
+    def __init__(self, max_concurrency: int):
+        self._max_concurrency = max_concurrency
+        self._limiter: "anyio.CapacityLimiter | None" = None
+
+    async def run(self, function: Callable[..., T], *args: Any) -> T:
+        """Run a blocking function in a worker thread.
+
+        Args:
+            function (Callable[..., T]): The blocking function
+            *args (Any): The arguments for the function
+
+        Returns:
+            T: The return value of the function
+        """
+        import anyio
+
+        if self._limiter is None:
+            # The limiter can only be created from within the event loop
+            self._limiter = anyio.CapacityLimiter(self._max_concurrency)
+
+        return await anyio.to_thread.run_sync(function, *args, limiter=self._limiter)
+
+
+def _add_save_routes(
+    app: "FastAPI", config_save_path: Path, blocking_io: _BlockingIO, fsync: FsyncPolicy
+) -> None:  # pragma: no cover
+    from fastapi import HTTPException, Request
+
+    @app.post("/config_json/{file_name}", response_model=None)
+    async def _config_json(request: Request, file_name: str) -> dict[str, str]:
+        # Writes the form results to disk.
+        json_ = await request.json()
+        await blocking_io.run(_save_config_form_output, json_, file_name, config_save_path, fsync)
+        return {"message": f"Parsed config json {json_}!"}
+
+    @app.post("/config_json", response_model=None)
+    async def _config_json_batch(request: Request) -> dict[str, str]:
+        # Writes many configs, given as a mapping from file name to config json, to disk.
+        configs = await request.json()
+        try:
+            await blocking_io.run(_save_config_form_outputs, configs, config_save_path, fsync)
+        except ValueError as error:
+            raise HTTPException(status_code=400, detail=str(error)) from error
+        return {"message": f"Saved {len(configs)} configs!"}
 
 
 def ConfigForm(
-    config: Type[BaseModel],
+    config: Type["BaseModel"],
     config_save_path: Path,
     config_templates_path: Path,
     jinja_templates_path: Path | None = None,
-) -> FastAPI:  # pragma: no cover
-    app = FastAPI()
+    *,
+    yaml_loader: YamlLoader = SafeLoader,
+    page_cache_size: int = 256,
+    max_io_concurrency: int = 8,
+    fsync: FsyncPolicy = FsyncPolicy.FILE,
+    refresh_interval: float = 1.0,
+) -> "FastAPI":  # pragma: no cover
+    import fastapi
+    import fastapi.templating
+
+    app = fastapi.FastAPI()
 
-    # Setup Jinja templates folder
-    templates_dir_path = jinja_templates_path or _JINJA_TEMPLATE_DEFAULT_PATH
-    templates = Jinja2Templates(directory=templates_dir_path)
+    # Setup Jinja templates folder, config templates (discovered on first use) and config schema
+    pages = _FormPages(
+        fastapi.templating.Jinja2Templates(
+            directory=jinja_templates_path or _jinja_templates_default_path()
+        ),
+        ConfigTemplateRegistry(
+            loader=yaml_loader,
+            templates_path=config_templates_path,
+            refresh_interval=refresh_interval,
+        ),
+        config.schema_json(),
+        page_cache_size,
+    )
 
-    # Setup config templates and config json schema
-    config_templates = _load_config_templates(config_templates_path)
-    schema = config.schema_json()
+    # File I/O runs in worker threads, so a slow disk does not block other clients
+    blocking_io = _BlockingIO(max_io_concurrency)
 
     @app.get("/", response_model=None)
-    async def root(request: Request) -> Response:
+    async def root(request: fastapi.Request) -> fastapi.Response:
         # The landing page for the configurator.
-        template_dict = {template.uid: template.name for template in config_templates}
-
-        return templates.TemplateResponse(
-            "index.html", {"request": request, "template_names": template_dict}
-        )
+        return _page_response(await blocking_io.run(pages.index), request.headers)
 
     @app.get("/config_template/{uid}", response_model=None)
-    async def config_form(request: Request, uid: str) -> Response:
+    async def config_form(request: fastapi.Request, uid: str) -> fastapi.Response:
         # Returns the form for the requested template.
-        return templates.TemplateResponse(
-            "config_form.html",
-            {
-                "request": request,
-                "schema_json": schema,
-                "start_val": _config_form_start_vals(uid, config_templates),
-            },
-        )
+        try:
+            page = await blocking_io.run(pages.config_form, uid)
+        except KeyError as error:
+            raise fastapi.HTTPException(
+                status_code=404, detail=f"Unknown template: {uid}"
+            ) from error
 
-    @app.post("/config_json/{file_name}", response_model=None)
-    async def _config_json(request: Request, file_name: str) -> dict[str, str]:
-        # Writes the form results to disk.
-        json_ = await request.json()
-        _save_config_form_output(json_, file_name, config_save_path)
-        return {"message": f"Parsed config json {json_}!"}
+        return _page_response(page, request.headers)
+
+    _add_save_routes(app, config_save_path, blocking_io, fsync)
 
     return app
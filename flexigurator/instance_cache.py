@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from hashlib import blake2b
+from pathlib import Path
+from typing import Any, Hashable, Type
+
+from confz import ConfZ, ConfZDataSource, ConfZFileSource, ConfZSource
+from pydantic import BaseModel
+
+from flexigurator.config_snapshot import SnapshotSource
+from flexigurator.file_cache import CachedFileSource, parsed_files
+from flexigurator.instrumentation import instrumentation
+from flexigurator.patch_stack import PatchLayer
+
+
+class _Unhashable(Exception):
+    """Raised when a source cannot be turned into a cache key."""
+
+
+@dataclass(frozen=True)
+class CacheInfo:
+    """Statistics of a `ConfigCache`."""
+
+    hits: int
+    misses: int
+    size: int
+    maxsize: int
+
+
+class ConfigCache:
+    """Hold validated config instances keyed by their config class and source stack.
+
+    Sources are keyed by content rather than identity: file sources by their path, modification
+    time and size, and data sources by their (frozen) data. Cached file sources are keyed by the
+    hash of their contents, so versions loaded from identical files share their config instances.
+    Stacks containing sources whose content cannot be determined up front (e.g. environment or
+    command line sources) are never cached.
+
+    Args:
+        maxsize (int): The maximum number of cached config instances, `0` disables the cache
+
+    """
+
+    maxsize: int
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self._instances: OrderedDict[Hashable, ConfZ] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def key(self, config_class: Type[ConfZ], sources: list[ConfZSource]) -> Hashable | None:
+        """Create the cache key for a config class loaded from the given sources.
+
+        Args:
+            config_class (Type[ConfZ]): The ConfZ config class
+            sources (list[ConfZSource]): The sources the config class is loaded from
+
+        Returns:
+            Hashable | None: The cache key, or `None` when the sources cannot be cached
+        """
+        if self.maxsize <= 0:
+            return None
+
+        try:
+            return (config_class, tuple(source_key(source) for source in sources))
+        except _Unhashable:
+            return None
+
+    def get(self, key: Hashable | None) -> ConfZ | None:
+        """Return the cached config instance for a key.
+
+        Args:
+            key (Hashable | None): A key created by `ConfigCache.key`
+
+        Returns:
+            ConfZ | None: The cached config instance or `None` if it is not cached
+        """
+        if key is None:
+            instrumentation.count("config_cache.uncacheable")
+            return None
+
+        with self._lock:
+            instance = self._instances.get(key)
+            if instance is not None:
+                self._instances.move_to_end(key)
+                self._hits += 1
+            else:
+                self._misses += 1
+
+        instrumentation.count(
+            "config_cache.hits" if instance is not None else "config_cache.misses"
+        )
+        return instance
+
+    def put(self, key: Hashable | None, instance: ConfZ | None) -> None:
+        """Store a config instance, evicting the least recently used instances if needed.
+
+        Args:
+            key (Hashable | None): A key created by `ConfigCache.key`
+            instance (ConfZ | None): The config instance, `None` when it was never constructed
+        """
+        if key is None or instance is None:
+            return
+
+        with self._lock:
+            self._instances[key] = instance
+            self._instances.move_to_end(key)
+
+            while len(self._instances) > self.maxsize:
+                self._instances.popitem(last=False)
+
+    def info(self) -> CacheInfo:
+        """Return the hit and miss counters and the size of the cache.
+
+        Returns:
+            CacheInfo: The cache statistics
+        """
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, len(self._instances), self.maxsize)
+
+    def clear(self) -> None:
+        """Remove all cached config instances and reset the counters."""
+        with self._lock:
+            self._instances.clear()
+            self._hits = 0
+            self._misses = 0
+
+
+def source_key(source: ConfZSource) -> Hashable:
+    """Create a key identifying the content of a single config source.
+
+    Args:
+        source (ConfZSource): The config source
+
+    Returns:
+        Hashable: The key of the source
+
+    Raises:
+        _Unhashable: When the content of the source cannot be identified
+    """
+    if isinstance(source, SnapshotSource):
+        return (SnapshotSource, source.key)
+
+    if isinstance(source, PatchLayer):
+        if source.cache_key is not None:
+            return source.cache_key
+
+        key = (PatchLayer, tuple(source_key(item) for item in (*source.parent, *source.sources)))
+        if source.static:
+            # The content of a static layer does not change, so its key is only created once
+            source.cache_key = key
+        return key
+
+    if isinstance(source, ConfZDataSource):
+        return (ConfZDataSource, _freeze(source.data))
+
+    if isinstance(source, ConfZFileSource):
+        return (ConfZFileSource, _file_key(source), source.format, source.encoding, source.optional)
+
+    raise _Unhashable(source)
+
+
+def _file_key(source: ConfZFileSource) -> Hashable:
+    if isinstance(source.file, bytes):
+        return blake2b(source.file).digest()
+
+    if source.file is None or source.file_from_env is not None or source.file_from_cl is not None:
+        raise _Unhashable(source)
+
+    path = Path(source.file)
+    if source.folder is not None:
+        path = Path(source.folder) / path
+
+    if isinstance(source, CachedFileSource):
+        # The hash of a parsed file is kept with its contents, so the file is only read when needed
+        try:
+            return (parsed_files.digest(path), path.suffix)
+        except OSError as error:
+            raise _Unhashable(source) from error
+
+    try:
+        stat = os.stat(path)
+    except OSError as error:
+        # The file cannot be loaded, so let ConfZ handle it without caching
+        raise _Unhashable(source) from error
+
+    return (str(path.absolute()), stat.st_mtime_ns, stat.st_size)
+
+
+def _freeze(value: Any) -> Hashable:
+    # Recursively convert data into a hashable equivalent, keeping types apart (e.g. `1` and `True`)
+    if isinstance(value, dict):
+        return (dict, tuple((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = tuple(_freeze(item) for item in value)
+        return (type(value), frozenset(items) if isinstance(value, (set, frozenset)) else items)
+    if isinstance(value, BaseModel):
+        return (type(value), _freeze(value.__dict__))
+
+    try:
+        hash(value)
+    except TypeError as error:
+        raise _Unhashable(value) from error
+    return (type(value), value)
+
+
+config_cache = ConfigCache()
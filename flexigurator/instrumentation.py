@@ -0,0 +1,334 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import AbstractContextManager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from types import MappingProxyType, TracebackType
+from typing import Any, Callable, Mapping, Type
+
+import confz.confz as confz_module
+
+# Spans are timed with the monotonic clock and reported in nanoseconds since the epoch, as
+# expected by e.g. OpenTelemetry
+_EPOCH_OFFSET_NS = time.time_ns() - time.perf_counter_ns()
+
+_DISABLED: AbstractContextManager[None] = nullcontext()
+
+_current_span: ContextVar[str | None] = ContextVar("flexigurator_current_span", default=None)
+
+
+@dataclass(frozen=True)
+class Span:
+    """A timed stage of loading a config, e.g. `patch_config` or `file.parse`."""
+
+    name: str
+    start_time_ns: int
+    end_time_ns: int
+    attributes: Mapping[str, Any] = field(default_factory=dict)
+    parent: str | None = None
+
+    @property
+    def duration(self) -> float:
+        return (self.end_time_ns - self.start_time_ns) / 1e9
+
+
+class Exporter(ABC):
+    """Receives the spans and counters of `instrumentation`."""
+
+    @abstractmethod
+    def export_span(self, span: Span) -> None:
+        """Handle a finished span.
+
+        Args:
+            span (Span): The finished span
+        """
+
+    @abstractmethod
+    def export_count(self, name: str, value: int, attributes: Mapping[str, Any]) -> None:
+        """Handle an incremented counter.
+
+        Args:
+            name (str): The name of the counter, e.g. `config_cache.hits`
+            value (int): The increment
+            attributes (Mapping[str, Any]): Describes the counted event, e.g. the path of a file
+        """
+
+
+@dataclass
+class SpanStats:
+    """Aggregated durations of the spans with the same name."""
+
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class InstrumentationStats(Exporter):
+    """Aggregate spans and counters in memory, e.g. to inspect them in a debugger or a test."""
+
+    def __init__(self) -> None:
+        self._spans: dict[str, SpanStats] = {}
+        self._counters: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def export_span(self, span: Span) -> None:
+        with self._lock:
+            stats = self._spans.setdefault(span.name, SpanStats())
+            stats.count += 1
+            stats.total += span.duration
+            stats.max = max(stats.max, span.duration)
+
+    def export_count(self, name: str, value: int, attributes: Mapping[str, Any]) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def spans(self) -> dict[str, SpanStats]:
+        """Return the aggregated spans by name.
+
+        Returns:
+            dict[str, SpanStats]: A copy of the statistics of every span name
+        """
+        with self._lock:
+            return {
+                name: SpanStats(stats.count, stats.total, stats.max)
+                for name, stats in self._spans.items()
+            }
+
+    def counters(self) -> dict[str, int]:
+        """Return the counters by name.
+
+        Returns:
+            dict[str, int]: A copy of the counters
+        """
+        with self._lock:
+            return dict(self._counters)
+
+    def report(self) -> str:
+        """Format the spans, slowest first, and the counters as a table.
+
+        Returns:
+            str: The formatted statistics
+        """
+        lines = [f"{'span':<30} {'count':>8} {'total ms':>10} {'mean ms':>10} {'max ms':>10}"]
+        for name, stats in sorted(self.spans().items(), key=lambda item: -item[1].total):
+            lines.append(
+                f"{name:<30} {stats.count:>8} {stats.total * 1e3:>10.3f} "
+                f"{stats.mean * 1e3:>10.3f} {stats.max * 1e3:>10.3f}"
+            )
+        lines.extend(f"{name:<30} {value:>8}" for name, value in sorted(self.counters().items()))
+        return "\n".join(lines)
+
+    def clear(self) -> None:
+        """Reset all spans and counters."""
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+
+
+class LoggingExporter(Exporter):
+    """Log every span and counter.
+
+    Args:
+        logger (logging.Logger): The logger to write to
+        level (int): The level of the log records
+
+    """
+
+    def __init__(self, logger: logging.Logger | None = None, level: int = logging.DEBUG):
+        self.logger = logger or logging.getLogger("flexigurator")
+        self.level = level
+
+    def export_span(self, span: Span) -> None:
+        self.logger.log(
+            self.level, "%s took %.3f ms %s", span.name, span.duration * 1e3, dict(span.attributes)
+        )
+
+    def export_count(self, name: str, value: int, attributes: Mapping[str, Any]) -> None:
+        self.logger.log(self.level, "%s +%d %s", name, value, dict(attributes))
+
+
+class CallbackExporter(Exporter):
+    """Pass every span and counter to callbacks, e.g. to forward them to OpenTelemetry.
+
+    Args:
+        on_span (Callable[[Span], None]): Called with every finished span
+        on_count (Callable[[str, int, Mapping[str, Any]], None] | None): Called with the name,
+            increment and attributes of every counted event
+
+    """
+
+    def __init__(
+        self,
+        on_span: Callable[[Span], None],
+        on_count: Callable[[str, int, Mapping[str, Any]], None] | None = None,
+    ):
+        self.on_span = on_span
+        self.on_count = on_count
+
+    def export_span(self, span: Span) -> None:
+        self.on_span(span)
+
+    def export_count(self, name: str, value: int, attributes: Mapping[str, Any]) -> None:
+        if self.on_count is not None:
+            self.on_count(name, value, attributes)
+
+
+class _ActiveSpan:
+    """Times a span and exports it when it is exited."""
+
+    def __init__(self, owner: Instrumentation, name: str, attributes: dict[str, Any]):
+        self._owner = owner
+        self._name = name
+        self._attributes = attributes
+        self._start = 0
+        self._token: Any = None
+
+    def __enter__(self) -> None:
+        self._token = _current_span.set(self._name)
+        self._start = time.perf_counter_ns()
+
+    def __exit__(
+        self,
+        error_type: Type[BaseException] | None,
+        error: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        end = time.perf_counter_ns()
+        _current_span.reset(self._token)
+
+        if error_type is not None:
+            self._attributes["error"] = error_type.__name__
+        self._owner.export(
+            Span(
+                self._name,
+                self._start + _EPOCH_OFFSET_NS,
+                end + _EPOCH_OFFSET_NS,
+                MappingProxyType(self._attributes),
+                _current_span.get(),
+            )
+        )
+
+
+class Instrumentation:
+    """Time the stages of loading configs and count file reads and cache hits.
+
+    Instrumentation is disabled until an exporter is added, which keeps its overhead to a function
+    call per stage. While enabled, the construction of ConfZ configs is timed as well (the
+    `config.construct` span, of which loading the sources is the `config.load` span and the
+    remainder is validation).
+    """
+
+    def __init__(self) -> None:
+        self._exporters: tuple[Exporter, ...] = ()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._exporters)
+
+    def add_exporter(self, exporter: Exporter) -> None:
+        """Start exporting spans and counters to an exporter.
+
+        Args:
+            exporter (Exporter): The exporter
+        """
+        with self._lock:
+            if not self._exporters:
+                _construction_hooks.install(self)
+            self._exporters = (*self._exporters, exporter)
+
+    def remove_exporter(self, exporter: Exporter) -> None:
+        """Stop exporting to an exporter, instrumentation is disabled after removing the last one.
+
+        Args:
+            exporter (Exporter): The exporter
+        """
+        with self._lock:
+            self._exporters = tuple(added for added in self._exporters if added is not exporter)
+            if not self._exporters:
+                _construction_hooks.uninstall()
+
+    def span(self, name: str, **attributes: Any) -> AbstractContextManager[None]:
+        """Time the enclosed code as a span.
+
+        Args:
+            name (str): The name of the span, e.g. `file.parse`
+            attributes (Any): Describes the span, e.g. the path of a parsed file
+
+        Returns:
+            AbstractContextManager[None]: The span, which does nothing when instrumentation is
+                disabled
+        """
+        if not self._exporters:
+            return _DISABLED
+        return _ActiveSpan(self, name, attributes)
+
+    def count(self, name: str, value: int = 1, **attributes: Any) -> None:
+        """Increment a counter.
+
+        Args:
+            name (str): The name of the counter, e.g. `config_cache.hits`
+            value (int): The increment
+            attributes (Any): Describes the counted event, e.g. the path of a file
+        """
+        for exporter in self._exporters:
+            exporter.export_count(name, value, attributes)
+
+    def export(self, span: Span) -> None:
+        """Pass a finished span to all exporters.
+
+        Args:
+            span (Span): The finished span
+        """
+        for exporter in self._exporters:
+            exporter.export_span(span)
+
+
+class _ConstructionHooks:
+    """Wraps the construction of ConfZ configs in spans while instrumentation is enabled."""
+
+    def __init__(self) -> None:
+        self._originals: tuple[Callable, Callable] | None = None
+
+    def install(self, owner: Instrumentation) -> None:
+        # ConfZ has no hooks, so its metaclass call and config loading function are wrapped
+        original_call = confz_module.ConfZMetaclass.__call__
+        original_load = confz_module._load_config  # pylint: disable=protected-access
+
+        def construct(cls, config_sources=None, **kwargs):
+            if config_sources is None and (
+                cls.CONFIG_SOURCES is None or cls.confz_instance is not None
+            ):
+                return original_call(cls, config_sources, **kwargs)
+
+            with owner.span("config.construct", config_class=cls.__name__):
+                return original_call(cls, config_sources, **kwargs)
+
+        def load(config_kwargs, confz_sources):
+            with owner.span("config.load"):
+                return original_load(config_kwargs, confz_sources)
+
+        self._originals = (original_call, original_load)
+        confz_module.ConfZMetaclass.__call__ = construct  # type: ignore
+        confz_module._load_config = load  # pylint: disable=protected-access
+
+    def uninstall(self) -> None:
+        if self._originals is not None:
+            # pylint: disable-next=protected-access
+            confz_module.ConfZMetaclass.__call__, confz_module._load_config = (  # type: ignore
+                self._originals
+            )
+            self._originals = None
+
+
+_construction_hooks = _ConstructionHooks()
+
+instrumentation = Instrumentation()
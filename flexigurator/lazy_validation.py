@@ -0,0 +1,107 @@
+from typing import Any
+
+from pydantic import BaseModel, ValidationError
+from pydantic.fields import SHAPE_SINGLETON, ModelField
+
+
+class _Unvalidated:
+    """The input of a lazily validated field, until it is validated."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+
+class _LazyModelField(ModelField):
+    """A model field which defers validating its input until the field is accessed."""
+
+    __slots__ = ()
+
+    def validate(  # pylint: disable=W0613
+        self, v: Any, values: Any, *, loc: Any, cls: Any = None
+    ) -> tuple[Any, Any]:
+        return _Unvalidated(v), None
+
+
+class _LazyField:
+    """Data descriptor validating a lazily validated field when it is first accessed."""
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __get__(self, instance: Any, owner: Any = None) -> Any:
+        if instance is None:
+            return self
+
+        value = instance.__dict__[self._name]
+        if isinstance(value, _Unvalidated):
+            value = _validate_field(instance, self._name, value)
+        return value
+
+    def __set__(self, instance: Any, value: Any) -> None:
+        instance.__dict__[self._name] = value
+
+
+def _validate_field(instance: BaseModel, name: str, unvalidated: _Unvalidated) -> Any:
+    model_type = type(instance)
+    field = model_type.__fields__[name]
+
+    value, errors = ModelField.validate(
+        field, unvalidated.value, instance.__dict__, loc=field.alias, cls=model_type
+    )
+    if errors:
+        raise ValidationError([errors], model_type)
+
+    # Validating the same input again gives the same value, so concurrent accesses may both store it
+    instance.__dict__[name] = value
+    return value
+
+
+class LazyValidation(BaseModel):
+    """Mixin deferring the validation of fields holding nested models until they are accessed.
+
+    Constructing a config with many (large) sections then only validates its other fields, and a
+    section is validated when it is first used. A section missing in the sources is still reported
+    when the config is constructed, other validation errors are raised when the section is accessed.
+    Converting the config (e.g. with `dict` or `json`) or calling `validate_lazy_fields` validates
+    all sections, as does `ConfigVersions.validate_all`.
+
+    class Config(LazyValidation, ConfZ):
+        ui: UIConfig = placeholder(UIConfig)
+        server: ServerConfig
+
+    Config().server  # Only validates the server section
+
+    Validators of the config class receive unvalidated sections, so sections used by root
+    validators should not be validated lazily. Set `lazy_validation = False` in the field info
+    (e.g. `Field(lazy_validation=False)`) to validate a section with the config.
+    """
+
+    def __init_subclass__(cls, **kwargs: Any):
+        super().__init_subclass__(**kwargs)
+
+        for name, field in cls.__fields__.items():
+            if (
+                field.shape == SHAPE_SINGLETON
+                and isinstance(field.type_, type)
+                and issubclass(field.type_, BaseModel)
+                and field.field_info.extra.get("lazy_validation", True)
+            ):
+                field.__class__ = _LazyModelField
+                setattr(cls, name, _LazyField(name))
+
+    def validate_lazy_fields(self) -> None:
+        """Validate all fields which are not validated yet."""
+        for name, value in list(self.__dict__.items()):
+            if isinstance(value, _Unvalidated):
+                _validate_field(self, name, value)
+
+    def _iter(self, *args: Any, **kwargs: Any) -> Any:
+        # Used by pydantic to convert, copy and compare models, which read the fields directly
+        self.validate_lazy_fields()
+        return super()._iter(*args, **kwargs)
+
+    def __repr_args__(self) -> Any:
+        self.validate_lazy_fields()
+        return super().__repr_args__()
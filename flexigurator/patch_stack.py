@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Hashable, Iterable
+
+from confz import ConfZDataSource, ConfZSource
+from confz.exceptions import ConfZUpdateException
+from confz.loaders import Loader, get_loader, register_loader
+
+from flexigurator.instrumentation import instrumentation
+
+
+@dataclass(eq=False)
+class PatchLayer(ConfZSource):
+    """A config source applying patch sources on top of the sources of the patched config class.
+
+    Nested patches form a persistent stack: a patch refers to the layer of the patch it is nested
+    in rather than copying its sources. When a layer and the layers below it only consist of data
+    sources, its merged data is kept, so loading a nested patch only merges its own sources onto the
+    merged data of the layer below.
+    """
+
+    parent: tuple[ConfZSource, ...]
+    sources: tuple[ConfZSource, ...]
+    static: bool = field(init=False)
+    merged_data: dict | None = field(default=None, init=False, repr=False)
+    cache_key: Hashable | None = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        self.static = all(_is_static(source) for source in (*self.parent, *self.sources))
+
+    def merged(self) -> dict:
+        """Return the data of the parent sources and the patch sources merged.
+
+        The returned data is shared with the layers on top of it, so it must not be modified.
+
+        Returns:
+            dict: The merged data
+        """
+        if self.merged_data is not None:
+            return self.merged_data
+
+        with instrumentation.span("patch_layer.merge", sources=len(self.sources)):
+            if len(self.parent) == 1 and isinstance(self.parent[0], PatchLayer):
+                # Nested patch, only the patch sources are merged onto the data of the parent
+                data = _merge(self.parent[0].merged(), _load(self.sources))
+            else:
+                data = _load((*self.parent, *self.sources))
+
+        if self.static:
+            self.merged_data = data
+        return data
+
+
+def _is_static(source: ConfZSource) -> bool:
+    # The content of data sources does not change while patched, unlike files or the environment
+    if isinstance(source, PatchLayer):
+        return source.static
+    return isinstance(source, ConfZDataSource)
+
+
+def _load(sources: Iterable[ConfZSource]) -> dict:
+    # Loaders modify the nested dicts of the data they populate, which may be the data of an earlier
+    # source, so every source is loaded on its own and merged into a copy
+    data: dict = {}
+    for source in sources:
+        source_data: dict = {}
+        get_loader(type(source)).populate_config(source_data, source)
+        data = _merge(data, source_data)
+    return data
+
+
+def _merge(data: dict, update: dict) -> dict:
+    """Merge data like `Loader.update_dict_recursively`, but into a copy sharing unchanged dicts.
+
+    Args:
+        data (dict): The data to update, which is not modified
+        update (dict): The new data
+
+    Returns:
+        dict: The updated data
+
+    Raises:
+        ConfZUpdateException: When a key holds a value in the data and a nested dict in the update
+    """
+    merged = dict(data)
+    for key, value in update.items():
+        if isinstance(value, dict) and key in merged:
+            if not isinstance(merged[key], dict):
+                raise ConfZUpdateException(
+                    f"Config variables contradict each other: "
+                    f"Key '{key}' is both a value and a nested dict."
+                )
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _copy_dicts(data: dict) -> dict:
+    # Populating a config only modifies (nested) dicts, so the other values are not copied
+    copied = dict(data)
+    for key, value in copied.items():
+        if isinstance(value, dict):
+            copied[key] = _copy_dicts(value)
+    return copied
+
+
+class PatchLayerLoader(Loader):
+    """Config loader for `PatchLayer`s."""
+
+    @classmethod
+    def populate_config(cls, config: dict, confz_source: PatchLayer):
+        # Populating the config modifies nested dictionaries, so keep the merged data intact
+        data = _copy_dicts(confz_source.merged())
+
+        if config:
+            cls.update_dict_recursively(config, data)
+        else:
+            config.update(data)
+
+
+register_loader(PatchLayer, PatchLayerLoader)
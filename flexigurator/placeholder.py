@@ -1,48 +1,68 @@
+from functools import cache
 from typing import Any, Type
 
 from pydantic import BaseModel
-from pydantic.fields import Field, ModelField
 
 
 class NotConfiguredError(Exception):
     """Raised when a requested configuration variable is not supplied in configuration source."""
 
 
-class Placeholder(BaseModel):
-    model_type: Type[BaseModel]
-    model_fields: dict[str, ModelField] = Field(default_factory=dict)  # pylint: disable=E0601
+class _NotConfiguredField:
+    """Descriptor raising a `NotConfiguredError` when a field of a placeholder is requested."""
 
-    def __getattribute__(self, item: str) -> Any:
-        # Get an attribute 'as usual' but raise a `NotConfiguredError` on Model fields.
-        try:
-            # Check if the requested attribute is part of the BaseModel fields
-            fields = object.__getattribute__(self, "model_fields")
+    def __init__(self, model_type: Type[BaseModel]):
+        self._model_type = model_type
 
-            if item in fields:
-                # A BaseModel field is being requested, but as this model is not configured we
-                # throw an exception
-                raise NotConfiguredError(self.model_type)
+    def __get__(self, instance: Any, owner: Any = None) -> Any:
+        if instance is None:
+            return self
+        # A BaseModel field is being requested, but as this model is not configured we throw an
+        # exception
+        raise NotConfiguredError(self._model_type)
 
-        except AttributeError:
-            # We cannot check using other means than a try/catch due to recursion.
-            pass
 
-        # The requested attribute is not a BaseModel field, so we return the attribute normally
-        return object.__getattribute__(self, item)
+class Placeholder(BaseModel):
+    model_type: Type[BaseModel]
 
     @classmethod
     def create(cls, model_type: Type[BaseModel]) -> "Placeholder":
-        return Placeholder(model_type=model_type, model_fields=model_type.__fields__)
+        return _interned_placeholder(model_type)
 
     def __repr__(self):
         return f"NotConfigured({self.model_type})"
 
+    def __reduce__(self):
+        # Placeholder classes are created dynamically, so recreate them through `create`
+        return Placeholder.create, (self.model_type,)
+
+    def __copy__(self) -> "Placeholder":
+        return self
+
+    def __deepcopy__(self, memo: dict[int, Any]) -> "Placeholder":
+        # Placeholders are immutable and shared, which saves pydantic from copying field defaults
+        return self
+
     def dict(self, *args, **kwargs) -> Any:  # pylint: disable=W0613
         # Overrides the pydantic default `dict` to return nothing.
         return {}
 
     class Config:
         arbitrary_types_allowed = True
+        allow_mutation = False
+
+
+@cache
+def _interned_placeholder(model_type: Type[BaseModel]) -> Placeholder:
+    # Create a single Placeholder per model type from a subclass in which all fields of the model
+    # type are descriptors, so accessing any other attribute is as fast as on a regular model
+    placeholder_class = type(f"Placeholder[{model_type.__name__}]", (Placeholder,), {})
+
+    for field_name in model_type.__fields__:
+        if field_name not in Placeholder.__fields__:
+            setattr(placeholder_class, field_name, _NotConfiguredField(model_type))
+
+    return placeholder_class(model_type=model_type)
 
 
 def placeholder(model_type: Type[BaseModel]) -> Any:
@@ -61,6 +81,9 @@ def placeholder(model_type: Type[BaseModel]) -> Any:
     SomeModel().sub_model.some_int                                    # Raises NotConfiguredError
     SomeModel(sub_model=SomeSubModel(some_int=5)).sub_model.some_int  # Returns 5
 
+    Placeholders are immutable and shared: every call with the same model type returns the same
+    object.
+
     Args:
         model_type (Type[BaseModel]): The type of BaseModel it makes configurable
 
@@ -0,0 +1,27 @@
+from pathlib import Path
+from typing import Any, Type
+
+import yaml
+
+YamlLoader = Type[yaml.SafeLoader] | Type[Any]
+
+# Use the libyaml C bindings when PyYAML is built with them, they are an order of magnitude faster
+SafeLoader: YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def load_yaml(path: Path, loader: YamlLoader = SafeLoader) -> dict[str, Any]:
+    """Load a `.yaml` file as a dictionary.
+
+    The file is parsed straight from the file handle, so it is never held in memory as a string.
+
+    Args:
+        path (Path): Path to the `.yaml` file
+        loader (YamlLoader): The PyYAML loader class, by default the (C) safe loader
+
+    Returns:
+        dict[str, Any]: The contents of the file, an empty dictionary for an empty file
+    """
+    with open(path, "rb") as yaml_file:
+        yaml_object = yaml.load(yaml_file, Loader=loader)
+
+    return yaml_object if yaml_object else {}
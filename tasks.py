@@ -81,3 +81,12 @@ def pipeline(context, is_local=False):
     codestyle(context)
     docstyle(context)
     test(context, is_local)
+
+
+@task
+def benchmark(context, save=False):
+    """Run the benchmarks and compare them against the tracked baseline.
+
+    Use `--save` to store the results as the new baseline in `benchmarks/baseline.json`.
+    """
+    context.run(f"python -m benchmarks --compare {'--save' if save else ''}", pty=_PTY_AVAILABLE)
@@ -1,18 +1,35 @@
+import gzip
+import os
+import shutil
+import threading
+import time
 from pathlib import Path
 import tempfile
-from unittest.mock import MagicMock
+
+import anyio
+import pytest
+from fastapi.datastructures import Headers
+from fastapi.templating import Jinja2Templates
 
 from flexigurator.form.form import (
+    _jinja_templates_default_path,
     ConfigTemplate,
-    _config_form_start_vals,
-    _load_config_templates,
+    ConfigTemplateRegistry,
+    FsyncPolicy,
+    _FormPages,
+    _PageCache,
+    _page_response,
+    _BlockingIO,
     _load_yaml,
+    _file_lock,
     _save_config_form_output,
+    _save_config_form_outputs,
+    _write_to_file,
 )
 from pytest_mock import MockerFixture
 
 
-def test_load_config_templates(mocker: MockerFixture):
+def test_config_template_registry_templates(mocker: MockerFixture):
     with tempfile.TemporaryDirectory(
         dir="./",
     ) as folder_name:
@@ -31,14 +48,18 @@ def test_load_config_templates(mocker: MockerFixture):
             file_path.parent.mkdir(exist_ok=True, parents=True)
             open(file_path, "w+")
 
-        hash_mock = MagicMock()
-        hash_mock.hash.side_effect = ["1", "2", "3", "4"]
-        mocker.patch("flexigurator.form.form.mmh3", hash_mock)
+        uids = {
+            "config_one": "1",
+            "config_two": "2",
+            "nested/also_nested/config_four": "3",
+            "nested/config_three": "4",
+        }
+        mocker.patch("mmh3.hash", side_effect=lambda name, signed: uids[name])
 
         expected = [
             ConfigTemplate("1", "config_one", folder_path.joinpath(Path("config_one.yaml"))),
             ConfigTemplate("2", "config_two", folder_path.joinpath(Path("config_two.yaml"))),
-            # Glob returns in alphabetical order
+            # Templates are sorted by name
             ConfigTemplate(
                 "3",
                 "nested/also_nested/config_four",
@@ -49,7 +70,7 @@ def test_load_config_templates(mocker: MockerFixture):
             ),
         ]
 
-        actual = _load_config_templates(folder_path)
+        actual = list(ConfigTemplateRegistry(templates_path=folder_path))
 
     assert actual == expected
 
@@ -144,6 +165,316 @@ def test_config_form_start_vals():
 
         _save_config_form_output(json_, "nested/config_three", folder_path)
 
-        actual = _config_form_start_vals("3", templates)
+        actual = ConfigTemplateRegistry(templates).start_vals("3")
 
     assert actual == expected
+
+
+def test_config_template_registry():
+    with tempfile.TemporaryDirectory(
+        dir="./",
+    ) as folder_name:
+        folder_path = Path(folder_name)
+        template = ConfigTemplate("1", "config_one", folder_path.joinpath(Path("config_one.yaml")))
+        registry = ConfigTemplateRegistry([template])
+
+        _save_config_form_output(dict(a=1), "config_one", folder_path)
+        first = registry.start_vals("1")
+        assert registry.start_vals("1") is first
+
+        _save_config_form_output(dict(a=2), "config_one", folder_path)
+        os.utime(template.path, ns=(0, 0))
+        second = registry.start_vals("1")
+
+        assert registry["1"] == template
+        assert list(registry) == [template] and len(registry) == 1
+        assert (first, second) == ('{"a": 1}', '{"a": 2}')
+
+        with pytest.raises(KeyError):
+            registry.start_vals("2")
+
+
+def test_page_cache():
+    renders = []
+
+    def render():
+        renders.append(1)
+        return f"<html>{len(renders)}</html>"
+
+    pages = _PageCache(maxsize=1)
+
+    first = pages.get("a", 1, render)
+    assert pages.get("a", 1, render) is first
+    assert pages.get("a", 2, render).body == b"<html>2</html>"
+    pages.get("b", 1, render)
+    assert pages.get("a", 2, render).body == b"<html>4</html>"
+    assert gzip.decompress(first.gzip_body) == first.body
+
+
+def test_page_response():
+    page = _PageCache(maxsize=1).get("a", 1, lambda: "<html></html>")
+
+    plain = _page_response(page, Headers({}))
+    compressed = _page_response(page, Headers({"accept-encoding": "br;q=1.0, gzip;q=0.8"}))
+
+    assert plain.status_code == 200 and plain.body == page.body
+    assert plain.headers["etag"] == page.etag(gzipped=False)
+    assert compressed.body == page.gzip_body
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["etag"] == page.etag(gzipped=True) != plain.headers["etag"]
+    assert "last-modified" not in plain.headers
+
+
+@pytest.mark.parametrize(
+    "headers, expected",
+    [
+        (lambda page: {"if-none-match": page.etag(False)}, 304),
+        (lambda page: {"if-none-match": f'"other", W/{page.etag(False)}'}, 304),
+        (lambda page: {"if-none-match": "*"}, 304),
+        (lambda page: {"if-none-match": '"other"'}, 200),
+        (lambda page: {"if-none-match": page.etag(True), "accept-encoding": "gzip"}, 304),
+        # The validator of one coding does not match the other
+        (lambda page: {"if-none-match": page.etag(True)}, 200),
+        (lambda page: {"if-none-match": page.etag(False), "accept-encoding": "gzip"}, 200),
+        # Render times do not tell whether a page changed, so only ETags are compared
+        (lambda page: {"if-modified-since": "Fri, 31 Dec 9999 23:59:59 GMT"}, 200),
+    ],
+)
+def test_page_response_conditional(headers, expected):
+    page = _PageCache(maxsize=1).get("a", 1, lambda: "<html></html>")
+
+    actual = _page_response(page, Headers(headers(page)))
+
+    assert actual.status_code == expected
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        ("gzip", True),
+        ("GZIP;q=0.5", True),
+        ("br, *", True),
+        ("gzip;q=0", False),
+        ("gzip; q=0.0, br", False),
+        ("*;q=0", False),
+        ("*, gzip;q=0", False),
+        ("br", False),
+    ],
+)
+def test_page_response_accept_encoding(accept_encoding, expected):
+    page = _PageCache(maxsize=1).get("a", 1, lambda: "<html></html>")
+
+    actual = _page_response(page, Headers({"accept-encoding": accept_encoding}))
+
+    assert (actual.body == page.gzip_body) is expected
+    assert ("content-encoding" in actual.headers) is expected
+
+
+def test_form_pages():
+    with tempfile.TemporaryDirectory(
+        dir="./",
+    ) as folder_name:
+        folder_path = Path(folder_name)
+        _save_config_form_output(dict(a=1), "config_one", folder_path)
+        registry = ConfigTemplateRegistry(
+            [ConfigTemplate("1", "config_one", folder_path.joinpath(Path("config_one.yaml")))]
+        )
+        pages = _FormPages(
+            Jinja2Templates(directory=_jinja_templates_default_path()), registry, '{"schema": 1}', 8
+        )
+
+        index = pages.index()
+        config_form = pages.config_form("1")
+
+        assert pages.index() is index and pages.config_form("1") is config_form
+        assert b"config_one" in index.body
+        assert b'{"schema": 1}' in config_form.body and b'{"a": 1}' in config_form.body
+
+
+@pytest.mark.parametrize("max_io_concurrency", [4, 1])
+def test_run_io_concurrent(max_io_concurrency):
+    # Four "requests" doing blocking I/O, keeping track of how many of them run at the same time
+    blocking_io = _BlockingIO(max_io_concurrency)
+    lock = threading.Lock()
+    running = [0]
+    peak = [0]
+
+    def blocking_request():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+
+    async def requests():
+        async with anyio.create_task_group() as task_group:
+            for _ in range(4):
+                task_group.start_soon(blocking_io.run, blocking_request)
+
+    anyio.run(requests)
+
+    assert peak[0] == 1 if max_io_concurrency == 1 else 1 < peak[0] <= max_io_concurrency
+
+
+def test_write_to_file_replaces_atomically(mocker: MockerFixture):
+    with tempfile.TemporaryDirectory(
+        dir="./",
+    ) as folder_name:
+        file_path = Path(folder_name).joinpath(Path("test.yaml"))
+        _write_to_file(file_path, "a: 1\n")
+
+        mocker.patch("flexigurator.form.form.os.replace", side_effect=OSError)
+        with pytest.raises(OSError):
+            _write_to_file(file_path, "a: 2\n")
+
+        assert file_path.read_text() == "a: 1\n"
+        assert os.listdir(folder_name) == ["test.yaml"]
+
+
+@pytest.mark.parametrize(
+    "fsync, expected", [(FsyncPolicy.NONE, 0), (FsyncPolicy.FILE, 1), (FsyncPolicy.FULL, 2)]
+)
+def test_write_to_file_fsync(mocker: MockerFixture, fsync, expected):
+    fsync_spy = mocker.spy(os, "fsync")
+
+    with tempfile.TemporaryDirectory(
+        dir="./",
+    ) as folder_name:
+        _write_to_file(Path(folder_name).joinpath(Path("test.yaml")), "a: 1\n", fsync)
+
+    assert fsync_spy.call_count == expected
+
+
+def test_file_lock():
+    assert _file_lock(Path("a.yaml")) is _file_lock(Path("a.yaml").absolute())
+    assert _file_lock(Path("a.yaml")) is not _file_lock(Path("b.yaml"))
+
+
+def test_save_config_form_outputs(mocker: MockerFixture):
+    fsync_spy = mocker.spy(os, "fsync")
+    configs = {"one": dict(a=1), "nested/two": dict(a=2), "nested/three": {}}
+
+    with tempfile.TemporaryDirectory(
+        dir="./",
+    ) as folder_name:
+        folder_path = Path(folder_name)
+        _save_config_form_outputs(configs, folder_path, FsyncPolicy.FULL)
+
+        actual = {name: _load_yaml(folder_path.joinpath(name + ".yaml")) for name in configs}
+
+    assert actual == configs
+    # One flush per file and one per directory
+    assert fsync_spy.call_count == 5
+
+
+def test_save_config_form_outputs_outside_save_path():
+    with tempfile.TemporaryDirectory(
+        dir="./",
+    ) as folder_name:
+        folder_path = Path(folder_name)
+
+        with pytest.raises(ValueError):
+            _save_config_form_outputs({"one": {}, "../two": {}}, folder_path)
+
+        assert os.listdir(folder_name) == []
+
+
+@pytest.mark.parametrize("configs", [[{"a": 1}], {"one": [1]}, {1: {}}, {"one": {}, "two": 2}])
+def test_save_config_form_outputs_invalid_configs(configs):
+    with tempfile.TemporaryDirectory(
+        dir="./",
+    ) as folder_name:
+        with pytest.raises(ValueError):
+            _save_config_form_outputs(configs, Path(folder_name))
+
+        assert os.listdir(folder_name) == []
+
+
+def test_config_template_registry_discovers_templates(mocker: MockerFixture):
+    with tempfile.TemporaryDirectory(
+        dir="./",
+    ) as folder_name:
+        folder_path = Path(folder_name)
+        _save_config_form_output(dict(a=1), "config_one", folder_path)
+        _save_config_form_output(dict(a=2), "nested/deeper/config_two", folder_path)
+        registry = ConfigTemplateRegistry(templates_path=folder_path, refresh_interval=0)
+
+        assert [template.name for template in registry] == [
+            "config_one",
+            "nested/deeper/config_two",
+        ]
+
+        # Unchanged directories are not listed again
+        scandir_spy = mocker.spy(os, "scandir")
+        registry.refresh()
+        assert scandir_spy.call_count == 0
+
+        version = registry.version
+        uid = ConfigTemplate.from_path(folder_path.joinpath("config_one.yaml"), folder_path).uid
+        assert registry.start_vals(uid) == '{"a": 1}'
+
+        _save_config_form_output(dict(a=3), "nested/config_three", folder_path)
+        os.rename(folder_path.joinpath("config_one.yaml"), folder_path.joinpath("renamed.yaml"))
+        for directory in (folder_path, folder_path.joinpath("nested", "deeper")):
+            # Make sure the changes are visible even on file systems with coarse timestamps
+            os.utime(directory, ns=(0, 0))
+        os.remove(folder_path.joinpath("nested", "deeper", "config_two.yaml"))
+        os.rmdir(folder_path.joinpath("nested", "deeper"))
+        os.utime(folder_path.joinpath("nested"), ns=(0, 0))
+
+        assert [template.name for template in registry] == ["nested/config_three", "renamed"]
+        assert registry.version == version + 1
+        with pytest.raises(KeyError):
+            registry.start_vals(uid)
+
+
+def test_config_template_registry_refresh_interval():
+    with tempfile.TemporaryDirectory(
+        dir="./",
+    ) as folder_name:
+        folder_path = Path(folder_name)
+        registry = ConfigTemplateRegistry(templates_path=folder_path, refresh_interval=3600)
+
+        assert len(registry) == 0
+
+        _save_config_form_output(dict(a=1), "config_one", folder_path)
+        os.utime(folder_path, ns=(0, 0))
+
+        assert len(registry) == 0
+        registry.refresh(force=True)
+        assert len(registry) == 1
+
+
+def test_config_template_registry_removed_tree():
+    with tempfile.TemporaryDirectory(
+        dir="./",
+    ) as folder_name:
+        folder_path = Path(folder_name)
+        _save_config_form_output(dict(a=1), "nested/deeper/config_one", folder_path)
+        registry = ConfigTemplateRegistry(templates_path=folder_path, refresh_interval=0)
+
+        assert len(registry) == 1
+
+        shutil.rmtree(folder_path.joinpath("nested"))
+        os.utime(folder_path, ns=(0, 0))
+
+        assert len(registry) == 0
+
+
+def test_config_template_registry_symlinked_directories():
+    with tempfile.TemporaryDirectory(
+        dir="./",
+    ) as folder_name:
+        folder_path = Path(folder_name)
+        _save_config_form_output(dict(a=1), "sub/config_one", folder_path)
+        folder_path.joinpath("sub", "loop").symlink_to("..", target_is_directory=True)
+        registry = ConfigTemplateRegistry(templates_path=folder_path, refresh_interval=0)
+
+        assert len(registry) == 1
+
+
+def test_config_template_registry_missing_directory():
+    registry = ConfigTemplateRegistry(templates_path=Path("does/not/exist"), refresh_interval=0)
+
+    assert len(registry) == 0
@@ -0,0 +1,132 @@
+import mmap
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+from confz import ConfZ, ConfZDataSource
+
+from flexigurator import BundleSource, ConfigVersions, DirectorySource, pack_bundle
+
+
+class MultiFieldConfig(ConfZ):  # type: ignore
+    __test__ = False
+    a: int
+    b: int
+
+
+def _write_tree(temp_dir):
+    os.makedirs(temp_dir + "/versions/nested")
+    with open(temp_dir + "/versions/config_a.yaml", "w") as file:
+        file.write("""a: 1\nb: 2""")
+    with open(temp_dir + "/versions/nested/config_b.yaml", "w") as file:
+        file.write("""a: 3""")
+    return Path(temp_dir) / "versions"
+
+
+def test_bundle_source():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        bundle_path = Path(temp_dir) / "versions.bundle"
+        count = pack_bundle(DirectorySource(_write_tree(temp_dir)), bundle_path)
+
+        bundle = BundleSource(bundle_path)
+
+        assert count == 2
+        assert sorted(bundle.versions()) == ["config_a", "nested.config_b"]
+        assert bundle.get("nested.config_b").data == dict(a=3)
+        assert bundle.get("nested.config_b") is bundle.get("nested.config_b")
+        assert dict(bundle._items())["config_a"].data == dict(a=1, b=2)
+
+        with pytest.raises(ValueError):
+            bundle.get("nested")
+        with pytest.raises(AttributeError):
+            bundle.get("config_c")
+
+
+def test_bundle_source_in_config_versions():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        bundle_path = Path(temp_dir) / "versions.bundle"
+
+        class PackedConfigs(ConfigVersions):
+            CONFIG_CLASS = MultiFieldConfig
+            test = [ConfZDataSource(dict(a=5)), ConfZDataSource(dict(b=6))]
+            folder = DirectorySource(_write_tree(temp_dir))
+
+        pack_bundle(PackedConfigs(), bundle_path)
+
+        class Configs(ConfigVersions):
+            CONFIG_CLASS = MultiFieldConfig
+            BASE = dict(b=4)
+            bundle = BundleSource(bundle_path)
+
+        with Configs().version("bundle.folder.nested.config_b"):
+            assert (MultiFieldConfig().a, MultiFieldConfig().b) == (3, 4)
+        with Configs().version("bundle.test"):
+            assert (MultiFieldConfig().a, MultiFieldConfig().b) == (5, 6)
+
+        plan = Configs().plan("bundle.test")
+        watcher = Configs().watch(interval=3600)
+        try:
+            # Packing the bundle again replaces the file, which is then opened again
+            PackedConfigs.test = dict(a=7, b=8)
+            pack_bundle(PackedConfigs(), bundle_path)
+            watcher.check()
+
+            with Configs().version("bundle.test"):
+                assert (MultiFieldConfig().a, MultiFieldConfig().b) == (7, 8)
+            assert Configs().plan("bundle.test") is not plan
+        finally:
+            watcher.stop()
+
+
+def test_pack_bundle_config_versions_base():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        bundle_path = Path(temp_dir) / "versions.bundle"
+
+        class PackedConfigs(ConfigVersions):
+            CONFIG_CLASS = MultiFieldConfig
+            BASE = dict(a=1, b=2)
+            test = dict(b=6)
+            folder = DirectorySource(_write_tree(temp_dir))
+
+        count = pack_bundle(PackedConfigs(), bundle_path)
+
+        class Configs(ConfigVersions):
+            CONFIG_CLASS = MultiFieldConfig
+            bundle = BundleSource(bundle_path)
+
+        with Configs().version("bundle.test"):
+            assert (MultiFieldConfig().a, MultiFieldConfig().b) == (1, 6)
+        with Configs().version("bundle.folder.nested.config_b"):
+            assert (MultiFieldConfig().a, MultiFieldConfig().b) == (3, 2)
+
+    assert count == 3
+
+
+def test_pack_bundle_permissions():
+    umask = os.umask(0o022)
+    try:
+        with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+            bundle_path = Path(temp_dir) / "versions.bundle"
+            pack_bundle(DirectorySource(_write_tree(temp_dir)), bundle_path)
+
+            # Readable by the other users, e.g. of the workers the bundle is shipped to
+            assert bundle_path.stat().st_mode & 0o777 == 0o644
+            assert sorted(path.name for path in Path(temp_dir).iterdir()) == [
+                "versions",
+                "versions.bundle",
+            ]
+    finally:
+        os.umask(umask)
+
+
+def test_bundle_source_invalid_file(mocker):
+    mmap_spy = mocker.spy(mmap, "mmap")
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        bundle_path = Path(temp_dir) / "versions.bundle"
+        bundle_path.write_bytes(b"not a bundle")
+
+        with pytest.raises(ValueError):
+            BundleSource(bundle_path).get("config_a")
+
+    assert mmap_spy.spy_return.closed
@@ -0,0 +1,170 @@
+import io
+import json
+import os
+import runpy
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+import yaml
+from confz import ConfZ
+from pydantic import BaseModel
+
+from flexigurator import BundleSource, ConfigVersions
+from flexigurator.cli import load_config_versions, main
+
+
+class CliSubModel(BaseModel):
+    c: list[int] = []
+
+
+class CliConfig(ConfZ):  # type: ignore
+    a: int
+    b: int
+    sub: CliSubModel = CliSubModel()
+
+
+class CliVersions(ConfigVersions):
+    CONFIG_CLASS = CliConfig
+    BASE = dict(a=1, b=2)
+    valid = dict(a=3)
+    invalid = dict(a="invalid")
+    other = dict(a=3, b=4, sub=dict(c=[1]))
+
+
+class ValidVersions(ConfigVersions):
+    CONFIG_CLASS = CliConfig
+    valid = dict(a=1, b=2)
+
+
+class NestedConfig(ConfZ):  # type: ignore
+    values: dict[str, int]
+
+
+class NestedCollection(ConfigVersions):
+    new = dict(values=dict(b=2))
+
+
+class NestedVersions(ConfigVersions):
+    CONFIG_CLASS = NestedConfig
+    old = dict(values=dict(a=1))
+    new = dict(values=dict(b=2))
+    nested = NestedCollection()
+
+
+def test_load_config_versions(mocker):
+    mocker.patch.object(sys, "path", [path for path in sys.path if path != os.getcwd()])
+
+    assert isinstance(load_config_versions("tests.test_cli:CliVersions"), CliVersions)
+
+    assert os.getcwd() in sys.path
+    with pytest.raises(ValueError):
+        load_config_versions("tests.test_cli:CliConfig")
+
+
+def test_validate():
+    output = io.StringIO()
+
+    exit_code = main(["validate", "tests.test_cli:CliVersions", "--workers", "0"], output)
+
+    lines = output.getvalue().splitlines()
+    assert exit_code == 1
+    assert lines[0].startswith("FAILED") and "invalid: ValidationError" in lines[0]
+    assert lines[3].startswith("ok") and lines[3].endswith("other")
+    assert lines[-1].startswith("3 versions, 1 failed in")
+
+
+def test_main_module(mocker, capsys):
+    mocker.patch.object(sys, "argv", ["flexigurator", "validate", "tests.test_cli:ValidVersions"])
+
+    with pytest.raises(SystemExit) as exit_info:
+        runpy.run_module("flexigurator", run_name="__main__")
+
+    assert exit_info.value.code == 0
+    assert "1 versions, 0 failed" in capsys.readouterr().out
+
+
+def test_list():
+    output = io.StringIO()
+
+    assert main(["list", "tests.test_cli:CliVersions", "-k", "*i*"], output) == 0
+    assert output.getvalue().splitlines() == ["invalid", "valid"]
+
+
+def test_validate_match():
+    output = io.StringIO()
+
+    exit_code = main(["validate", "tests.test_cli:CliVersions", "-k", "[!i]*", "-w", "1"], output)
+
+    assert exit_code == 0
+    assert output.getvalue().splitlines()[-1].startswith("2 versions, 0 failed in")
+
+
+def test_diff():
+    output = io.StringIO()
+
+    assert main(["diff", "tests.test_cli:CliVersions", "valid", "other"], output) == 1
+    assert output.getvalue().splitlines() == ["~ b: 2 -> 4", "~ sub.c: [] -> [1]"]
+    assert main(["diff", "tests.test_cli:CliVersions", "valid", "valid"], io.StringIO()) == 0
+
+
+def test_diff_removed_and_added():
+    output = io.StringIO()
+
+    assert main(["diff", "tests.test_cli:NestedVersions", "old", "nested.new"], output) == 1
+    assert output.getvalue().splitlines() == ["- values.a: 1", "+ values.b: 2"]
+
+
+def test_export():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        exit_code = main(
+            ["export", "tests.test_cli:CliVersions", temp_dir, "-w", "0"], io.StringIO()
+        )
+        exported = json.loads((Path(temp_dir) / "other.json").read_text())
+
+        main(
+            ["export", "tests.test_cli:NestedVersions", temp_dir, "-f", "yaml", "-w", "0"],
+            io.StringIO(),
+        )
+        exported_yaml = yaml.safe_load((Path(temp_dir) / "nested" / "new.yaml").read_text())
+
+        assert sorted(path.name for path in Path(temp_dir).glob("*.json")) == [
+            "other.json",
+            "valid.json",
+        ]
+
+    assert exit_code == 1
+    assert exported == dict(a=3, b=4, sub=dict(c=[1]))
+    assert exported_yaml == dict(values=dict(b=2))
+
+
+def test_bundle():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        (Path(temp_dir) / "versions").mkdir()
+        (Path(temp_dir) / "versions" / "config_a.yaml").write_text("a: 1")
+        output = io.StringIO()
+
+        main(["bundle", "tests.test_cli:CliVersions", temp_dir + "/cli.bundle"], output)
+        main(["bundle", temp_dir + "/versions", temp_dir + "/folder.bundle"], output)
+
+        assert sorted(BundleSource(Path(temp_dir) / "cli.bundle").versions()) == [
+            "invalid",
+            "other",
+            "valid",
+        ]
+        assert list(BundleSource(Path(temp_dir) / "folder.bundle").versions()) == ["config_a"]
+
+    assert output.getvalue().splitlines()[0] == f"Packed 3 versions in {temp_dir}/cli.bundle"
+
+
+def test_duplicates():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        for name in ("eu", "us", "asia", "other"):
+            (Path(temp_dir) / f"{name}.yaml").write_text("a: 2" if name == "other" else "a: 1")
+        output = io.StringIO()
+
+        assert main(["duplicates", temp_dir], output) == 0
+        assert main(["duplicates", "tests.test_cli:CliVersions"], output) == 0
+
+    assert output.getvalue() == "asia eu us\n"
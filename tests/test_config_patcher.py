@@ -1,7 +1,19 @@
+import asyncio
+import threading
+import time
+
+import pytest
 from confz import ConfZ, ConfZDataSource
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError, validator
 
-from flexigurator.config_patch import patch_config
+from flexigurator.config_patch import (
+    _loading,
+    _replace_instance,
+    apatch_config,
+    patch_config,
+    prefetch_config,
+)
+from flexigurator.instance_cache import config_cache
 
 
 class TestSubModel(BaseModel):
@@ -63,6 +75,20 @@ def test_context():
     assert TestConfig2().some_int == 1
 
 
+def test_replace_instance():
+    with patch_config(TestConfig2, dict(some_int=2)):
+        sources = TestConfig2.CONFIG_SOURCES
+        _replace_instance(TestConfig2, sources, TestConfig2(config_sources=sources))
+        assert TestConfig2().some_int == 2
+
+        # Loaded while the patch is left, so the instance is of other sources than the class
+        instance = TestConfig2(config_sources=sources)
+
+    _replace_instance(TestConfig2, sources, instance)
+
+    assert TestConfig2().some_int == 1
+
+
 def test_context_sequential():
     with patch_config(TestOptionalConfig, dict(sub_model=dict(some_string="test"))):
         assert TestOptionalConfig().sub_model.some_string == "test"
@@ -168,3 +194,189 @@ def test_config_multiple_config_sources_2():
         assert TestConfig3().sub_model.some_string == "new"
         assert TestConfig3().some_int == 2
         assert TestConfig3().some_float == 4.2
+
+
+class ContextLocalConfig(ConfZ):  # type: ignore
+    __test__ = False
+    some_int: int
+    some_float: float
+
+    CONFIG_SOURCES = ConfZDataSource(dict(some_int=1, some_float=3.14))
+
+
+def test_context_local_threads():
+    barrier = threading.Barrier(4)
+    results = {}
+
+    def run(value):
+        with patch_config(ContextLocalConfig, dict(some_int=value), context_local=True):
+            barrier.wait()
+            results[value] = ContextLocalConfig().some_int
+            barrier.wait()
+
+    threads = [threading.Thread(target=run, args=(value,)) for value in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {value: value for value in range(4)}
+    assert ContextLocalConfig().some_int == 1
+
+
+def test_context_local_tasks():
+    async def run(value):
+        with patch_config(ContextLocalConfig, dict(some_int=value), context_local=True):
+            await asyncio.sleep(0)
+            with patch_config(ContextLocalConfig, dict(some_float=value), context_local=True):
+                await asyncio.sleep(0)
+                return ContextLocalConfig().some_int, ContextLocalConfig().some_float
+
+    async def main():
+        return await asyncio.gather(*(run(value) for value in range(4)))
+
+    assert asyncio.run(main()) == [(value, value) for value in range(4)]
+    assert ContextLocalConfig().some_int == 1
+
+
+def test_context_local_class_still_patches_globally():
+    with patch_config(ContextLocalConfig, dict(some_int=2), context_local=True):
+        pass
+
+    class ContextLocalSubConfig(ContextLocalConfig):  # type: ignore
+        pass
+
+    with patch_config(ContextLocalConfig, dict(some_int=3)):
+        result = []
+        thread = threading.Thread(target=lambda: result.append(ContextLocalConfig().some_int))
+        thread.start()
+        thread.join()
+        assert result == [3]
+
+        with patch_config(ContextLocalConfig, dict(some_float=1.0), context_local=True):
+            assert ContextLocalConfig().some_int == 3
+            assert ContextLocalConfig().some_float == 1.0
+
+    assert ContextLocalConfig().some_int == 1
+    assert ContextLocalSubConfig().some_float == 3.14
+    assert ContextLocalConfig.confz_instance is not None
+    assert type(ContextLocalConfig).CONFIG_SOURCES.__get__(None) is not None
+
+
+class AsyncConfig(ConfZ):  # type: ignore
+    __test__ = False
+    some_int: int
+
+    CONFIG_SOURCES = ConfZDataSource(dict(some_int=1))
+
+    @validator("some_int")
+    def record_thread(cls, value):
+        loading_threads.append(threading.current_thread())
+        if value < 0:
+            raise ValueError("negative")
+        return value
+
+
+loading_threads: list[threading.Thread] = []
+
+
+@pytest.fixture
+def clear_loading():
+    config_cache.clear()
+    loading_threads.clear()
+    yield
+    config_cache.clear()
+
+
+def test_apatch_config_tasks(clear_loading):
+    async def run(value):
+        async with apatch_config(AsyncConfig, dict(some_int=value)):
+            await asyncio.sleep(0)
+            return AsyncConfig().some_int
+
+    async def main():
+        return await asyncio.gather(*(run(value) for value in range(4)))
+
+    assert asyncio.run(main()) == list(range(4))
+    assert AsyncConfig().some_int == 1
+    # The configs are validated in worker threads rather than on the event loop
+    assert threading.main_thread() not in loading_threads[:4]
+
+
+def test_apatch_config_global(clear_loading):
+    async def main():
+        async with apatch_config(AsyncConfig, dict(some_int=2), context_local=False):
+            result = []
+            thread = threading.Thread(target=lambda: result.append(AsyncConfig().some_int))
+            thread.start()
+            thread.join()
+            return result
+
+    assert asyncio.run(main()) == [2]
+
+
+def test_apatch_config_validation_error(clear_loading):
+    async def main():
+        async with apatch_config(AsyncConfig, dict(some_int=-1)):
+            pass  # pragma: no cover
+
+    with pytest.raises(ValidationError):
+        asyncio.run(main())
+
+
+def test_prefetch_config(clear_loading):
+    future = prefetch_config(AsyncConfig, dict(some_int=2))
+    instance = future.result()
+
+    with patch_config(AsyncConfig, dict(some_int=2)):
+        assert AsyncConfig() is instance
+
+    async def main():
+        async with apatch_config(AsyncConfig, dict(some_int=2)):
+            return AsyncConfig()
+
+    assert asyncio.run(main()) is instance
+    assert len(loading_threads) == 1
+
+    assert isinstance(prefetch_config(AsyncConfig, dict(some_int=-1)).exception(), ValidationError)
+
+
+def test_prefetch_config_uncacheable(clear_loading):
+    config_cache.maxsize = 0
+    try:
+        assert prefetch_config(AsyncConfig, dict(some_int=2)).result().some_int == 2
+    finally:
+        config_cache.maxsize = 128
+
+
+@pytest.mark.parametrize("value", [2, -1])
+def test_load_instance_waits_for_loading_thread(clear_loading, mocker, value):
+    release = threading.Event()
+    original_init = AsyncConfig.__init__
+
+    def blocked_init(self, **data):
+        release.wait()
+        original_init(self, **data)
+
+    # The first load blocks until the second load waits for it
+    mocker.patch.object(AsyncConfig, "__init__", blocked_init)
+    first = prefetch_config(AsyncConfig, dict(some_int=value))
+    while not _loading:
+        time.sleep(0.001)
+
+    loading = next(iter(_loading.values()))
+    wait_for_result = loading.result
+
+    def result(*args):
+        release.set()
+        return wait_for_result(*args)
+
+    loading.result = result  # type: ignore
+    second = prefetch_config(AsyncConfig, dict(some_int=value))
+
+    if value > 0:
+        assert second.result() is first.result()
+        assert len(loading_threads) == 1
+    else:
+        assert isinstance(second.exception(), ValidationError)
+        assert isinstance(first.exception(), ValidationError)
@@ -0,0 +1,52 @@
+from confz import ConfZ, ConfZDataSource, ConfZFileSource, FileFormat
+from pydantic import BaseModel
+
+from flexigurator.config_patch import patch_config
+from flexigurator.config_snapshot import SnapshotSource, snapshot_sources
+from flexigurator.instance_cache import ConfigCache
+
+
+class TestSubModel(BaseModel):
+    __test__ = False
+    some_string: str
+    some_list: list[int] = []
+
+
+class TestConfig(ConfZ):  # type: ignore
+    __test__ = False
+    sub_model: TestSubModel
+    some_int: int
+
+
+def test_snapshot_sources():
+    base = ConfZDataSource(dict(sub_model=dict(some_string="base", some_list=[1]), some_int=1))
+    sources = [
+        base,
+        ConfZFileSource(b"some_int: 2", format=FileFormat.YAML),
+        ConfZDataSource(dict(sub_model=dict(some_string="version"))),
+    ]
+
+    snapshot = snapshot_sources(sources)
+
+    assert snapshot.data == dict(sub_model=dict(some_string="version", some_list=[1]), some_int=2)
+    assert snapshot.data["sub_model"] is not base.data["sub_model"]
+
+
+def test_snapshot_source_is_not_modified():
+    snapshot = snapshot_sources(
+        [ConfZDataSource(dict(sub_model=dict(some_string="a"), some_int=1))]
+    )
+
+    with patch_config(TestConfig, [snapshot, ConfZDataSource(dict(sub_model=dict(some_list=[2])))]):
+        assert TestConfig().sub_model.some_list == [2]
+
+    assert snapshot.data == dict(sub_model=dict(some_string="a"), some_int=1)
+    assert TestConfig(config_sources=snapshot).sub_model.some_list == []
+
+
+def test_snapshot_source_cache_key():
+    cache = ConfigCache()
+    snapshot = snapshot_sources([ConfZDataSource(dict(some_int=1))])
+
+    assert cache.key(TestConfig, [snapshot]) == cache.key(TestConfig, [snapshot])
+    assert cache.key(TestConfig, [snapshot]) != cache.key(TestConfig, [SnapshotSource(dict())])
@@ -0,0 +1,41 @@
+from confz import ConfZ, ConfZDataSource
+
+from flexigurator.config_validation import ValidationReport, VersionResult, validate_versions
+
+
+class ValidatedConfig(ConfZ):  # type: ignore
+    a: int
+    b: int
+
+
+def _plans(count):
+    for i in range(count):
+        data = dict(a=i, b=i) if i % 10 else dict(a="invalid")
+        yield f"version_{i}", [ConfZDataSource(data)]
+
+
+def test_validate_versions():
+    results = list(validate_versions(ValidatedConfig, _plans(100), max_workers=2, batch_size=3))
+
+    assert [result.version for result in results] == [f"version_{i}" for i in range(100)]
+    assert [result.version for result in results if not result.ok] == [
+        f"version_{i}" for i in range(0, 100, 10)
+    ]
+    assert "ValidationError" in results[0].error
+    assert all(result.duration >= 0 for result in results)
+
+
+def test_validate_versions_in_process():
+    results = list(validate_versions(ValidatedConfig, _plans(20), max_workers=0))
+
+    assert [result.ok for result in results] == [i % 10 != 0 for i in range(20)]
+
+
+def test_validation_report():
+    report = ValidationReport(
+        (VersionResult("a", 0.1), VersionResult("b", 0.2, "ValueError: b")), duration=0.3
+    )
+
+    assert report.failures == (VersionResult("b", 0.2, "ValueError: b"),)
+    assert not report.ok
+    assert ValidationReport((VersionResult("a", 0.1),), duration=0.1).ok
@@ -1,12 +1,15 @@
+import asyncio
 import os
+import shutil
 import tempfile
 from pathlib import Path
 
 import pytest
-from confz import ConfZ, ConfZDataSource
+from confz import ConfZ, ConfZDataSource, ConfZFileSource
 from pydantic import BaseModel
 
 from flexigurator.config_versions import ConfigVersions, DirectorySource
+from flexigurator.instance_cache import config_cache
 
 
 class TestSubModel(BaseModel):
@@ -89,6 +92,23 @@ def test_config_versions_raise_when_source_doesnt_exist():
             ...
 
 
+@pytest.mark.parametrize("name", ["plan", "compile", "snapshot", "validate", "watch", "versions"])
+def test_config_versions_raise_when_version_name_is_reserved(name):
+    with pytest.raises(AttributeError, match=name):
+        type("Configs", (ConfigVersions,), {"CONFIG_CLASS": MultiFieldConfig, name: dict(a=1)})
+
+
+def test_config_versions_method_can_be_overridden():
+    class Configs(ConfigVersions):
+        CONFIG_CLASS = MultiFieldConfig
+        test = dict(a=1, b=2)
+
+        def versions(self):
+            yield from super().versions()
+
+    assert list(Configs().versions()) == ["test"]
+
+
 def test_config_versions_raise_when_version_is_not_config_source():
     class Configs(ConfigVersions):
         CONFIG_CLASS = TestOptionalConfig
@@ -208,3 +228,460 @@ def test_directory_source_raise_when_getting_folder():
         with pytest.raises(ValueError):
             with DirectoryConfigs().version("folder.nested"):
                 ...
+
+
+def test_directory_source_index_is_cached(mocker):
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        with open(temp_dir + "/config_a.yaml", "w") as file:
+            file.write("""a: 1\nb: 2""")
+
+        directory_source = DirectorySource(Path(temp_dir))
+        scandir_spy = mocker.spy(os, "scandir")
+
+        directory_source.get("config_a")
+        directory_source.get("config_a")
+
+        assert scandir_spy.call_count == 1
+
+
+def test_directory_source_rescans_on_change():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        with open(temp_dir + "/config_a.yaml", "w") as file:
+            file.write("""a: 1\nb: 2""")
+        os.mkdir(temp_dir + "/nested")
+
+        directory_source = DirectorySource(Path(temp_dir))
+        directory_source.get("config_a")
+        nested = directory_source.nested
+
+        with open(temp_dir + "/config_b.yaml", "w") as file:
+            file.write("""a: 2\nb: 4""")
+        os.remove(temp_dir + "/config_a.yaml")
+        # Make sure the change is visible even on file systems with coarse timestamps
+        os.utime(temp_dir, ns=(0, 0))
+
+        assert directory_source.get("config_b").file == Path(temp_dir + "/config_b.yaml")
+        assert directory_source.nested is nested
+        with pytest.raises(AttributeError):
+            directory_source.get("config_a")
+
+
+def test_directory_source_refresh():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        os.mkdir(temp_dir + "/nested")
+        with open(temp_dir + "/nested/config_a.yaml", "w") as file:
+            file.write("""a: 1\nb: 2""")
+
+        directory_source = DirectorySource(Path(temp_dir))
+        directory_source.get("nested.config_a")
+
+        # Restore the modification time so the new file is only picked up by an explicit refresh
+        mtime = os.stat(temp_dir + "/nested").st_mtime_ns
+        with open(temp_dir + "/nested/config_b.yaml", "w") as file:
+            file.write("""a: 2\nb: 4""")
+        os.utime(temp_dir + "/nested", ns=(mtime, mtime))
+
+        with pytest.raises(AttributeError):
+            directory_source.get("nested.config_b")
+
+        directory_source.refresh()
+
+        assert directory_source.get("nested.config_b").file == Path(
+            temp_dir + "/nested/config_b.yaml"
+        )
+
+
+def test_directory_source_skips_symlinked_folders():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        os.mkdir(temp_dir + "/nested")
+        with open(temp_dir + "/nested/config_a.yaml", "w") as file:
+            file.write("""a: 1\nb: 2""")
+        # A link to the parent folder would otherwise be traversed endlessly
+        os.symlink(os.path.abspath(temp_dir), temp_dir + "/nested/parent")
+        os.symlink(os.path.abspath(temp_dir + "/nested/config_a.yaml"), temp_dir + "/config_b.yaml")
+
+        class Configs(ConfigVersions):
+            CONFIG_CLASS = MultiFieldConfig
+            folder = DirectorySource(Path(temp_dir))
+
+        actual = sorted(Configs().versions())
+        Configs().compile()
+
+        with pytest.raises(AttributeError):
+            Configs().get("folder.nested.parent.nested.config_a")
+
+    assert actual == ["folder.config_b", "folder.nested.config_a"]
+
+
+def test_directory_source_missing_directory():
+    directory_source = DirectorySource(Path("does/not/exist"))
+
+    with pytest.raises(AttributeError):
+        directory_source.get("config_a")
+
+
+def test_directory_source_removed_directory():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        os.mkdir(temp_dir + "/nested")
+        with open(temp_dir + "/nested/config_a.yaml", "w") as file:
+            file.write("""a: 1\nb: 2""")
+
+        directory_source = DirectorySource(Path(temp_dir + "/nested"))
+        directory_source.get("config_a")
+
+        shutil.rmtree(temp_dir + "/nested")
+
+        with pytest.raises(AttributeError):
+            directory_source.get("config_a")
+
+
+def test_config_versions_versions():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        os.mkdir(temp_dir + "/nested")
+        with open(temp_dir + "/nested/config_a.yaml", "w") as file:
+            file.write("""a: 1\nb: 2""")
+
+        class Configs(ConfigVersions):
+            CONFIG_CLASS = MultiFieldConfig
+            BASE = dict(a=1, b=2)
+            test = [ConfZDataSource(dict(a=3))]
+            folder = DirectorySource(Path(temp_dir))
+            not_a_version = 5
+
+        actual = sorted(Configs().versions())
+
+    assert actual == ["folder.nested.config_a", "test"]
+
+
+def test_config_versions_versions_named_like_methods():
+    names = ["versions", "refresh", "watch", "duplicates", "get", "_versions"]
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        for value, name in enumerate(names):
+            (Path(temp_dir) / f"{name}.yaml").write_text(f"a: {value}\nb: 2")
+
+        class Configs(ConfigVersions):
+            CONFIG_CLASS = MultiFieldConfig
+            folder = DirectorySource(Path(temp_dir))
+
+        first = sorted(Configs().versions())
+        second = sorted(Configs().versions())
+
+        for value, name in enumerate(names):
+            with Configs().version(f"folder.{name}"):
+                assert MultiFieldConfig().a == value
+        Configs.folder.refresh()
+
+    assert first == second == sorted(f"folder.{name}" for name in names)
+
+
+def test_config_versions_plan(mocker):
+    class Configs(ConfigVersions):
+        CONFIG_CLASS = MultiFieldConfig
+        BASE = [ConfZDataSource(dict(a=1)), ConfZDataSource(dict(b=2))]
+        test = dict(a=3)
+
+    get_spy = mocker.spy(Configs, "get")
+
+    plan = Configs().plan("test")
+
+    assert plan == (*Configs.BASE, ConfZDataSource(dict(a=3)))
+    assert Configs().plan("test") is plan
+    assert get_spy.call_count == 2
+
+    with Configs().version("test"):
+        assert (MultiFieldConfig().a, MultiFieldConfig().b) == (3, 2)
+
+
+def test_config_versions_plan_removed_version():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        os.mkdir(temp_dir + "/nested")
+        with open(temp_dir + "/nested/config_a.yaml", "w") as file:
+            file.write("""a: 1\nb: 2""")
+
+        class Configs(ConfigVersions):
+            CONFIG_CLASS = MultiFieldConfig
+            folder = DirectorySource(Path(temp_dir))
+
+        plan = Configs().plan("folder.nested.config_a")
+        assert Configs().plan("folder.nested.config_a") is plan
+
+        os.remove(temp_dir + "/nested/config_a.yaml")
+        # Make sure the change is visible even on file systems with coarse timestamps
+        os.utime(temp_dir + "/nested", ns=(0, 0))
+
+        with pytest.raises(AttributeError):
+            with Configs().version("folder.nested.config_a"):
+                pass
+
+
+def test_config_versions_plan_removed_folder():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        os.mkdir(temp_dir + "/nested")
+        with open(temp_dir + "/nested/config_a.yaml", "w") as file:
+            file.write("""a: 1\nb: 2""")
+
+        class Configs(ConfigVersions):
+            CONFIG_CLASS = MultiFieldConfig
+            folder = DirectorySource(Path(temp_dir))
+
+        with Configs().version("folder.nested.config_a"):
+            assert MultiFieldConfig().a == 1
+
+        shutil.rmtree(temp_dir + "/nested")
+        # Make sure the change is visible even on file systems with coarse timestamps
+        os.utime(temp_dir, ns=(0, 0))
+
+        with pytest.raises(AttributeError):
+            with Configs().version("folder.nested.config_a"):
+                pass
+
+
+def test_config_versions_compile():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        with open(temp_dir + "/config_a.yaml", "w") as file:
+            file.write("""a: 1\nb: 2""")
+
+        class Configs(ConfigVersions):
+            CONFIG_CLASS = MultiFieldConfig
+            folder = DirectorySource(Path(temp_dir))
+
+        Configs().compile()
+        plan = Configs().plan("folder.config_a")
+
+        with open(temp_dir + "/config_b.yaml", "w") as file:
+            file.write("""a: 2\nb: 4""")
+        os.utime(temp_dir, ns=(0, 0))
+
+        # The changed folder is re-indexed when the plan is reused
+        new_plan = Configs().plan("folder.config_a")
+        assert new_plan is not plan and new_plan == plan
+        assert Configs().plan("folder.config_a") is new_plan
+        assert Configs().get("folder.config_b")
+        assert Configs().plan("folder.config_a") is new_plan
+
+        plan = Configs().plan("folder.config_a")
+        Configs.folder.refresh()
+
+        assert Configs().plan("folder.config_a") is not plan
+
+
+def test_config_versions_snapshot():
+    class Configs(ConfigVersions):
+        CONFIG_CLASS = MultiFieldConfig
+        BASE = dict(a=1, b=2)
+        test = [ConfZDataSource(dict(a=3)), ConfZDataSource(dict(a=4))]
+
+    snapshot = Configs().snapshot("test")
+
+    assert snapshot.data == dict(a=4, b=2)
+    assert Configs().snapshot("test") is snapshot
+
+    with Configs().version("test", snapshot=True):
+        assert MultiFieldConfig.CONFIG_SOURCES == [snapshot]
+        assert (MultiFieldConfig().a, MultiFieldConfig().b) == (4, 2)
+
+    Configs().compile()
+
+    assert Configs().snapshot("test") is not snapshot
+
+
+def test_config_versions_validate_all():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        os.mkdir(temp_dir + "/nested")
+        with open(temp_dir + "/nested/config_a.yaml", "w") as file:
+            file.write("""a: 1""")
+        with open(temp_dir + "/config_b.yaml", "w") as file:
+            file.write("""a: [1]""")
+
+        class Configs(ConfigVersions):
+            CONFIG_CLASS = MultiFieldConfig
+            BASE = dict(b=2)
+            test = dict(a=3)
+            folder = DirectorySource(Path(temp_dir))
+
+        report = Configs().validate_all(max_workers=2)
+
+    assert sorted(result.version for result in report.results) == [
+        "folder.config_b",
+        "folder.nested.config_a",
+        "test",
+    ]
+    assert sorted(result.version for result in report.failures) == ["folder.config_b"]
+    assert report.duration > 0
+
+
+def test_config_versions_watch():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        with open(temp_dir + "/config_a.yaml", "w") as file:
+            file.write("""a: 1\nb: 2""")
+
+        class Configs(ConfigVersions):
+            CONFIG_CLASS = MultiFieldConfig
+            folder = DirectorySource(Path(temp_dir))
+            other = ConfZFileSource(Path(temp_dir) / "other.yaml", optional=True)
+
+        changes = []
+        Configs().subscribe(changes.append)
+        watcher = Configs().watch(interval=3600)
+        snapshot = Configs().snapshot("folder.config_a")
+
+        try:
+            with Configs().version("folder.config_a"):
+                before = MultiFieldConfig()
+
+                with open(temp_dir + "/config_a.yaml", "w") as file:
+                    file.write("""a: 10\nb: 20""")
+                watcher.check()
+
+                after = MultiFieldConfig()
+                new_snapshot = Configs().snapshot("folder.config_a")
+
+            with open(temp_dir + "/config_b.yaml", "w") as file:
+                file.write("""a: 3\nb: 4""")
+            watcher.check()
+        finally:
+            watcher.stop()
+
+    assert (before.a, after.a) == (1, 10)
+    assert snapshot.data["a"] == 1
+    assert new_snapshot.data["a"] == 10
+    assert changes[0] == [Path(temp_dir) / "config_a.yaml"]
+    assert Path(temp_dir) / "config_b.yaml" in changes[1]
+
+
+def test_config_versions_watch_inactive():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        with open(temp_dir + "/config_a.yaml", "w") as file:
+            file.write("""a: 1\nb: 2""")
+
+        class Configs(ConfigVersions):
+            CONFIG_CLASS = MultiFieldConfig
+            folder = DirectorySource(Path(temp_dir))
+
+        class ConfigsWithoutClass(ConfigVersions):
+            folder = DirectorySource(Path(temp_dir))
+
+        watchers = [Configs().watch(interval=3600), ConfigsWithoutClass().watch(interval=3600)]
+        with Configs().version("folder.config_a"):
+            with open(temp_dir + "/config_a.yaml", "w") as file:
+                file.write("""a: 10\nb: 20""")
+            changed = [watcher.check() for watcher in watchers]
+            assert MultiFieldConfig().a == 10
+
+        for watcher in watchers:
+            watcher.stop()
+
+    assert changed[0] == changed[1] == [Path(temp_dir) / "config_a.yaml"]
+
+
+def test_config_versions_aversion():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        for value in range(4):
+            (Path(temp_dir) / f"version_{value}.yaml").write_text(f"a: {value}")
+
+        class Configs(ConfigVersions):
+            CONFIG_CLASS = MultiFieldConfig
+            BASE = dict(a=-1, b=2)
+            folder = DirectorySource(Path(temp_dir))
+
+        async def run(value):
+            async with Configs().aversion(f"folder.version_{value}", snapshot=value % 2 == 0):
+                await asyncio.sleep(0)
+                return MultiFieldConfig().a, MultiFieldConfig().b
+
+        async def main():
+            return await asyncio.gather(*(run(value) for value in range(4)))
+
+        assert asyncio.run(main()) == [(value, 2) for value in range(4)]
+
+
+def test_config_versions_prefetch():
+    class Configs(ConfigVersions):
+        CONFIG_CLASS = MultiFieldConfig
+        BASE = dict(a=1, b=2)
+        test = dict(a=3)
+
+    instance = Configs().prefetch("test").result()
+
+    with Configs().version("test"):
+        assert MultiFieldConfig() is instance
+
+    async def main():
+        async with Configs().aversion("test", context_local=False):
+            return MultiFieldConfig()
+
+    assert asyncio.run(main()) is instance
+    assert Configs().prefetch("test", snapshot=True).result() == instance
+
+
+def test_config_versions_duplicates():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        os.mkdir(temp_dir + "/nested")
+        for name in ("eu", "us", "nested/asia", "nested/other"):
+            with open(f"{temp_dir}/{name}.yaml", "w") as file:
+                file.write("a: 3" if name != "nested/other" else "a: 4")
+
+        class Configs(ConfigVersions):
+            CONFIG_CLASS = MultiFieldConfig
+            BASE = dict(a=1, b=2)
+            test = [ConfZDataSource(dict(a=3))]
+            missing = ConfZFileSource(Path(temp_dir) / "missing.yaml", optional=True)
+            folder = DirectorySource(Path(temp_dir))
+
+        configs = Configs()
+        assert configs.duplicates() == [["folder.eu", "folder.nested.asia", "folder.us"]]
+        assert Configs.folder.duplicates() == [["eu", "nested.asia", "us"]]
+
+        instances = []
+        for _ in range(2):
+            for version_name in ("folder.eu", "folder.us"):
+                with configs.version(version_name):
+                    instances.append(MultiFieldConfig())
+
+    # The versions share the config loaded from their identical files
+    assert all(instance is instances[0] for instance in instances)
+
+
+def test_config_versions_identical_file_changed():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        for name in ("a", "b"):
+            with open(f"{temp_dir}/{name}.yaml", "w") as file:
+                file.write("a: 1")
+
+        class Configs(ConfigVersions):
+            CONFIG_CLASS = MultiFieldConfig
+            BASE = dict(b=2)
+            folder = DirectorySource(Path(temp_dir))
+
+        for version_name in ("folder.a", "folder.b"):
+            with Configs().version(version_name):
+                MultiFieldConfig()
+        config_cache.clear()
+
+        with Configs().version("folder.a"):
+            with open(f"{temp_dir}/a.yaml", "w") as file:
+                file.write("a: 22")
+            assert MultiFieldConfig().a == 22
+
+        # The config loaded from the changed file is not cached as the config of the old contents
+        with Configs().version("folder.b"):
+            assert MultiFieldConfig().a == 1
+
+
+def test_config_versions_prefetch_directory():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        with open(f"{temp_dir}/a.yaml", "w") as file:
+            file.write("a: 3")
+
+        class Configs(ConfigVersions):
+            CONFIG_CLASS = MultiFieldConfig
+            BASE = dict(b=2)
+            folder = DirectorySource(Path(temp_dir))
+
+        config_cache.clear()
+        instance = Configs().prefetch("folder.a").result()
+
+        with Configs().version("folder.a"):
+            assert MultiFieldConfig() is instance
+
+    assert (config_cache.info().hits, config_cache.info().misses) == (1, 1)
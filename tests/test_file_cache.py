@@ -0,0 +1,246 @@
+import os
+import tempfile
+from hashlib import blake2b
+from pathlib import Path
+
+import pytest
+import yaml
+from confz import ConfZ, FileFormat
+from confz.exceptions import ConfZFileException
+
+from flexigurator.file_cache import (
+    CachedFileSource,
+    CompiledFileCache,
+    ParsedFileCache,
+    _compiled_cache_from_environment,
+    parsed_files,
+)
+
+
+class MultiFieldConfig(ConfZ):  # type: ignore
+    __test__ = False
+    a: int
+    b: dict[str, int]
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    parsed_files.clear()
+    yield
+    parsed_files.clear()
+
+
+def test_parsed_file_cache():
+    cache = ParsedFileCache()
+    parsed = []
+
+    def parse(stream):
+        parsed.append(1)
+        return stream.read()
+
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        file_path = Path(temp_dir) / "config.yaml"
+        file_path.write_text("a: 1")
+
+        first = cache.load(file_path, parse)
+        second = cache.load(file_path, parse)
+
+        file_path.write_text("a: 22")
+        third = cache.load(file_path, parse)
+
+        cache.invalidate(file_path)
+        fourth = cache.load(file_path, parse)
+
+    assert (first, second, third, fourth) == ("a: 1", "a: 1", "a: 22", "a: 22")
+    assert len(parsed) == 3
+
+
+def test_parsed_file_cache_eviction():
+    cache = ParsedFileCache(maxsize=1)
+    parsed = []
+
+    def parse(stream):
+        parsed.append(1)
+        return stream.read()
+
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        for name in ("a", "b", "a"):
+            file_path = Path(temp_dir) / name
+            file_path.write_text(name)
+            os.utime(file_path, ns=(0, 0))
+            cache.load(file_path, parse)
+
+    assert len(parsed) == 3
+
+
+def test_parsed_file_cache_shares_identical_contents():
+    cache = ParsedFileCache(maxsize=2)
+    parsed = []
+
+    def parse(stream):
+        parsed.append(1)
+        return yaml.safe_load(stream)
+
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        paths = [Path(temp_dir) / f"{name}.yaml" for name in ("eu", "us", "other")]
+        for file_path in paths:
+            file_path.write_text("a: 1" if file_path.stem != "other" else "a: 2")
+
+        eu = cache.load(paths[0], parse, parser="yaml")
+        us = cache.load(paths[1], parse, parser="yaml")
+        assert eu is us and len(parsed) == 1
+        assert cache.content_key(paths[0]) == cache.content_key(paths[1]) is not None
+        assert cache.digest(paths[0]) == cache.digest(paths[1])
+
+        # Evicting one of the files keeps the contents shared with the other file
+        cache.load(paths[2], parse, parser="yaml")
+        assert cache.content_key(paths[0]) is None
+        assert cache.load(paths[0], parse, parser="yaml") is us and len(parsed) == 2
+
+        cache.invalidate(paths[0])
+        cache.invalidate(paths[2])
+        paths[1].write_text("a: 3")
+        assert cache.content_key(paths[1]) is None
+        assert cache.load(paths[1], parse, parser="yaml") == dict(a=3)
+        assert cache.load(paths[0], parse, parser="yaml") == dict(a=1)
+        assert len(parsed) == 4
+        # Files loaded without a parser are not keyed by their contents
+        cache.load(paths[2], parse)
+        assert cache.content_key(paths[2]) is None
+        assert cache.digest(paths[2]) != cache.digest(paths[0])
+
+        cache.clear()
+        assert cache.content_key(paths[0]) is None
+        assert cache.content_key(Path(temp_dir) / "missing.yaml") is None
+
+
+def test_cached_file_source():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        file_path = Path(temp_dir) / "config.yaml"
+        file_path.write_text("a: 1\nb:\n  c: 2")
+        source = CachedFileSource(file_path)
+
+        first = MultiFieldConfig(
+            config_sources=[source, CachedFileSource(b"b: {d: 3}", format=FileFormat.YAML)]
+        )
+        second = MultiFieldConfig(config_sources=source)
+
+    # Populating the first config may not modify the cached contents
+    assert first.b == {"c": 2, "d": 3}
+    assert second.b == {"c": 2}
+
+
+def test_cached_file_source_json():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        file_path = Path(temp_dir) / "config.json"
+        file_path.write_text('{"a": 1, "b": {}}')
+
+        actual = MultiFieldConfig(config_sources=CachedFileSource(file_path))
+
+    assert actual.a == 1
+
+
+def test_cached_file_source_missing():
+    source = CachedFileSource("does/not/exist.yaml")
+
+    with pytest.raises(ConfZFileException):
+        MultiFieldConfig(config_sources=source)
+
+    actual = MultiFieldConfig(
+        config_sources=[CachedFileSource("does/not/exist.yaml", optional=True)], a=1, b={}
+    )
+    assert actual.a == 1
+
+
+def test_compiled_file_cache():
+    parsed = []
+
+    def parse(content):
+        parsed.append(1)
+        return content.decode()
+
+    def load(cache, file_path):
+        content = file_path.read_bytes()
+        return cache.load(str(file_path), content, blake2b(content).digest(), "text", parse)
+
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        file_path = Path(temp_dir) / "config.yaml"
+        file_path.write_text("a: 1")
+        cache_dir = Path(temp_dir) / "cache"
+
+        # Every cache acts like the cache of a new process
+        first = load(CompiledFileCache(cache_dir), file_path)
+        second = load(CompiledFileCache(cache_dir), file_path)
+
+        os.utime(file_path, ns=(0, 0))
+        third = load(CompiledFileCache(cache_dir), file_path)
+
+        file_path.write_text("a: 22")
+        os.utime(file_path, ns=(0, 0))
+        fourth = load(CompiledFileCache(cache_dir), file_path)
+
+        for entry_path in cache_dir.glob("*.pickle"):
+            entry_path.write_bytes(b"corrupt")
+        fifth = load(CompiledFileCache(cache_dir), file_path)
+
+        CompiledFileCache(cache_dir).clear()
+        assert not list(cache_dir.glob("*.pickle"))
+
+    assert (first, second, third, fourth, fifth) == ("a: 1", "a: 1", "a: 1", "a: 22", "a: 22")
+    assert len(parsed) == 3
+
+
+def test_compiled_file_cache_changed_with_same_stat():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        file_path = Path(temp_dir) / "x.yaml"
+        file_path.write_text("a: 1")
+        os.utime(file_path, ns=(0, 0))
+        compiled = CompiledFileCache(Path(temp_dir) / "cache")
+        ParsedFileCache(compiled=compiled).load(file_path, yaml.safe_load, parser="yaml")
+
+        # Same size and modification time, but other contents
+        file_path.write_text("a: 2")
+        os.utime(file_path, ns=(0, 0))
+        other_path = Path(temp_dir) / "y.yaml"
+        other_path.write_text("a: 2")
+
+        # A new process, of which the cache on disk holds an entry of the old contents
+        cache = ParsedFileCache(compiled=compiled)
+
+        assert cache.load(file_path, yaml.safe_load, parser="yaml") == dict(a=2)
+        assert cache.load(other_path, yaml.safe_load, parser="yaml") == dict(a=2)
+
+
+def test_compiled_file_cache_eviction():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        cache_dir = Path(temp_dir) / "cache"
+        cache = CompiledFileCache(cache_dir, max_bytes=1000)
+
+        for i in range(5):
+            file_path = Path(temp_dir) / f"config_{i}.yaml"
+            file_path.write_text("a" * 300)
+            cache.load(str(file_path), b"a" * 300, bytes([i]), "text", bytes.decode)
+
+        sizes = [entry_path.stat().st_size for entry_path in cache_dir.glob("*.pickle")]
+
+    assert len(sizes) == 2 and sum(sizes) <= 1000
+
+
+def test_cached_file_source_compiled(mocker):
+    mocker.patch.dict(os.environ, {"FLEXIGURATOR_CACHE_DIR": "cache"})
+    assert _compiled_cache_from_environment().directory == Path("cache")
+    mocker.patch.dict(os.environ, {"FLEXIGURATOR_CACHE_DIR": ""})
+    assert _compiled_cache_from_environment() is None
+
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        file_path = Path(temp_dir) / "config.yaml"
+        file_path.write_text("a: 1\nb:\n  c: 2")
+        mocker.patch.object(parsed_files, "compiled", CompiledFileCache(Path(temp_dir) / "cache"))
+
+        first = MultiFieldConfig(config_sources=CachedFileSource(file_path))
+        parsed_files.clear()
+        load_yaml_spy = mocker.spy(yaml, "load")
+        second = MultiFieldConfig(config_sources=CachedFileSource(file_path))
+
+    assert first == second
+    assert load_yaml_spy.call_count == 0
@@ -0,0 +1,49 @@
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from flexigurator.file_watcher import FileWatcher
+
+
+def test_file_watcher_check():
+    changes = []
+
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        paths = [Path(temp_dir) / "a.yaml", Path(temp_dir) / "b.yaml"]
+        paths[0].write_text("a: 1")
+        watcher = FileWatcher(lambda: paths, changes.append)
+
+        assert watcher.check() == []
+        assert watcher.check() == []
+
+        paths[0].write_text("a: 22")
+        paths[1].write_text("b: 1")
+
+        assert sorted(watcher.check()) == paths
+
+        os.remove(paths[0])
+        paths.pop(1)
+
+        assert sorted(watcher.check()) == [Path(temp_dir) / "a.yaml", Path(temp_dir) / "b.yaml"]
+
+    assert len(changes) == 2
+
+
+def test_file_watcher_thread(caplog):
+    changed = threading.Event()
+
+    def callback(paths):
+        changed.set()
+        raise ValueError("Invalid config")
+
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        file_path = Path(temp_dir) / "a.yaml"
+        file_path.write_text("a: 1")
+
+        with caplog.at_level(logging.ERROR), FileWatcher(lambda: [file_path], callback, 0.01):
+            file_path.write_text("a: 22")
+            assert changed.wait(5)
+
+    assert "Failed to process changed config files" in caplog.text
@@ -0,0 +1,66 @@
+import importlib
+import subprocess
+import sys
+from types import ModuleType
+from unittest import mock
+
+import pytest
+
+import flexigurator
+
+
+def test_import_is_lazy():
+    # Checked in a fresh interpreter, as the tests themselves already import ConfZ
+    statement = (
+        "import sys, flexigurator; "
+        "print(*(name in sys.modules for name in ('pydantic', 'confz', 'fastapi')))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", statement], check=True, capture_output=True, text=True
+    ).stdout
+
+    assert output.split() == ["False", "False", "False"]
+
+
+def test_lazy_attributes():
+    from flexigurator.config_patch import patch_config
+
+    assert flexigurator.patch_config is patch_config
+    assert "patch_config" in vars(flexigurator)
+    assert set(flexigurator.__all__) <= set(dir(flexigurator))
+
+
+def test_attribute_is_not_shadowed_by_module():
+    # Named like its module, which is bound to the package when it is imported
+    module = importlib.import_module("flexigurator.placeholder")
+
+    assert flexigurator.placeholder is module.placeholder
+    assert sys.modules["flexigurator.placeholder"] is module
+
+
+def test_config_cache_module():
+    import flexigurator.instance_cache as module
+
+    assert isinstance(module, ModuleType)
+    assert flexigurator.config_cache is module.config_cache
+
+
+def test_unknown_attribute():
+    with pytest.raises(AttributeError, match="no_such_attribute"):
+        flexigurator.no_such_attribute
+
+
+def test_shadowed_attribute_can_be_replaced(monkeypatch):
+    module = importlib.import_module("flexigurator.placeholder")
+    replacement = object()
+
+    with mock.patch("flexigurator.placeholder", replacement):
+        assert flexigurator.placeholder is replacement
+        # Binding the module to the package (as importing it does) is still ignored
+        flexigurator.placeholder = module
+        assert flexigurator.placeholder is replacement
+
+    assert flexigurator.placeholder is module.placeholder
+
+    monkeypatch.setattr(flexigurator, "placeholder", object())
+    assert flexigurator.placeholder is not module.placeholder
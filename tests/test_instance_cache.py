@@ -0,0 +1,144 @@
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+from confz import ConfZ, ConfZDataSource, ConfZEnvSource, ConfZFileSource, FileFormat
+from pydantic import BaseModel
+
+from flexigurator.config_patch import patch_config
+from flexigurator.file_cache import CachedFileSource
+from flexigurator.instance_cache import CacheInfo, ConfigCache, config_cache
+
+
+class TestSubModel(BaseModel):
+    __test__ = False
+    some_string: str
+
+
+class TestConfig(ConfZ):  # type: ignore
+    __test__ = False
+    sub_model: TestSubModel
+    some_int: int
+
+    CONFIG_SOURCES = ConfZDataSource(dict(sub_model=dict(some_string="old"), some_int=1))
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    config_cache.clear()
+    yield
+    config_cache.clear()
+
+
+def test_patch_config_reuses_instance():
+    with patch_config(TestConfig, dict(some_int=2)):
+        first = TestConfig()
+    with patch_config(TestConfig, dict(some_int=2)):
+        second = TestConfig()
+    with patch_config(TestConfig, dict(some_int=3)):
+        third = TestConfig()
+
+    assert first is second
+    assert third is not first and third.some_int == 3
+    assert config_cache.info() == CacheInfo(hits=1, misses=2, size=2, maxsize=128)
+
+
+def test_patch_config_not_constructed_is_not_cached():
+    for _ in range(3):
+        with patch_config(TestConfig, dict(some_int=2)):
+            pass
+
+    assert config_cache.info() == CacheInfo(hits=0, misses=3, size=0, maxsize=128)
+
+
+def test_patch_config_file_changed():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        file_path = Path(temp_dir) / "config.yaml"
+        file_path.write_text("some_int: 2")
+
+        with patch_config(TestConfig, ConfZFileSource(file_path)):
+            assert TestConfig().some_int == 2
+
+        file_path.write_text("some_int: 42")
+        os.utime(file_path, ns=(0, 0))
+
+        with patch_config(TestConfig, ConfZFileSource(file_path)):
+            assert TestConfig().some_int == 42
+
+
+def test_cache_eviction():
+    cache = ConfigCache(maxsize=2)
+    sources = [
+        ConfZDataSource(dict(sub_model=dict(some_string="new"), some_int=i)) for i in range(3)
+    ]
+    keys = [cache.key(TestConfig, [source]) for source in sources]
+
+    for key, source in zip(keys, sources):
+        cache.put(key, TestConfig(config_sources=source))
+    cache.get(keys[1])
+
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[2]).some_int == 2
+    assert cache.info() == CacheInfo(hits=2, misses=1, size=2, maxsize=2)
+
+
+def test_cache_disabled():
+    cache = ConfigCache(maxsize=0)
+
+    key = cache.key(TestConfig, [ConfZDataSource(dict(some_int=1))])
+    cache.put(key, TestConfig())
+
+    assert key is None
+    assert cache.get(key) is None
+    assert cache.info().size == 0
+
+
+def test_cache_key_data():
+    cache = ConfigCache()
+
+    def key(data):
+        return cache.key(TestConfig, [ConfZDataSource(data)])
+
+    assert key(dict(a=[1, 2], b={3})) == key(dict(a=[1, 2], b={3}))
+    assert key(dict(a=1)) != key(dict(a=True))
+    assert key(dict(a=[1])) != key(dict(a=(1,)))
+    assert key(dict(a=TestSubModel(some_string="a"))) == key(
+        dict(a=TestSubModel(some_string="a"))
+    )
+    assert key(dict(a=bytearray())) is None
+
+
+def test_cache_key_file():
+    cache = ConfigCache()
+
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        file_path = Path(temp_dir) / "config.yaml"
+        file_path.write_text("some_int: 2")
+
+        path_key = cache.key(TestConfig, [ConfZFileSource(file_path)])
+        folder_key = cache.key(TestConfig, [ConfZFileSource("config.yaml", folder=temp_dir)])
+
+    bytes_key = cache.key(TestConfig, [ConfZFileSource(b"a: 1", format=FileFormat.YAML)])
+
+    assert path_key is not None and path_key == folder_key
+    assert bytes_key is not None
+    assert cache.key(TestConfig, [ConfZFileSource(file_path)]) is None
+    assert cache.key(TestConfig, [ConfZFileSource(file_from_env="CONFIG")]) is None
+    assert cache.key(TestConfig, [ConfZEnvSource(allow_all=True)]) is None
+
+
+def test_cache_key_cached_file():
+    cache = ConfigCache()
+
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        for name in ("a", "b"):
+            (Path(temp_dir) / f"{name}.yaml").write_text("some_int: 2\nsub_model: {some_string: a}")
+
+        # Cached files are keyed by their contents, whether they are parsed yet or not
+        a_key = cache.key(TestConfig, [CachedFileSource(Path(temp_dir) / "a.yaml")])
+        TestConfig(config_sources=CachedFileSource(Path(temp_dir) / "a.yaml"))
+        assert cache.key(TestConfig, [CachedFileSource(Path(temp_dir) / "a.yaml")]) == a_key
+        assert cache.key(TestConfig, [CachedFileSource("b.yaml", folder=temp_dir)]) == a_key
+
+    assert cache.key(TestConfig, [CachedFileSource(Path(temp_dir) / "a.yaml")]) is None
@@ -0,0 +1,182 @@
+import logging
+import tempfile
+from pathlib import Path
+
+import pytest
+from confz import ConfZ, ConfZDataSource
+from confz.confz import ConfZMetaclass
+
+from flexigurator.config_patch import patch_config
+from flexigurator.config_versions import ConfigVersions, DirectorySource
+from flexigurator.file_cache import parsed_files
+from flexigurator.instance_cache import config_cache
+from flexigurator.instrumentation import (
+    CallbackExporter,
+    InstrumentationStats,
+    LoggingExporter,
+    Span,
+    instrumentation,
+)
+
+
+class TestConfig(ConfZ):  # type: ignore
+    __test__ = False
+    some_string: str
+    some_int: int
+
+    CONFIG_SOURCES = ConfZDataSource(dict(some_string="old", some_int=1))
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    config_cache.clear()
+    parsed_files.clear()
+    yield
+    config_cache.clear()
+    parsed_files.clear()
+
+
+@pytest.fixture
+def stats():
+    exporter = InstrumentationStats()
+    instrumentation.add_exporter(exporter)
+    yield exporter
+    instrumentation.remove_exporter(exporter)
+
+
+def test_disabled():
+    original_call = ConfZMetaclass.__call__
+
+    assert not instrumentation.enabled
+    with instrumentation.span("disabled"):
+        instrumentation.count("disabled")
+
+    exporter = InstrumentationStats()
+    instrumentation.add_exporter(exporter)
+    assert instrumentation.enabled and ConfZMetaclass.__call__ is not original_call
+
+    instrumentation.remove_exporter(exporter)
+    assert not instrumentation.enabled and ConfZMetaclass.__call__ is original_call
+    assert exporter.counters() == {} and exporter.spans() == {}
+
+
+def test_patch_config(stats):
+    with patch_config(TestConfig, dict(some_int=2)):
+        assert TestConfig().some_int == 2
+        assert TestConfig().some_int == 2
+    with patch_config(TestConfig, dict(some_int=2)):
+        assert TestConfig().some_int == 2
+
+    spans = stats.spans()
+    assert spans["patch_config.sources"].count == 2
+    # Only the first config is constructed, the second patch reuses the cached config
+    assert spans["config.construct"].count == spans["config.load"].count == 1
+    assert spans["config.construct"].total >= spans["config.load"].total
+    assert stats.counters() == {"config_cache.misses": 1, "config_cache.hits": 1}
+
+
+def test_construct_with_sources(stats):
+    TestConfig(config_sources=ConfZDataSource(dict(some_string="new", some_int=3)))
+
+    assert stats.spans()["config.construct"].count == 1
+
+
+def test_construct_error(stats):
+    spans = []
+    instrumentation.add_exporter(CallbackExporter(spans.append))
+
+    with patch_config(TestConfig, dict(some_int="not an int")):
+        with pytest.raises(ValueError):
+            TestConfig()
+
+    construct = next(span for span in spans if span.name == "config.construct")
+    load = next(span for span in spans if span.name == "config.load")
+    assert construct.attributes == {"config_class": "TestConfig", "error": "ValidationError"}
+    assert load.parent == "config.construct" and construct.parent is None
+    assert construct.start_time_ns <= load.start_time_ns <= load.end_time_ns
+    assert construct.duration >= load.duration > 0
+
+
+def test_uncacheable(stats):
+    config_cache.maxsize = 0
+    try:
+        with patch_config(TestConfig, dict(some_int=2)):
+            TestConfig()
+    finally:
+        config_cache.maxsize = 128
+
+    assert stats.counters() == {"config_cache.uncacheable": 1}
+
+
+def test_versions(stats):
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        (Path(temp_dir) / "version.yaml").write_text("some_int: 5")
+
+        class Configs(ConfigVersions):
+            CONFIG_CLASS = TestConfig
+            folder = DirectorySource(Path(temp_dir))
+
+        for _ in range(2):
+            with Configs().version("folder.version", snapshot=True):
+                assert TestConfig().some_int == 5
+
+        spans = stats.spans()
+        assert {"directory.scan", "versions.plan", "versions.snapshot", "file.load"} <= set(spans)
+        assert spans["versions.plan"].count == spans["versions.snapshot"].count == 1
+        assert stats.counters()["parsed_files.misses"] == 1
+
+
+def test_stats_report(stats):
+    with instrumentation.span("slow"):
+        pass
+    instrumentation.count("files", 3)
+
+    report = stats.report().splitlines()
+    assert report[0].split() == ["span", "count", "total", "ms", "mean", "ms", "max", "ms"]
+    assert report[1].split()[:2] == ["slow", "1"]
+    assert report[2].split() == ["files", "3"]
+
+    stats.clear()
+    assert stats.spans() == {} and stats.counters() == {}
+
+
+def test_logging_exporter(caplog):
+    exporter = LoggingExporter()
+    instrumentation.add_exporter(exporter)
+    try:
+        with caplog.at_level(logging.DEBUG, logger="flexigurator"):
+            with instrumentation.span("stage", path="config.yaml"):
+                instrumentation.count("files", path="config.yaml")
+    finally:
+        instrumentation.remove_exporter(exporter)
+
+    assert caplog.messages[0] == "files +1 {'path': 'config.yaml'}"
+    assert caplog.messages[1].startswith("stage took ")
+    assert caplog.messages[1].endswith(" ms {'path': 'config.yaml'}")
+
+
+def test_callback_exporter():
+    spans: list[Span] = []
+    counts = []
+    exporters = [
+        CallbackExporter(spans.append),
+        CallbackExporter(spans.append, lambda *count: counts.append(count)),
+    ]
+    for exporter in exporters:
+        instrumentation.add_exporter(exporter)
+    try:
+        with instrumentation.span("outer"):
+            with instrumentation.span("inner", key="value"):
+                instrumentation.count("events", 2, key="value")
+    finally:
+        for exporter in exporters:
+            instrumentation.remove_exporter(exporter)
+
+    assert [(span.name, span.parent) for span in spans] == [
+        ("inner", "outer"),
+        ("inner", "outer"),
+        ("outer", None),
+        ("outer", None),
+    ]
+    assert spans[0].attributes == {"key": "value"}
+    assert counts == [("events", 2, {"key": "value"})]
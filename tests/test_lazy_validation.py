@@ -0,0 +1,106 @@
+import copy
+import pickle
+
+import pytest
+from confz import ConfZ, ConfZDataSource
+from pydantic import BaseModel, Field, ValidationError, validator
+
+from flexigurator import LazyValidation, NotConfiguredError, placeholder
+from flexigurator.config_versions import ConfigVersions
+
+validated: list[str] = []
+
+
+class TestSubModel(BaseModel):
+    __test__ = False
+    some_string: str
+
+    @validator("some_string")
+    def record(cls, value):
+        validated.append(value)
+        return value
+
+
+class TestConfig(LazyValidation, ConfZ):  # type: ignore
+    __test__ = False
+    sub_model: TestSubModel
+    optional: TestSubModel = placeholder(TestSubModel)
+    eager: TestSubModel = Field(TestSubModel(some_string="default"), lazy_validation=False)
+    some_int: int
+
+    CONFIG_SOURCES = ConfZDataSource(
+        dict(sub_model=dict(some_string="sub_model"), eager=dict(some_string="eager"), some_int=1)
+    )
+
+
+@pytest.fixture(autouse=True)
+def clear_validated():
+    validated.clear()
+
+
+def test_lazy_validation_on_access():
+    config = TestConfig(config_sources=TestConfig.CONFIG_SOURCES)
+
+    assert validated == ["eager"]
+    assert config.some_int == 1
+    assert config.sub_model.some_string == "sub_model"
+    assert config.sub_model is config.sub_model
+    assert validated == ["eager", "sub_model"]
+
+    with pytest.raises(NotConfiguredError):
+        config.optional.some_string
+
+    object.__setattr__(config, "optional", config.sub_model)
+    assert config.optional is config.sub_model
+
+
+def test_lazy_validation_error():
+    config = TestConfig(config_sources=ConfZDataSource(dict(sub_model=dict(), some_int=1)))
+
+    with pytest.raises(ValidationError, match=r"sub_model -> some_string\n  field required"):
+        config.sub_model
+
+
+def test_lazy_validation_missing_section():
+    with pytest.raises(ValidationError, match="sub_model\n  field required"):
+        TestConfig(config_sources=ConfZDataSource(dict(some_int=1)))
+
+
+def test_lazy_validation_conversions():
+    config = TestConfig(config_sources=TestConfig.CONFIG_SOURCES)
+    other = TestConfig(config_sources=TestConfig.CONFIG_SOURCES)
+
+    assert config.dict()["sub_model"] == dict(some_string="sub_model")
+    assert "sub_model=TestSubModel(some_string='sub_model')" in repr(other)
+    assert config == other
+    assert pickle.loads(pickle.dumps(config)) == config
+    assert copy.deepcopy(config).sub_model == config.sub_model
+
+
+def test_lazy_validation_unvalidated_copy():
+    config = TestConfig(config_sources=TestConfig.CONFIG_SOURCES)
+    copied = pickle.loads(pickle.dumps(config))
+
+    assert validated == ["eager"]
+    copied.validate_lazy_fields()
+    assert validated == ["eager", "sub_model"]
+    assert copied.sub_model.some_string == "sub_model"
+
+
+def test_lazy_validation_fields():
+    # Only the lazily validated fields are intercepted
+    assert TestConfig.sub_model is vars(TestConfig)["sub_model"]
+    assert TestConfig.optional is vars(TestConfig)["optional"]
+    assert "eager" not in vars(TestConfig) and "some_int" not in vars(TestConfig)
+    assert TestConfig.schema()["required"] == ["sub_model", "some_int"]
+
+
+def test_lazy_validation_validate_all():
+    class Configs(ConfigVersions):
+        CONFIG_CLASS = TestConfig
+        valid = dict(sub_model=dict(some_string="valid"))
+        invalid = dict(sub_model=dict(some_string=[]))
+
+    report = Configs().validate_all(max_workers=0)
+
+    assert [result.version for result in report.failures] == ["invalid"]
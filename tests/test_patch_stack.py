@@ -0,0 +1,91 @@
+import tempfile
+from contextlib import ExitStack
+from pathlib import Path
+
+import pytest
+from confz import ConfZ, ConfZDataSource, ConfZFileSource
+from confz.exceptions import ConfZUpdateException
+
+from flexigurator.config_patch import patch_config
+from flexigurator.config_versions import _file_paths
+from flexigurator.instance_cache import config_cache, source_key
+from flexigurator.patch_stack import PatchLayer
+
+
+class TestConfig(ConfZ):  # type: ignore
+    __test__ = False
+    some_int: int
+    values: dict[str, int]
+
+    CONFIG_SOURCES = ConfZDataSource(dict(some_int=1, values=dict(a=1, b=2)))
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    config_cache.clear()
+    yield
+    config_cache.clear()
+
+
+def test_nested_patches_share_layers():
+    with ExitStack() as stack:
+        layers = []
+        for value in range(5):
+            stack.enter_context(patch_config(TestConfig, dict(values={f"key_{value}": value})))
+            (layer,) = TestConfig.CONFIG_SOURCES
+            layers.append(layer)
+
+        assert all(layer.parent == (parent,) for parent, layer in zip(layers, layers[1:]))
+        assert TestConfig().values == dict(
+            a=1, b=2, **{f"key_{value}": value for value in range(5)}
+        )
+        # Every layer merged its own sources onto the merged data of the layer below once
+        assert all(layer.merged_data is not None for layer in layers)
+
+    assert TestConfig.CONFIG_SOURCES == ConfZDataSource(dict(some_int=1, values=dict(a=1, b=2)))
+
+
+def test_merged_data_is_not_modified():
+    with patch_config(TestConfig, dict(values=dict(a=3))):
+        with patch_config(TestConfig, dict(some_int=2)):
+            (layer,) = TestConfig.CONFIG_SOURCES
+            source = ConfZDataSource(dict(values=dict(b=4, c=5)))
+            first = TestConfig(config_sources=[layer, source])
+            last = TestConfig(config_sources=[source, layer])
+            merged = layer.merged()
+
+    assert first.values == dict(a=3, b=4, c=5)
+    assert last.values == dict(a=3, b=2, c=5)
+    assert merged == dict(some_int=2, values=dict(a=3, b=2))
+    assert layer.parent[0].merged() == dict(some_int=1, values=dict(a=3, b=2))
+
+
+def test_contradicting_patches():
+    with patch_config(TestConfig, dict(some_int=2)):
+        with patch_config(TestConfig, dict(some_int=dict(nested=1))):
+            with pytest.raises(ConfZUpdateException):
+                TestConfig()
+
+
+def test_layers_with_files_are_merged_again():
+    with tempfile.TemporaryDirectory(dir=".") as temp_dir:
+        file_path = Path(temp_dir) / "config.yaml"
+        file_path.write_text("some_int: 2")
+
+        with patch_config(TestConfig, ConfZFileSource(file_path)):
+            with patch_config(TestConfig, dict(values=dict(c=3))):
+                (layer,) = TestConfig.CONFIG_SOURCES
+                assert not layer.static and layer.parent[0].merged_data is None
+                assert TestConfig(config_sources=[layer]).some_int == 2
+
+                file_path.write_text("some_int: 30")
+                assert TestConfig(config_sources=[layer]).some_int == 30
+                assert list(_file_paths(TestConfig.CONFIG_SOURCES)) == [file_path]
+
+
+def test_static_layer_cache_key():
+    layer = PatchLayer((ConfZDataSource(dict(some_int=1)),), (ConfZDataSource(dict(some_int=2)),))
+
+    assert layer.cache_key is None
+    key = source_key(layer)
+    assert layer.cache_key == key and source_key(layer) is key
@@ -1,3 +1,6 @@
+import copy
+import pickle
+
 from flexigurator import placeholder, NotConfiguredError
 from pydantic import BaseModel
 
@@ -32,3 +35,27 @@ def test_placeholder_repr():
 def test_placeholder_dict():
     actual = TestModel().sub_model.dict()
     assert actual == {}
+
+
+def test_placeholder_shared_per_model_type():
+    first = placeholder(TestSubModel)
+    second = placeholder(TestSubModel)
+
+    assert first is second
+    assert TestModel().sub_model is first
+    assert "some_string" not in first.__dict__
+    assert hasattr(type(first), "some_string")
+    assert first.model_type is TestSubModel
+
+
+def test_placeholder_copy():
+    expected = placeholder(TestSubModel)
+
+    assert copy.copy(expected) is expected
+    assert copy.deepcopy(expected) is expected
+    assert pickle.loads(pickle.dumps(expected)) is expected
+
+
+def test_placeholder_immutable():
+    with pytest.raises(TypeError):
+        placeholder(TestSubModel).model_type = BaseModel
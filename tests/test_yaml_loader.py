@@ -0,0 +1,34 @@
+import tempfile
+from pathlib import Path
+
+import pytest
+import yaml
+
+from flexigurator.yaml_loader import SafeLoader, load_yaml
+
+
+@pytest.mark.parametrize("loader", [SafeLoader, yaml.SafeLoader])
+def test_load_yaml(loader):
+    with tempfile.NamedTemporaryFile(mode="w", suffix=".yaml") as temp_yaml:
+        temp_yaml.write("a: 5\nb:\n  c: test\n")
+        temp_yaml.flush()
+
+        actual = load_yaml(Path(temp_yaml.name), loader)
+
+    assert actual == {"a": 5, "b": {"c": "test"}}
+
+
+def test_load_yaml_empty():
+    with tempfile.NamedTemporaryFile(mode="w", suffix=".yaml") as temp_yaml:
+        actual = load_yaml(Path(temp_yaml.name))
+
+    assert actual == {}
+
+
+def test_load_yaml_unsafe_tags():
+    with tempfile.NamedTemporaryFile(mode="w", suffix=".yaml") as temp_yaml:
+        temp_yaml.write("a: !!python/name:os.system\n")
+        temp_yaml.flush()
+
+        with pytest.raises(yaml.YAMLError):
+            load_yaml(Path(temp_yaml.name))